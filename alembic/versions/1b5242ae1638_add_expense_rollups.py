@@ -0,0 +1,75 @@
+"""add expense_rollups
+
+Revision ID: 1b5242ae1638
+Revises: d4b925b11670
+Create Date: 2026-10-19 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1b5242ae1638"
+down_revision: Union[str, Sequence[str], None] = "d4b925b11670"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(inspector, table_name: str) -> bool:
+    return table_name in inspector.get_table_names()
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    return any(idx["name"] == index_name for idx in inspector.get_indexes(table_name))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not _has_table(inspector, "expense_rollups"):
+        op.create_table(
+            "expense_rollups",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("owner_email", sa.String(), nullable=False),
+            sa.Column("month", sa.Date(), nullable=False),
+            sa.Column("category", sa.String(), nullable=False),
+            sa.Column("vendor", sa.String(), nullable=False),
+            sa.Column("total_amount", sa.Float(), nullable=False, server_default=sa.text("0")),
+            sa.Column("tx_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("owner_email", "month", "category", "vendor", name="uq_expense_rollups_key"),
+        )
+    inspector = sa.inspect(bind)
+    if not _has_index(inspector, "expense_rollups", "ix_expense_rollups_owner_email"):
+        op.create_index("ix_expense_rollups_owner_email", "expense_rollups", ["owner_email"], unique=False)
+    if not _has_index(inspector, "expense_rollups", "ix_expense_rollups_id"):
+        op.create_index("ix_expense_rollups_id", "expense_rollups", ["id"], unique=False)
+
+    # Backfill from the existing ledger; later drift can be repaired with
+    # `python -m app.cli rebuild-rollups`.
+    op.execute("DELETE FROM expense_rollups")
+    op.execute(
+        """
+        INSERT INTO expense_rollups (owner_email, month, category, vendor, total_amount, tx_count)
+        SELECT owner_email,
+               CAST(date_trunc('month', date) AS DATE),
+               COALESCE(category, 'Uncategorized'),
+               vendor,
+               SUM(base_currency_amount),
+               COUNT(*)
+        FROM expenses
+        GROUP BY owner_email, CAST(date_trunc('month', date) AS DATE), COALESCE(category, 'Uncategorized'), vendor
+        """
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _has_table(inspector, "expense_rollups"):
+        op.drop_index("ix_expense_rollups_id", table_name="expense_rollups")
+        op.drop_index("ix_expense_rollups_owner_email", table_name="expense_rollups")
+        op.drop_table("expense_rollups")
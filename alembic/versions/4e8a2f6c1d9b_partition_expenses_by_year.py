@@ -0,0 +1,215 @@
+"""partition expenses and expense_items by year
+
+Revision ID: 4e8a2f6c1d9b
+Revises: 7c3e91d0a5b2
+Create Date: 2026-10-19 15:00:00.000000
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4e8a2f6c1d9b"
+down_revision: Union[str, Sequence[str], None] = "7c3e91d0a5b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Years created ahead of the current one: the same setting
+# `python -m app.cli ensure-partitions` uses to extend the window on every deploy.
+YEARS_AHEAD = settings.PARTITION_YEARS_AHEAD
+# Years further back than this stay in the DEFAULT partition instead of
+# getting one partition each (guards against garbage OCR dates).
+YEARS_BACK = 30
+
+
+def _has_column(inspector, table_name: str, column_name: str) -> bool:
+    return any(col["name"] == column_name for col in inspector.get_columns(table_name))
+
+
+def _is_partitioned(bind, table_name: str) -> bool:
+    relkind = bind.execute(
+        sa.text(
+            "SELECT c.relkind FROM pg_class c "
+            "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace"
+        ),
+        {"name": table_name},
+    ).scalar()
+    return relkind == "p"
+
+
+def _index_definitions(bind, table_name: str) -> list[str]:
+    """CREATE INDEX statements for the table's non-unique indexes."""
+    return list(
+        bind.execute(
+            sa.text(
+                "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indrelid "
+                "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace "
+                "AND NOT i.indisunique ORDER BY i.indexrelid"
+            ),
+            {"name": table_name},
+        ).scalars()
+    )
+
+
+def _outgoing_foreign_keys(bind, table_name: str, exclude_target: str | None = None) -> list[tuple[str, str]]:
+    return [
+        (row.conname, row.definition)
+        for row in bind.execute(
+            sa.text(
+                "SELECT con.conname, pg_get_constraintdef(con.oid) AS definition, ref.relname AS target "
+                "FROM pg_constraint con "
+                "JOIN pg_class c ON c.oid = con.conrelid "
+                "JOIN pg_class ref ON ref.oid = con.confrelid "
+                "WHERE con.contype = 'f' AND c.relname = :name "
+                "AND c.relnamespace = current_schema()::regnamespace"
+            ),
+            {"name": table_name},
+        )
+        if row.target != exclude_target
+    ]
+
+
+def _serial_sequence(bind, table_name: str) -> str | None:
+    return bind.execute(sa.text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table_name}).scalar()
+
+
+def _partition_years(bind) -> list[int]:
+    current_year = date.today().year
+    data_years = bind.execute(
+        sa.text("SELECT DISTINCT CAST(EXTRACT(YEAR FROM date) AS INTEGER) FROM expenses")
+    ).scalars()
+    years = {year for year in data_years if current_year - YEARS_BACK <= year <= current_year + YEARS_AHEAD}
+    years.update(range(current_year, current_year + YEARS_AHEAD + 1))
+    return sorted(years)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # 1. expense_items carries its parent's date so it can be partitioned the same way.
+    if not _has_column(inspector, "expense_items", "expense_date"):
+        op.add_column("expense_items", sa.Column("expense_date", sa.Date(), nullable=True))
+    op.execute(
+        "UPDATE expense_items SET expense_date = "
+        "(SELECT expenses.date FROM expenses WHERE expenses.id = expense_items.expense_id)"
+    )
+    if bind.dialect.name != "postgresql" or _is_partitioned(bind, "expenses"):
+        # Declarative partitioning is Postgres-only; other dialects keep plain tables.
+        return
+
+    # Items without a parent are unreachable (the old FK cascaded deletes) and
+    # cannot be placed in a date partition.
+    op.execute("DELETE FROM expense_items WHERE expense_date IS NULL")
+
+    expense_indexes = _index_definitions(bind, "expenses")
+    item_indexes = _index_definitions(bind, "expense_items")
+    expense_fks = _outgoing_foreign_keys(bind, "expenses")
+    item_fks = _outgoing_foreign_keys(bind, "expense_items", exclude_target="expenses")
+    expense_seq = _serial_sequence(bind, "expenses")
+    item_seq = _serial_sequence(bind, "expense_items")
+    years = _partition_years(bind)
+
+    # 2. Partitioned twins with identical columns/defaults (ids keep their sequences).
+    op.execute("ALTER TABLE expense_items RENAME TO expense_items_unpartitioned")
+    op.execute("ALTER TABLE expenses RENAME TO expenses_unpartitioned")
+    op.execute(
+        "CREATE TABLE expenses (LIKE expenses_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (date)"
+    )
+    op.execute(
+        "CREATE TABLE expense_items (LIKE expense_items_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (expense_date)"
+    )
+    op.execute("ALTER TABLE expense_items ALTER COLUMN expense_date SET NOT NULL")
+    for table in ("expenses", "expense_items"):
+        for year in years:
+            op.execute(
+                f"CREATE TABLE {table}_y{year} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    # 3. Move the data and retire the old heaps.
+    op.execute("INSERT INTO expenses SELECT * FROM expenses_unpartitioned")
+    op.execute("INSERT INTO expense_items SELECT * FROM expense_items_unpartitioned")
+    for sequence in (expense_seq, item_seq):
+        if sequence:
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute("DROP TABLE expense_items_unpartitioned")
+    op.execute("DROP TABLE expenses_unpartitioned")
+    if expense_seq:
+        op.execute(f"ALTER SEQUENCE {expense_seq} OWNED BY expenses.id")
+    if item_seq:
+        op.execute(f"ALTER SEQUENCE {item_seq} OWNED BY expense_items.id")
+
+    # 4. Keys must include the partition column; indexes cascade to every partition.
+    # ON UPDATE CASCADE moves items along when an expense changes year (this
+    # relies on Postgres 15+ treating cross-partition updates as updates).
+    op.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY (id, date)")
+    op.execute("ALTER TABLE expense_items ADD CONSTRAINT expense_items_pkey PRIMARY KEY (id, expense_date)")
+    op.execute(
+        "ALTER TABLE expense_items ADD CONSTRAINT expense_items_expense_fkey "
+        "FOREIGN KEY (expense_id, expense_date) REFERENCES expenses (id, date) "
+        "ON DELETE CASCADE ON UPDATE CASCADE"
+    )
+    for name, definition in expense_fks:
+        op.execute(f"ALTER TABLE expenses ADD CONSTRAINT {name} {definition}")
+    for name, definition in item_fks:
+        op.execute(f"ALTER TABLE expense_items ADD CONSTRAINT {name} {definition}")
+    for statement in expense_indexes + item_indexes:
+        op.execute(statement)
+    op.execute("ANALYZE expenses")
+    op.execute("ANALYZE expense_items")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql" or not _is_partitioned(bind, "expenses"):
+        op.drop_column("expense_items", "expense_date")
+        return
+
+    expense_indexes = _index_definitions(bind, "expenses")
+    item_indexes = _index_definitions(bind, "expense_items")
+    expense_fks = _outgoing_foreign_keys(bind, "expenses")
+    item_fks = _outgoing_foreign_keys(bind, "expense_items", exclude_target="expenses")
+    expense_seq = _serial_sequence(bind, "expenses")
+    item_seq = _serial_sequence(bind, "expense_items")
+
+    op.execute("ALTER TABLE expense_items RENAME TO expense_items_partitioned")
+    op.execute("ALTER TABLE expenses RENAME TO expenses_partitioned")
+    op.execute("CREATE TABLE expenses (LIKE expenses_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("CREATE TABLE expense_items (LIKE expense_items_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    op.execute("INSERT INTO expenses SELECT * FROM expenses_partitioned")
+    op.execute("INSERT INTO expense_items SELECT * FROM expense_items_partitioned")
+    for sequence in (expense_seq, item_seq):
+        if sequence:
+            op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    # Dropping the partitioned parents drops every partition with them.
+    op.execute("DROP TABLE expense_items_partitioned")
+    op.execute("DROP TABLE expenses_partitioned")
+    if expense_seq:
+        op.execute(f"ALTER SEQUENCE {expense_seq} OWNED BY expenses.id")
+    if item_seq:
+        op.execute(f"ALTER SEQUENCE {item_seq} OWNED BY expense_items.id")
+
+    op.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE expense_items ADD CONSTRAINT expense_items_pkey PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE expense_items ADD CONSTRAINT expense_items_expense_id_fkey "
+        "FOREIGN KEY (expense_id) REFERENCES expenses (id) ON DELETE CASCADE"
+    )
+    for name, definition in expense_fks:
+        op.execute(f"ALTER TABLE expenses ADD CONSTRAINT {name} {definition}")
+    for name, definition in item_fks:
+        op.execute(f"ALTER TABLE expense_items ADD CONSTRAINT {name} {definition}")
+    for statement in expense_indexes + item_indexes:
+        # Indexes on a partitioned parent are reported as "ON ONLY <table>".
+        op.execute(statement.replace(" ON ONLY ", " ON ", 1))
+    op.drop_column("expense_items", "expense_date")
@@ -0,0 +1,61 @@
+"""add composite and covering indexes on expenses
+
+Revision ID: 7c3e91d0a5b2
+Revises: 1b5242ae1638
+Create Date: 2026-10-19 12:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c3e91d0a5b2"
+down_revision: Union[str, Sequence[str], None] = "1b5242ae1638"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    return any(idx["name"] == index_name for idx in inspector.get_indexes(table_name))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    is_postgres = bind.dialect.name == "postgresql"
+
+    # Build concurrently on Postgres so imports keep writing while the
+    # indexes are created; CONCURRENTLY cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        if not _has_index(inspector, "expenses", "ix_expenses_owner_date"):
+            op.create_index(
+                "ix_expenses_owner_date",
+                "expenses",
+                ["owner_email", "date"],
+                unique=False,
+                postgresql_include=["base_currency_amount", "category"],
+                postgresql_concurrently=is_postgres,
+            )
+        if not _has_index(inspector, "expenses", "ix_expenses_owner_dedup"):
+            op.create_index(
+                "ix_expenses_owner_dedup",
+                "expenses",
+                ["owner_email", "date", "amount", "currency", "vendor"],
+                unique=False,
+                postgresql_concurrently=is_postgres,
+            )
+    if is_postgres:
+        # Refresh stats and the visibility map so index-only scans are chosen.
+        with op.get_context().autocommit_block():
+            op.execute("VACUUM ANALYZE expenses")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _has_index(inspector, "expenses", "ix_expenses_owner_dedup"):
+        op.drop_index("ix_expenses_owner_dedup", table_name="expenses")
+    if _has_index(inspector, "expenses", "ix_expenses_owner_date"):
+        op.drop_index("ix_expenses_owner_date", table_name="expenses")
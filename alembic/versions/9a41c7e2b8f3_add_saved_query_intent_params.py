@@ -0,0 +1,42 @@
+"""add intent and params to saved_queries
+
+Revision ID: 9a41c7e2b8f3
+Revises: 4e8a2f6c1d9b
+Create Date: 2026-10-19 16:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a41c7e2b8f3"
+down_revision: Union[str, Sequence[str], None] = "4e8a2f6c1d9b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(inspector, table_name: str, column_name: str) -> bool:
+    return any(col["name"] == column_name for col in inspector.get_columns(table_name))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Existing rows keep NULL intent/params and are re-planned from their
+    # question text; their browser-posted sql_query is never executed.
+    if not _has_column(inspector, "saved_queries", "intent"):
+        op.add_column("saved_queries", sa.Column("intent", sa.String(), nullable=True))
+    if not _has_column(inspector, "saved_queries", "params"):
+        op.add_column("saved_queries", sa.Column("params", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _has_column(inspector, "saved_queries", "params"):
+        op.drop_column("saved_queries", "params")
+    if _has_column(inspector, "saved_queries", "intent"):
+        op.drop_column("saved_queries", "intent")
@@ -0,0 +1,41 @@
+"""add owner_data_versions
+
+Revision ID: a8c1e5f3b7d2
+Revises: f7b2d4e8a1c6
+Create Date: 2026-10-19 21:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c1e5f3b7d2"
+down_revision: Union[str, Sequence[str], None] = "f7b2d4e8a1c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(inspector, table_name: str) -> bool:
+    return table_name in inspector.get_table_names()
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not _has_table(inspector, "owner_data_versions"):
+        # Owners without a row are at version 0; the first write inserts it.
+        op.create_table(
+            "owner_data_versions",
+            sa.Column("owner_email", sa.String(), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("rewrites", sa.Integer(), nullable=False),
+            sa.Column("modified_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("owner_email"),
+        )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if _has_table(inspector, "owner_data_versions"):
+        op.drop_table("owner_data_versions")
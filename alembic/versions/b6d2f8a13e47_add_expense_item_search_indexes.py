@@ -0,0 +1,74 @@
+"""add expense_items expense_id and trigram name indexes
+
+Revision ID: b6d2f8a13e47
+Revises: 9a41c7e2b8f3
+Create Date: 2026-10-19 17:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b6d2f8a13e47"
+down_revision: Union[str, Sequence[str], None] = "9a41c7e2b8f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    return any(idx["name"] == index_name for idx in inspector.get_indexes(table_name))
+
+
+def _is_partitioned(bind, table_name: str) -> bool:
+    relkind = bind.execute(
+        sa.text(
+            "SELECT c.relkind FROM pg_class c "
+            "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace"
+        ),
+        {"name": table_name},
+    ).scalar()
+    return relkind == "p"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    is_postgres = bind.dialect.name == "postgresql"
+    # CONCURRENTLY is not supported on a partitioned parent; there the build
+    # cascades to every partition under a regular lock instead.
+    concurrently = is_postgres and not _is_partitioned(bind, "expense_items")
+
+    if is_postgres:
+        # Trusted extension since Postgres 13: the database owner may create it.
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.get_context().autocommit_block():
+        if not _has_index(inspector, "expense_items", "ix_expense_items_expense_id"):
+            op.create_index(
+                "ix_expense_items_expense_id",
+                "expense_items",
+                ["expense_id"],
+                unique=False,
+                postgresql_concurrently=concurrently,
+            )
+        # Expression indexes are not reflected on every dialect; rely on IF NOT EXISTS.
+        if is_postgres:
+            op.execute(
+                f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS ix_expense_items_name_trgm "
+                "ON expense_items USING gin (lower(name) gin_trgm_ops)"
+            )
+        else:
+            op.execute("CREATE INDEX IF NOT EXISTS ix_expense_items_name_trgm ON expense_items (lower(name))")
+    if is_postgres:
+        with op.get_context().autocommit_block():
+            op.execute("ANALYZE expense_items")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    op.execute("DROP INDEX IF EXISTS ix_expense_items_name_trgm")
+    if _has_index(inspector, "expense_items", "ix_expense_items_expense_id"):
+        op.drop_index("ix_expense_items_expense_id", table_name="expense_items")
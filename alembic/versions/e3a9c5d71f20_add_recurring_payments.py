@@ -0,0 +1,65 @@
+"""add recurring_payments
+
+Revision ID: e3a9c5d71f20
+Revises: b6d2f8a13e47
+Create Date: 2026-10-19 18:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e3a9c5d71f20"
+down_revision: Union[str, Sequence[str], None] = "b6d2f8a13e47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(inspector, table_name: str) -> bool:
+    return table_name in inspector.get_table_names()
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    return any(idx["name"] == index_name for idx in inspector.get_indexes(table_name))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not _has_table(inspector, "recurring_payments"):
+        op.create_table(
+            "recurring_payments",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("owner_email", sa.String(), nullable=False),
+            sa.Column("vendor_key", sa.String(), nullable=False),
+            sa.Column("vendor", sa.String(), nullable=False),
+            sa.Column("cadence", sa.String(), nullable=False),
+            sa.Column("interval_days", sa.Float(), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=False),
+            sa.Column("amount_variation", sa.Float(), nullable=False, server_default=sa.text("0")),
+            sa.Column("occurrences", sa.Integer(), nullable=False),
+            sa.Column("first_date", sa.Date(), nullable=False),
+            sa.Column("last_date", sa.Date(), nullable=False),
+            sa.Column("next_expected_date", sa.Date(), nullable=False),
+            sa.Column("confidence", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("owner_email", "vendor_key", name="uq_recurring_payments_owner_vendor"),
+        )
+    inspector = sa.inspect(bind)
+    if not _has_index(inspector, "recurring_payments", "ix_recurring_payments_owner_email"):
+        op.create_index("ix_recurring_payments_owner_email", "recurring_payments", ["owner_email"], unique=False)
+    if not _has_index(inspector, "recurring_payments", "ix_recurring_payments_id"):
+        op.create_index("ix_recurring_payments_id", "recurring_payments", ["id"], unique=False)
+    # Populated by `python -m app.cli detect-recurring` and refreshed after imports.
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _has_table(inspector, "recurring_payments"):
+        op.drop_index("ix_recurring_payments_id", table_name="recurring_payments")
+        op.drop_index("ix_recurring_payments_owner_email", table_name="recurring_payments")
+        op.drop_table("recurring_payments")
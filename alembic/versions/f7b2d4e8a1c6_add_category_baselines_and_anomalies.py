@@ -0,0 +1,77 @@
+"""add category_baselines and expense anomaly columns
+
+Revision ID: f7b2d4e8a1c6
+Revises: e3a9c5d71f20
+Create Date: 2026-10-19 19:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f7b2d4e8a1c6"
+down_revision: Union[str, Sequence[str], None] = "e3a9c5d71f20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(inspector, table_name: str) -> bool:
+    return table_name in inspector.get_table_names()
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    return any(idx["name"] == index_name for idx in inspector.get_indexes(table_name))
+
+
+def _has_column(inspector, table_name: str, column_name: str) -> bool:
+    return any(col["name"] == column_name for col in inspector.get_columns(table_name))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Nullable without defaults: a metadata-only change, also on the partitioned table.
+    if not _has_column(inspector, "expenses", "anomaly_score"):
+        op.add_column("expenses", sa.Column("anomaly_score", sa.Float(), nullable=True))
+    if not _has_column(inspector, "expenses", "anomaly_reason"):
+        op.add_column("expenses", sa.Column("anomaly_reason", sa.String(), nullable=True))
+
+    if not _has_table(inspector, "category_baselines"):
+        op.create_table(
+            "category_baselines",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("owner_email", sa.String(), nullable=False),
+            sa.Column("category", sa.String(), nullable=False),
+            sa.Column("sample_count", sa.Integer(), nullable=False),
+            sa.Column("median", sa.Float(), nullable=False),
+            sa.Column("mad", sa.Float(), nullable=False),
+            sa.Column("p90", sa.Float(), nullable=False),
+            sa.Column("p95", sa.Float(), nullable=False),
+            sa.Column("p99", sa.Float(), nullable=False),
+            sa.Column("window_start", sa.Date(), nullable=False),
+            sa.Column("window_end", sa.Date(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("owner_email", "category", name="uq_category_baselines_owner_category"),
+        )
+    inspector = sa.inspect(bind)
+    if not _has_index(inspector, "category_baselines", "ix_category_baselines_owner_email"):
+        op.create_index("ix_category_baselines_owner_email", "category_baselines", ["owner_email"], unique=False)
+    if not _has_index(inspector, "category_baselines", "ix_category_baselines_id"):
+        op.create_index("ix_category_baselines_id", "category_baselines", ["id"], unique=False)
+    # Filled by `python -m app.cli refresh-baselines` (run it from cron).
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _has_table(inspector, "category_baselines"):
+        op.drop_index("ix_category_baselines_id", table_name="category_baselines")
+        op.drop_index("ix_category_baselines_owner_email", table_name="category_baselines")
+        op.drop_table("category_baselines")
+    if _has_column(inspector, "expenses", "anomaly_reason"):
+        op.drop_column("expenses", "anomaly_reason")
+    if _has_column(inspector, "expenses", "anomaly_score"):
+        op.drop_column("expenses", "anomaly_score")
@@ -0,0 +1,92 @@
+"""
+Maintenance commands.
+
+Usage:
+    python -m app.cli rebuild-rollups [--owner EMAIL]
+    python -m app.cli ensure-partitions [--years-ahead N]
+    python -m app.cli detect-recurring [--owner EMAIL]
+    python -m app.cli refresh-baselines [--owner EMAIL]
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from app.db.session import SessionLocal
+from app.services.anomaly_service import anomaly_service
+from app.services.partition_service import partition_service
+from app.services.recurring_service import recurring_service
+from app.services.rollup_service import rollup_service
+
+
+def _rebuild_rollups(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        buckets = rollup_service.rebuild(db, owner_email=args.owner)
+    finally:
+        db.close()
+    scope = args.owner or "all owners"
+    print(f"Rebuilt {buckets} rollup buckets for {scope}.")
+
+
+def _ensure_partitions(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        created = partition_service.ensure_partitions(db, years_ahead=args.years_ahead)
+    finally:
+        db.close()
+    print(f"Created partitions: {', '.join(created)}" if created else "Partitions up to date.")
+
+
+def _detect_recurring(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        stored = recurring_service.rebuild(db, owner_email=args.owner)
+    finally:
+        db.close()
+    scope = args.owner or "all owners"
+    print(f"Detected {stored} recurring payments for {scope}.")
+
+
+def _refresh_baselines(args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        stored = anomaly_service.refresh_baselines(db, owner_email=args.owner)
+    finally:
+        db.close()
+    scope = args.owner or "all owners"
+    print(f"Stored {stored} category baselines for {scope}.")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="XTA maintenance commands.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subcommands.add_parser("rebuild-rollups", help="Recompute expense_rollups from the ledger.")
+    rebuild.add_argument("--owner", default=None, help="Only rebuild rollups for this owner email.")
+    rebuild.set_defaults(handler=_rebuild_rollups)
+
+    partitions = subcommands.add_parser(
+        "ensure-partitions", help="Create upcoming yearly partitions for expenses/expense_items (Postgres)."
+    )
+    partitions.add_argument("--years-ahead", type=int, default=None, help="Defaults to PARTITION_YEARS_AHEAD.")
+    partitions.set_defaults(handler=_ensure_partitions)
+
+    recurring = subcommands.add_parser(
+        "detect-recurring", help="Re-detect recurring payments from the whole ledger."
+    )
+    recurring.add_argument("--owner", default=None, help="Only re-detect for this owner email.")
+    recurring.set_defaults(handler=_detect_recurring)
+
+    baselines = subcommands.add_parser(
+        "refresh-baselines", help="Recompute per-category spend baselines used to flag unusual charges."
+    )
+    baselines.add_argument("--owner", default=None, help="Only refresh baselines for this owner email.")
+    baselines.set_defaults(handler=_refresh_baselines)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
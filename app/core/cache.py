@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import DateTime, Integer, String, column, select, table
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.security import ANONYMOUS_USER_EMAIL, resolve_request_user_email
+
+cache_lookups = registry.counter(
+    "xta_cache_lookups_total", "Result cache lookups by cache and result (hit, miss).", ("cache", "result")
+)
+cache_hit_ratio = registry.gauge(
+    "xta_cache_hit_ratio", "Share of lookups served from the cache since start (or the last clear).", ("cache",)
+)
+
+
+# Mirrors app.models.owner_data_version.OwnerDataVersion; a lightweight table keeps this module
+# free of the model (and so of app.db, which imports it).
+_owner_data_versions = table(
+    "owner_data_versions",
+    column("owner_email", String),
+    column("version", Integer),
+    column("rewrites", Integer),
+    column("modified_at", DateTime(timezone=True)),
+)
+
+# (version, rewrites, last write) of one owner.
+_Versions = tuple[int, int, datetime | None]
+
+# The request owner's (version, rewrites, last write), loaded once per request by
+# DataVersionsMiddleware. Threadpool and greenlet workers run in a copy of the
+# request's context and share the dict, so a bump is seen for the rest of it.
+_snapshot: ContextVar[dict[str, _Versions] | None] = ContextVar("xta_data_versions", default=None)
+
+
+class DataVersions:
+    """
+    Per-owner data versions, bumped by every write path.
+
+    Versions live in `owner_data_versions`, so every worker process (and the
+    CLI) sees the same ones: writers bump the owner's row inside their own
+    transaction, and requests read it once, up front, through
+    DataVersionsMiddleware. Outside a request `get` reads the row directly.
+    """
+
+    def __init__(self) -> None:
+        self._session_factory: Callable[[], Session] | None = None
+        self._async_session_factory: Callable[[], AsyncSession] | None = None
+
+    def bind(
+        self,
+        session_factory: Callable[[], Session],
+        async_session_factory: Callable[[], AsyncSession] | None = None,
+    ) -> None:
+        """Primary-database sessions to read versions through (set by app.main)."""
+        self._session_factory = session_factory
+        self._async_session_factory = async_session_factory
+
+    def get(self, owner_email: str) -> str:
+        return str(self._current(owner_email)[0])
+
+    def rewrites(self, owner_email: str) -> int:
+        """How many writes changed the owner's existing rows in place (see `bump`)."""
+        return self._current(owner_email)[1]
+
+    def last_modified(self, owner_email: str) -> datetime:
+        """Time of the owner's last write (the epoch, if none was recorded)."""
+        return self._current(owner_email)[2] or datetime.fromtimestamp(0, UTC)
+
+    def last_write(self, owner_email: str) -> datetime | None:
+        """Time of the owner's last write, if any was recorded."""
+        return self._current(owner_email)[2]
+
+    def bump(self, db: Session, *owner_emails: str, rewrite: bool = False) -> None:
+        """
+        Bumps the owners' versions in `db`'s transaction; they apply when it
+        commits. Pass `rewrite=True` when the write changed existing expense
+        rows in place, which append-only consumers (the analytics cube) can't
+        detect from the row count.
+        """
+        if not owner_emails:
+            return
+        now = datetime.now(UTC)
+        rewrites = int(rewrite)
+        insert_fn = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        # In a fixed order, so concurrent bulk bumps can't deadlock on each other's rows.
+        for owner_email in sorted(set(owner_emails)):
+            statement = insert_fn(_owner_data_versions).values(
+                owner_email=owner_email, version=1, rewrites=rewrites, modified_at=now
+            )
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["owner_email"],
+                    set_={
+                        "version": _owner_data_versions.c.version + 1,
+                        "rewrites": _owner_data_versions.c.rewrites + rewrites,
+                        "modified_at": now,
+                    },
+                )
+            )
+        snapshot = _snapshot.get()
+        if snapshot is not None:
+            snapshot.update(self._read(db, owner_emails))
+
+    async def load(self, owner_email: str) -> None:
+        """Reads the owner's version for the current request (see DataVersionsMiddleware)."""
+        if self._async_session_factory is None:
+            raise RuntimeError("data_versions is not bound to a database; call data_versions.bind()")
+        async with self._async_session_factory() as db:
+            versions = await db.run_sync(self._read, [owner_email])
+        _snapshot.set(versions)
+
+    def _current(self, owner_email: str) -> _Versions:
+        snapshot = _snapshot.get()
+        if snapshot is not None and owner_email in snapshot:
+            return snapshot[owner_email]
+        if self._session_factory is None:
+            raise RuntimeError("data_versions is not bound to a database; call data_versions.bind()")
+        with self._session_factory() as db:
+            return self._read(db, [owner_email])[owner_email]
+
+    @staticmethod
+    def _read(db: Session, owner_emails: Sequence[str]) -> dict[str, _Versions]:
+        rows = db.execute(
+            select(
+                _owner_data_versions.c.owner_email,
+                _owner_data_versions.c.version,
+                _owner_data_versions.c.rewrites,
+                _owner_data_versions.c.modified_at,
+            ).where(_owner_data_versions.c.owner_email.in_(owner_emails))
+        ).all()
+        versions: dict[str, _Versions] = dict.fromkeys(owner_emails, (0, 0, None))
+        for owner_email, version, rewrites, modified_at in rows:
+            # SQLite hands back naive datetimes; everything stored here is UTC.
+            if modified_at.tzinfo is None:
+                modified_at = modified_at.replace(tzinfo=UTC)
+            versions[owner_email] = (version, rewrites, modified_at)
+        return versions
+
+
+class DataVersionsMiddleware:
+    """Loads the requesting owner's data version once per request."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/static"):
+            await self.app(scope, receive, send)
+            return
+        owner_email = resolve_request_user_email(Request(scope))
+        if owner_email is None and not settings.AUTH_REQUIRED:
+            owner_email = ANONYMOUS_USER_EMAIL
+        if owner_email is None:
+            await self.app(scope, receive, send)
+            return
+        token = _snapshot.set(None)
+        try:
+            await data_versions.load(owner_email)
+            await self.app(scope, receive, send)
+        finally:
+            _snapshot.reset(token)
+
+
+class _Computation:
+    __slots__ = ("cacheable",)
+
+    def __init__(self) -> None:
+        self.cacheable = True
+
+
+_computation: ContextVar[_Computation | None] = ContextVar("xta_computation", default=None)
+
+
+@contextmanager
+def computation() -> Iterator[_Computation]:
+    """
+    Scope of one cacheable computation; `.cacheable` turns False when anything
+    inside calls `mark_uncacheable`. Nested scopes pass the flag outwards.
+    """
+    outer = _computation.get()
+    current = _Computation()
+    token = _computation.set(current)
+    try:
+        yield current
+    finally:
+        _computation.reset(token)
+        if outer is not None and not current.cacheable:
+            outer.cacheable = False
+
+
+def mark_uncacheable() -> None:
+    """Keeps the enclosing computation's result out of caches (e.g. it used fallback FX rates)."""
+    current = _computation.get()
+    if current is not None:
+        current.cacheable = False
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of computed payloads.
+
+    Entries are keyed by (owner, owner data version, caller key), so a write
+    makes every older entry for that owner unreachable; those simply age out.
+    `get_or_compute` doesn't store results marked uncacheable.
+    """
+
+    def __init__(self, max_entries: int, enabled: bool = True, name: str | None = None) -> None:
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            cache_hit_ratio.set_function(self.hit_ratio, cache=name)
+
+    def lookup(self, owner_email: str, key: Hashable, version: str | None = None) -> tuple[bool, Any]:
+        if not self.enabled:
+            return False, None
+        full_key = (owner_email, version or data_versions.get(owner_email), key)
+        with self._lock:
+            hit = full_key in self._entries
+            if hit:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                value = self._entries[full_key]
+            else:
+                self.misses += 1
+                value = None
+        if self.name:
+            cache_lookups.inc(cache=self.name, result="hit" if hit else "miss")
+        return hit, value
+
+    def store(self, owner_email: str, key: Hashable, value: Any, version: str | None = None) -> None:
+        if not self.enabled:
+            return
+        full_key = (owner_email, version or data_versions.get(owner_email), key)
+        with self._lock:
+            self._entries[full_key] = value
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, owner_email: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        # Capture the version before computing so a write racing with the
+        # computation can only make this entry unreachable, never stale.
+        version = data_versions.get(owner_email)
+        hit, value = self.lookup(owner_email, key, version=version)
+        if hit:
+            return value
+        with computation() as scope:
+            value = compute()
+        if scope.cacheable:
+            self.store(owner_email, key, value, version=version)
+        return value
+
+    async def get_or_compute_async(
+        self,
+        owner_email: str,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        version = data_versions.get(owner_email)
+        hit, value = self.lookup(owner_email, key, version=version)
+        if hit:
+            return value
+        with computation() as scope:
+            value = await compute()
+        if scope.cacheable:
+            self.store(owner_email, key, value, version=version)
+        return value
+
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+data_versions = DataVersions()
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    enabled=settings.RESULT_CACHE_ENABLED,
+    name="result",
+)
+query_cache = ResultCache(
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    enabled=settings.QUERY_CACHE_ENABLED,
+    name="query",
+)
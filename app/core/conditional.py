@@ -0,0 +1,94 @@
+"""Conditional GET support (ETag / Last-Modified) for per-owner JSON endpoints."""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import UTC, date, datetime, time
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from app.core.cache import computation, data_versions
+
+# Clients may keep responses but must revalidate them on every use.
+CACHE_CONTROL = "private, no-cache"
+
+
+def owner_etag(owner_email: str, key: Hashable) -> str:
+    """
+    Strong ETag over the owner's data version and the request parameters. The
+    version is read from the database, so every worker issues the same tag.
+    """
+    raw = repr((owner_email, data_versions.get(owner_email), key)).encode("utf-8")
+    return '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+
+
+def validator_headers(etag: str, last_modified: datetime) -> dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.replace(microsecond=0), usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+    }
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """
+    Evaluates If-None-Match / If-Modified-Since (RFC 9110 precedence: when
+    If-None-Match is present, If-Modified-Since is ignored).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def owner_last_modified(owner_email: str) -> datetime:
+    """
+    The owner's last write, but no earlier than today's local midnight: keys
+    carry today's date for relative ranges ("last month", rolling windows), so
+    If-Modified-Since must not outlive the day either.
+    """
+    midnight = datetime.combine(date.today(), time.min).astimezone(UTC)
+    return max(data_versions.last_modified(owner_email), midnight)
+
+
+async def conditional_json(
+    request: Request,
+    owner_email: str,
+    key: Hashable,
+    compute: Callable[[], Awaitable[Any]],
+) -> Response:
+    """
+    Returns 304 when the client's copy is current, otherwise the JSON from
+    `await compute()`. Validators are taken before computing, so a racing write
+    can only produce a stale-looking tag, never a stale body under a new one.
+
+    `compute` may return a Response instead, for bodies that must not be
+    revalidated against the data version (e.g. partial failures). Bodies
+    computed from fallback FX rates are sent `no-store` for the same reason.
+    """
+    etag = owner_etag(owner_email, key)
+    last_modified = owner_last_modified(owner_email)
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    with computation() as scope:
+        payload = await compute()
+    if isinstance(payload, Response):
+        return payload
+    if not scope.cacheable:
+        return JSONResponse(payload, headers={"Cache-Control": "no-store"})
+    return JSONResponse(payload, headers=headers)
@@ -29,16 +29,95 @@ class Settings:
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "xta_db")
     
+    # Connection pool, per engine and per worker process (the sync and async
+    # engines each get one). Recycle -1 keeps connections indefinitely; with
+    # pre-ping off, dead connections are only noticed when a query fails.
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = _parse_bool(os.getenv("DB_POOL_PRE_PING"), True)
+
+    # Optional read replicas (comma-separated postgresql:// URLs) for read-only
+    # analytics routes. Replicas lagging more than REPLICA_MAX_LAG_SECONDS are
+    # skipped; an owner's reads stay on the primary for READ_YOUR_WRITES_SECONDS
+    # after they write, which should be at least the allowed lag.
+    DATABASE_REPLICA_URLS: tuple[str, ...] = tuple(
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    )
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_CHECK_INTERVAL_SECONDS: float = float(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
     # 3. Security Config
     SECRET_KEY: str = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     AUTH_REQUIRED: bool = _parse_bool(os.getenv("AUTH_REQUIRED"), True)
     BASE_CURRENCY: str = os.getenv("BASE_CURRENCY", "EUR").upper()
     FX_API_URL: str = os.getenv("FX_API_URL", "https://api.frankfurter.app")
+    DISPLAY_CURRENCIES: tuple[str, ...] = tuple(
+        code.strip().upper()
+        for code in os.getenv("DISPLAY_CURRENCIES", "EUR,USD,GBP,INR").split(",")
+        if code.strip()
+    )
+
+    # Per-owner result cache for dashboard/chart payloads (invalidated on writes).
+    RESULT_CACHE_ENABLED: bool = _parse_bool(os.getenv("RESULT_CACHE_ENABLED"), True)
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+    # Per-owner cache of insight query results, keyed by normalized SQL + params.
+    QUERY_CACHE_ENABLED: bool = _parse_bool(os.getenv("QUERY_CACHE_ENABLED"), True)
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+
+    # LLM text-to-SQL for free-form insight questions (falls back to the keyword intents).
+    TEXT_TO_SQL_ENABLED: bool = _parse_bool(os.getenv("TEXT_TO_SQL_ENABLED"), False)
+    TEXT_TO_SQL_MAX_ROWS: int = int(os.getenv("TEXT_TO_SQL_MAX_ROWS", "50"))
+    SQL_PLAN_CACHE_MAX_ENTRIES: int = int(os.getenv("SQL_PLAN_CACHE_MAX_ENTRIES", "256"))
+    # Query guard for insight queries: Postgres statement_timeout, optional EXPLAIN
+    # cost ceiling (0 disables it) and a cap on rows fetched per query.
+    QUERY_STATEMENT_TIMEOUT_MS: int = int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS", "5000"))
+    QUERY_MAX_PLAN_COST: float = float(os.getenv("QUERY_MAX_PLAN_COST", "0"))
+    QUERY_MAX_ROWS: int = int(os.getenv("QUERY_MAX_ROWS", "10000"))
+
+    # Optional in-memory per-owner columnar cube for chart-data and insight intents.
+    ANALYTICS_CUBE_ENABLED: bool = _parse_bool(os.getenv("ANALYTICS_CUBE_ENABLED"), False)
+    ANALYTICS_CUBE_MAX_MB: int = int(os.getenv("ANALYTICS_CUBE_MAX_MB", "256"))
+
+    # Pinned saved queries run concurrently, at most this many connections at a time.
+    SAVED_QUERY_BATCH_CONCURRENCY: int = int(os.getenv("SAVED_QUERY_BATCH_CONCURRENCY", "4"))
+
+    # Anomaly flags for new rows, scored against per-category baselines that
+    # `python -m app.cli refresh-baselines` recomputes over a rolling window.
+    ANOMALY_BASELINE_WINDOW_DAYS: int = int(os.getenv("ANOMALY_BASELINE_WINDOW_DAYS", "365"))
+    ANOMALY_MIN_SAMPLES: int = int(os.getenv("ANOMALY_MIN_SAMPLES", "8"))
+    ANOMALY_RATIO: float = float(os.getenv("ANOMALY_RATIO", "3.0"))
+    ANOMALY_ROBUST_Z: float = float(os.getenv("ANOMALY_ROBUST_Z", "3.5"))
+
+    # Prometheus-format metrics at GET /metrics. Off by default: the endpoint has
+    # no login, so only enable it where the route isn't publicly reachable.
+    METRICS_ENABLED: bool = _parse_bool(os.getenv("METRICS_ENABLED"), False)
+
+    # Per-request SQL profiling for debugging: a Server-Timing header and log
+    # lines for repeated statement shapes (N+1) and slow queries with their plans.
+    SQL_PROFILER_ENABLED: bool = _parse_bool(os.getenv("SQL_PROFILER_ENABLED"), False)
+    SQL_PROFILER_SLOW_MS: float = float(os.getenv("SQL_PROFILER_SLOW_MS", "100"))
+    SQL_PROFILER_REPEAT_THRESHOLD: int = int(os.getenv("SQL_PROFILER_REPEAT_THRESHOLD", "5"))
+
+    # Yearly expense partitions kept ahead of the current year (Postgres only).
+    PARTITION_YEARS_AHEAD: int = int(os.getenv("PARTITION_YEARS_AHEAD", "2"))
 
     # 4. Construct the Database URL dynamically
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    # Same database through the asyncpg driver, for async read routes.
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
+    # Replica URLs through the asyncpg driver.
+    @property
+    def ASYNC_DATABASE_REPLICA_URLS(self) -> list[str]:
+        return [url.replace("postgresql://", "postgresql+asyncpg://", 1) for url in self.DATABASE_REPLICA_URLS]
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Request, database and outbound-call metrics (exposed at GET /metrics).
+
+- xta_http_requests_total / xta_http_request_seconds: per route template,
+  method and status, recorded by RequestMetricsMiddleware (plain ASGI, so no
+  extra task or response buffering per request);
+- xta_db_query_seconds: every SQL statement, from engine-level events;
+- xta_db_queries_per_request / xta_db_query_seconds_per_request: the same
+  statements summed per request, per route;
+- xta_llm_request_seconds / xta_llm_failures_total and xta_fx_request_seconds /
+  xta_fx_failures_total: outbound calls, wrapped with `timed` at the call site.
+
+Hot-path cost is a few perf_counter() calls and dictionary updates under a
+lock per request and per statement.
+"""
+
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.metrics import registry
+
+# Outbound calls take longer than requests; a slow LLM call can take a minute.
+CALL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+http_requests = registry.counter(
+    "xta_http_requests_total", "HTTP requests by method, route template and status code.", ("method", "route", "status")
+)
+http_seconds = registry.histogram(
+    "xta_http_request_seconds", "HTTP request latency by method and route template.", ("method", "route")
+)
+db_query_seconds = registry.histogram(
+    "xta_db_query_seconds", "Time per SQL statement (cursor execute).", buckets=QUERY_BUCKETS
+)
+db_queries_per_request = registry.histogram(
+    "xta_db_queries_per_request", "SQL statements per HTTP request.", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+db_seconds_per_request = registry.histogram(
+    "xta_db_query_seconds_per_request", "Total SQL time per HTTP request.", ("route",)
+)
+llm_seconds = registry.histogram(
+    "xta_llm_request_seconds", "LLM API call latency by operation.", ("operation",), buckets=CALL_BUCKETS
+)
+llm_failures = registry.counter("xta_llm_failures_total", "LLM API calls that raised, by operation.", ("operation",))
+fx_seconds = registry.histogram(
+    "xta_fx_request_seconds", "FX rate API call latency by provider.", ("provider",), buckets=CALL_BUCKETS
+)
+fx_failures = registry.counter("xta_fx_failures_total", "FX rate API calls that failed, by provider.", ("provider",))
+
+
+class _QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Set per request by the middleware; shared with threadpool and greenlet
+# workers, which run in a copy of the request's context.
+_query_stats: ContextVar[_QueryStats | None] = ContextVar("xta_query_stats", default=None)
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: Any, parameters: Any, context: Any, executemany: Any):
+    conn.info.setdefault("xta_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: Any, parameters: Any, context: Any, executemany: Any):
+    started = conn.info.get("xta_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_query_seconds.observe(elapsed)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+
+
+def instrument_queries() -> None:
+    """Times statements on every engine, including replicas and test engines. Idempotent."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_label(scope: dict[str, Any]) -> str:
+    """The matched route's path template; unmatched paths share one label to bound cardinality."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = _QueryStats()
+        token = _query_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _query_stats.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            http_requests.inc(method=method, route=route, status=str(status))
+            http_seconds.observe(elapsed, method=method, route=route)
+            db_queries_per_request.observe(stats.count, route=route)
+            db_seconds_per_request.observe(stats.seconds, route=route)
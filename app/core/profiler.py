@@ -0,0 +1,171 @@
+"""
+Opt-in per-request SQL profiler (SQL_PROFILER_ENABLED), for finding N+1
+queries and slow statements while debugging.
+
+Every statement a request runs is counted and timed by statement shape:
+the SQL with literals and IN-lists collapsed, so the same query for another
+id counts as a repeat. Per request it then:
+
+- adds `Server-Timing: db;dur=<ms>;desc="<n> queries"` to the response, which
+  browser dev tools show next to the request;
+- logs one line with the statement count and SQL time;
+- warns about shapes run SQL_PROFILER_REPEAT_THRESHOLD or more times
+  (usually a query in a loop);
+- warns about SELECTs slower than SQL_PROFILER_SLOW_MS, with the plan from
+  EXPLAIN (EXPLAIN QUERY PLAN on SQLite), run on the same connection with the
+  same parameters, inside a savepoint so a failing EXPLAIN doesn't abort the
+  request's transaction.
+
+The EXPLAIN adds a round trip per slow statement, so keep this off in
+production except while investigating.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with literals, bind parameters and IN-lists collapsed to `?`."""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _BIND_PARAMETER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+        self.slow: list[tuple[float, str, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.seconds += elapsed
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+
+# Set per request by the middleware; threadpool and greenlet workers run in a
+# copy of the request's context, so they record into the same profile.
+_profile: ContextVar[RequestProfile | None] = ContextVar("xta_sql_profile", default=None)
+
+
+def explain(conn: Any, statement: str, parameters: Any) -> str:
+    """The plan of a SELECT, one line per plan row; empty for other statements or on error."""
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return ""
+    sqlite = conn.dialect.name == "sqlite"
+    prefix = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+    # On Postgres a failed statement aborts the transaction, so the EXPLAIN runs
+    # in a savepoint and can't fail the request's next query. Not needed on
+    # SQLite or outside a transaction (autocommit).
+    savepoint = not sqlite and not getattr(conn.connection.dbapi_connection, "autocommit", False)
+    # A raw DB-API cursor, so the EXPLAIN isn't itself profiled.
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT xta_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(str(row[-1]) for row in cursor.fetchall())
+        except Exception:
+            logger.debug("EXPLAIN failed for %s", statement, exc_info=True)
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT xta_explain")
+            plan = ""
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT xta_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: Any, parameters: Any, context: Any, executemany: Any):
+    if _profile.get() is not None:
+        conn.info.setdefault("xta_profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: Any, parameters: Any, context: Any, executemany: Any):
+    profile = _profile.get()
+    started = conn.info.get("xta_profile_started")
+    if profile is None or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    profile.record(statement, elapsed)
+    if elapsed * 1000 >= settings.SQL_PROFILER_SLOW_MS and not executemany:
+        profile.slow.append((elapsed, statement, explain(conn, statement, parameters)))
+
+
+def profile_queries() -> None:
+    """Profiles statements on every engine while a request is being profiled. Idempotent."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SqlProfilerMiddleware:
+    def __init__(self, app: Any) -> None:
+        self.app = app
+        profile_queries()
+
+    async def __call__(self, scope: dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = _profile.set(profile)
+
+        async def send_with_timing(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", f'db;dur={profile.seconds * 1000:.1f};desc="{profile.count} queries"'
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _profile.reset(token)
+            self.report(f"{scope['method']} {scope['path']}", profile)
+
+    @staticmethod
+    def report(request_line: str, profile: RequestProfile) -> None:
+        logger.info("%s: %d SQL statements in %.1f ms", request_line, profile.count, profile.seconds * 1000)
+        for shape, times in profile.repeated(settings.SQL_PROFILER_REPEAT_THRESHOLD):
+            logger.warning("%s: same statement run %d times (N+1?): %s", request_line, times, shape)
+        for elapsed, statement, plan in profile.slow:
+            logger.warning(
+                "%s: slow statement (%.1f ms): %s\nPlan:\n%s",
+                request_line,
+                elapsed * 1000,
+                _WHITESPACE.sub(" ", statement).strip(),
+                plan or "(not available)",
+            )
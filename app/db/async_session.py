@@ -0,0 +1,37 @@
+from typing import Annotated
+
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.pool import engine_options, register_pool_gauges
+from app.db.replicas import replica_router
+
+# Async engine for `async def` read routes; writes still go through the sync
+# session in app.db.session. Both point at the same database.
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **engine_options("primary_async", is_async=True))
+register_pool_gauges(async_engine.sync_engine, "primary_async")
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Route parameter type for a primary async session.
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+async def get_async_read_db(request: Request, db: AsyncSessionDep):
+    """For read-only routes: a replica session when one is usable, else the primary's."""
+    replica = await replica_router.pick_async(request)
+    if replica is None:
+        yield db
+        return
+    async with replica.async_session_factory() as replica_db:
+        yield replica_db
+
+
+# Route parameter type for async read-only routes (replica or primary).
+AsyncReadSessionDep = Annotated[AsyncSession, Depends(get_async_read_db)]
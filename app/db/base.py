@@ -1,5 +1,18 @@
 from app.db.session import Base
+from app.models.category_baseline import CategoryBaseline
 from app.models.expense import Expense, ExpenseItem
+from app.models.expense_rollup import ExpenseRollup
+from app.models.owner_data_version import OwnerDataVersion
+from app.models.recurring_payment import RecurringPayment
 from app.models.saved_query import SavedQuery
 
-__all__ = ["Base", "Expense", "ExpenseItem", "SavedQuery"]
\ No newline at end of file
+__all__ = [
+    "Base",
+    "CategoryBaseline",
+    "Expense",
+    "ExpenseItem",
+    "ExpenseRollup",
+    "OwnerDataVersion",
+    "RecurringPayment",
+    "SavedQuery",
+]
\ No newline at end of file
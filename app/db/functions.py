@@ -0,0 +1,84 @@
+"""Dialect-aware SQL helpers shared by analytics queries."""
+
+from typing import ClassVar
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
+from sqlalchemy.types import Date, String
+
+
+class month_label(FunctionElement):
+    """Formats a date column as a 'YYYY-MM' bucket label."""
+
+    type = String()
+    name = "month_label"
+    inherit_cache = True
+
+
+@compiles(month_label)
+def _month_label_default(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"to_char({column}, 'YYYY-MM')"
+
+
+@compiles(month_label, "sqlite")
+def _month_label_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"strftime('%Y-%m', {column})"
+
+
+class month_start(FunctionElement):
+    """Truncates a date column to the first day of its month."""
+
+    type = Date()
+    name = "month_start"
+    inherit_cache = True
+
+
+@compiles(month_start)
+def _month_start_default(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"CAST(date_trunc('month', {column}) AS DATE)"
+
+
+@compiles(month_start, "sqlite")
+def _month_start_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"date({column}, 'start of month')"
+
+
+class date_bucket(FunctionElement):
+    """Truncates a date column to the start of its day/week/month bucket."""
+
+    type = Date()
+    name = "date_bucket"
+    inherit_cache = True
+    # Granularity changes the rendered SQL, so it must be part of the cache key.
+    _traverse_internals: ClassVar[list] = [
+        *FunctionElement._traverse_internals,
+        ("granularity", InternalTraversal.dp_string),
+    ]
+
+    def __init__(self, column, granularity: str):
+        if granularity not in ("day", "week", "month"):
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        self.granularity = granularity
+        super().__init__(column)
+
+
+@compiles(date_bucket)
+def _date_bucket_default(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"CAST(date_trunc('{element.granularity}', {column}) AS DATE)"
+
+
+@compiles(date_bucket, "sqlite")
+def _date_bucket_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    if element.granularity == "month":
+        return f"date({column}, 'start of month')"
+    if element.granularity == "week":
+        # ISO weeks start on Monday, matching date_trunc('week', ...).
+        return f"date({column}, 'weekday 0', '-6 days')"
+    return f"date({column})"
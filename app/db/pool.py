@@ -0,0 +1,89 @@
+"""
+Connection pool configuration and instrumentation shared by the sync and
+async engines.
+
+Pool metrics (at GET /metrics), labelled by pool name:
+- xta_db_pool_checkout_seconds: time to get a connection from the pool,
+  including waiting for a free one, pre-ping and opening new connections;
+- xta_db_pool_timeouts_total: checkouts that gave up after DB_POOL_TIMEOUT;
+- xta_db_pool_connections{state}: in_use, idle and overflow right now;
+- xta_db_pool_size: configured pool size (overflow comes on top).
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from sqlalchemy import exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+# Wider than the request buckets: a starved pool waits up to DB_POOL_TIMEOUT.
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+pool_checkout_seconds = registry.histogram(
+    "xta_db_pool_checkout_seconds",
+    "Time to check a connection out of the pool, including queueing for a free one.",
+    ("pool",),
+    buckets=CHECKOUT_BUCKETS,
+)
+pool_timeouts = registry.counter(
+    "xta_db_pool_timeouts_total",
+    "Connection checkouts that timed out waiting for the pool.",
+    ("pool",),
+)
+pool_connections = registry.gauge(
+    "xta_db_pool_connections",
+    "Pool connections by state (in_use, idle, overflow).",
+    ("pool", "state"),
+)
+pool_size = registry.gauge("xta_db_pool_size", "Configured pool size, excluding overflow.", ("pool",))
+
+
+class _TimedCheckout:
+    """Times every checkout; the pool's logging name is the metrics label."""
+
+    def connect(self) -> Any:
+        label = self._orig_logging_name or "default"
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_timeouts.inc(pool=label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started, pool=label)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(name: str, is_async: bool = False) -> dict[str, Any]:
+    """create_engine/create_async_engine keyword arguments for a Postgres pool."""
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+
+
+def register_pool_gauges(engine: Engine, name: str) -> None:
+    """Reads the engine's current pool at scrape time (dispose() swaps the pool object)."""
+    pool_connections.set_function(lambda: engine.pool.checkedout(), pool=name, state="in_use")
+    pool_connections.set_function(lambda: engine.pool.checkedin(), pool=name, state="idle")
+    # QueuePool.overflow() starts at -pool_size; only connections beyond the pool count.
+    pool_connections.set_function(lambda: max(engine.pool.overflow(), 0), pool=name, state="overflow")
+    pool_size.set_function(lambda: engine.pool.size(), pool=name)
@@ -0,0 +1,197 @@
+"""
+Routing of read-only routes to Postgres read replicas.
+
+Replicas are tried round-robin. Each one's replication lag is measured at
+most every REPLICA_CHECK_INTERVAL_SECONDS; a replica that lags more than
+REPLICA_MAX_LAG_SECONDS, or can't be reached, is skipped until the next
+check, and when none is usable the read goes to the primary. Writes never
+come here: they use `get_db` directly.
+
+Read-your-writes: after a successful write request, the owner's reads stay on
+the primary for READ_YOUR_WRITES_SECONDS. The worker that handled the write
+knows this from the owner's data version; other workers learn it from a
+short-lived cookie set on the write response.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from collections.abc import Sequence
+from datetime import UTC, datetime
+
+from fastapi import Request, Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import data_versions
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.security import resolve_request_user_email
+from app.db.pool import engine_options, register_pool_gauges
+
+logger = logging.getLogger(__name__)
+
+READ_PRIMARY_COOKIE = "xta_read_primary_until"
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Seconds behind the primary; 0 when every received WAL record is replayed
+# (an idle primary would otherwise look like growing lag).
+_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+read_routing = registry.counter(
+    "xta_db_read_routing_total",
+    "Read-only sessions by target (a replica name or primary) and reason.",
+    ("target", "reason"),
+)
+replica_lag = registry.gauge(
+    "xta_db_replica_lag_seconds",
+    "Replication lag at the last check (-1 when the replica could not be reached).",
+    ("replica",),
+)
+
+
+class Replica:
+    def __init__(self, name: str, url: str, async_url: str) -> None:
+        self.name = name
+        self.engine = create_engine(url, **engine_options(name))
+        self.async_engine: AsyncEngine = create_async_engine(
+            async_url, **engine_options(f"{name}_async", is_async=True)
+        )
+        register_pool_gauges(self.engine, name)
+        register_pool_gauges(self.async_engine.sync_engine, f"{name}_async")
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_session_factory = async_sessionmaker(
+            bind=self.async_engine, autoflush=False, expire_on_commit=False
+        )
+        # None until checked, or after a failed check.
+        self.lag: float | None = None
+        self.checked_at = float("-inf")
+
+    def check_due(self) -> bool:
+        return time.monotonic() - self.checked_at >= settings.REPLICA_CHECK_INTERVAL_SECONDS
+
+    def usable(self) -> bool:
+        return self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    @staticmethod
+    def measure(connection: Connection) -> float:
+        if connection.dialect.name != "postgresql":
+            return 0.0
+        return float(connection.execute(_LAG_SQL).scalar() or 0.0)
+
+    def record(self, lag: float | None) -> None:
+        self.lag = lag
+        self.checked_at = time.monotonic()
+        replica_lag.set(-1.0 if lag is None else lag, replica=self.name)
+        if lag is not None and lag > settings.REPLICA_MAX_LAG_SECONDS:
+            logger.warning("Replica %s is %.1fs behind; reading from other replicas or the primary", self.name, lag)
+
+    def check(self) -> None:
+        try:
+            with self.engine.connect() as connection:
+                lag = self.measure(connection)
+        except Exception:
+            logger.warning("Replica %s is unreachable", self.name, exc_info=True)
+            lag = None
+        self.record(lag)
+
+    async def check_async(self) -> None:
+        try:
+            async with self.async_engine.connect() as connection:
+                lag = await connection.run_sync(self.measure)
+        except Exception:
+            logger.warning("Replica %s is unreachable", self.name, exc_info=True)
+            lag = None
+        self.record(lag)
+
+
+class ReplicaRouter:
+    def __init__(self, replicas: Sequence[Replica] = ()) -> None:
+        self.replicas = list(replicas)
+        self._turns = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> ReplicaRouter:
+        return cls(
+            Replica(f"replica{position}", url, async_url)
+            for position, (url, async_url) in enumerate(
+                zip(settings.DATABASE_REPLICA_URLS, settings.ASYNC_DATABASE_REPLICA_URLS), start=1
+            )
+        )
+
+    def pick(self, request: Request) -> Replica | None:
+        """A usable replica for this read-only request, or None for the primary."""
+        if not self._wants_replica(request):
+            return None
+        for replica in self._rotation():
+            if replica.check_due():
+                replica.check()
+            if replica.usable():
+                return self._routed(replica)
+        return self._routed(None, "lagging")
+
+    async def pick_async(self, request: Request) -> Replica | None:
+        if not self._wants_replica(request):
+            return None
+        for replica in self._rotation():
+            if replica.check_due():
+                await replica.check_async()
+            if replica.usable():
+                return self._routed(replica)
+        return self._routed(None, "lagging")
+
+    def _wants_replica(self, request: Request) -> bool:
+        if not self.replicas:
+            return False
+        if self.recently_wrote(request):
+            self._routed(None, "read_your_writes")
+            return False
+        return True
+
+    @staticmethod
+    def recently_wrote(request: Request) -> bool:
+        try:
+            if float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time():
+                return True
+        except ValueError:
+            pass
+        owner_email = resolve_request_user_email(request)
+        last_write = data_versions.last_write(owner_email) if owner_email else None
+        if last_write is None:
+            return False
+        return (datetime.now(UTC) - last_write).total_seconds() < settings.READ_YOUR_WRITES_SECONDS
+
+    def _rotation(self) -> list[Replica]:
+        with self._lock:
+            start = next(self._turns) % len(self.replicas)
+        return self.replicas[start:] + self.replicas[:start]
+
+    @staticmethod
+    def _routed(replica: Replica | None, reason: str = "healthy") -> Replica | None:
+        read_routing.inc(target=replica.name if replica else "primary", reason=reason)
+        return replica
+
+    def mark_write(self, request: Request, response: Response) -> None:
+        """Pins the client's reads to the primary after a successful write request."""
+        if not self.replicas or request.method in _SAFE_METHODS or response.status_code >= 400:
+            return
+        window = settings.READ_YOUR_WRITES_SECONDS
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            f"{time.time() + window:.0f}",
+            max_age=max(1, int(window)),
+            httponly=True,
+            samesite="lax",
+        )
+
+
+replica_router = ReplicaRouter.from_settings()
@@ -1,10 +1,16 @@
+from typing import Annotated
+
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 # 1. ADD THIS IMPORT:
 from sqlalchemy.ext.declarative import declarative_base 
 from app.core.config import settings
+from app.db.pool import engine_options, register_pool_gauges
+from app.db.replicas import replica_router
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(settings.DATABASE_URL, **engine_options("primary"))
+register_pool_gauges(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # 2. DEFINE BASE HERE (So models can import it):
@@ -15,4 +21,25 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Route parameter type for a primary session.
+SessionDep = Annotated[Session, Depends(get_db)]
+
+
+def get_read_db(request: Request, db: SessionDep):
+    """For read-only routes: a replica session when one is usable, else the primary's."""
+    replica = replica_router.pick(request)
+    if replica is None:
+        yield db
+        return
+    replica_db = replica.session_factory()
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
+
+
+# Route parameter type for read-only routes (replica or primary).
+ReadSessionDep = Annotated[Session, Depends(get_read_db)]
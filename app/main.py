@@ -1,18 +1,25 @@
 import os
-from datetime import date, timedelta
+from datetime import date
 
-from fastapi import Depends, FastAPI, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import text, func
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.core.cache import DataVersionsMiddleware, data_versions, result_cache
 from app.core.config import settings
+from app.core.instrumentation import RequestMetricsMiddleware, instrument_queries
+from app.core.metrics import registry as metrics_registry
+from app.core.profiler import SqlProfilerMiddleware
 from app.core.security import require_user_email
-from app.db.session import get_db
+from app.db.async_session import AsyncSessionLocal
+from app.db.replicas import replica_router
+from app.db.session import ReadSessionDep, SessionLocal, get_db
 from app.routers import expenses, insights, upload
-from app.models.expense import Expense
+from app.services.dashboard_service import dashboard_service
+from app.services.reporting import reporting_service
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -33,15 +40,39 @@ app.include_router(upload.router)
 app.include_router(expenses.router)
 app.include_router(insights.router)
 
+
+@app.middleware("http")
+async def keep_reads_on_primary_after_writes(request: Request, call_next):
+    response = await call_next(request)
+    replica_router.mark_write(request, response)
+    return response
+
+
+data_versions.bind(SessionLocal, AsyncSessionLocal)
+app.add_middleware(DataVersionsMiddleware)
+
+
+if settings.SQL_PROFILER_ENABLED:
+    app.add_middleware(SqlProfilerMiddleware)
+
+
+if settings.METRICS_ENABLED:
+    # Outermost, so the timings include the other middleware.
+    app.add_middleware(RequestMetricsMiddleware)
+    instrument_queries()
+
+
 @app.get("/")
 def read_root(
     request: Request,
+    db: ReadSessionDep,
     month: str | None = Query(default=None),
     start_date: str | None = Query(default=None),
     end_date: str | None = Query(default=None),
-    db: Session = Depends(get_db),
+    currency: str | None = Query(default=None),
 ):
     user_email = require_user_email(request)
+    display_currency = reporting_service.resolve_display_currency(currency)
     parsed_start = None
     parsed_end = None
     month_mode = False
@@ -68,104 +99,19 @@ def read_root(
             parsed_start = None
             parsed_end = None
 
-    base_query = db.query(Expense).filter(Expense.owner_email == user_email)
-    if parsed_start:
-        base_query = base_query.filter(Expense.date >= parsed_start)
-    if parsed_end:
-        if month_mode:
-            base_query = base_query.filter(Expense.date < parsed_end)
-        else:
-            base_query = base_query.filter(Expense.date <= parsed_end)
-
-    # 1) Selected range spend and count
-    total_spent = base_query.with_entities(func.sum(Expense.base_currency_amount)).scalar() or 0.0
-    recent_count = base_query.count()
-    avg_spent = (total_spent / recent_count) if recent_count > 0 else 0.0
-
-    # 2) Rolling 30-day and previous-30-day spend for quick trend context.
     today = date.today()
-    rolling_start = today - timedelta(days=30)
-    previous_start = rolling_start - timedelta(days=30)
-    rolling_30d_spend = (
-        db.query(func.sum(Expense.base_currency_amount))
-        .filter(
-            Expense.owner_email == user_email,
-            Expense.date >= rolling_start,
-            Expense.date <= today,
-        )
-        .scalar()
-        or 0.0
-    )
-    previous_30d_spend = (
-        db.query(func.sum(Expense.base_currency_amount))
-        .filter(
-            Expense.owner_email == user_email,
-            Expense.date >= previous_start,
-            Expense.date < rolling_start,
-        )
-        .scalar()
-        or 0.0
-    )
-    spend_delta_pct = 0.0
-    if previous_30d_spend > 0:
-        spend_delta_pct = ((rolling_30d_spend - previous_30d_spend) / previous_30d_spend) * 100.0
-
-    # 3) Top category in selected range
-    top_category_row = (
-        db.query(Expense.category, func.sum(Expense.base_currency_amount).label("amount"))
-        .filter(
-            Expense.owner_email == user_email,
-        )
-    )
-    if parsed_start:
-        top_category_row = top_category_row.filter(Expense.date >= parsed_start)
-    if parsed_end:
-        if month_mode:
-            top_category_row = top_category_row.filter(Expense.date < parsed_end)
-        else:
-            top_category_row = top_category_row.filter(Expense.date <= parsed_end)
-    top_category_row = (
-        top_category_row
-        .group_by(Expense.category)
-        .order_by(func.sum(Expense.base_currency_amount).desc())
-        .first()
-    )
-    top_category_name = top_category_row[0] if top_category_row else "N/A"
-    top_category_amount = float(top_category_row[1]) if top_category_row else 0.0
-
-    monthly_rollup: dict[str, float] = {}
-    twelve_month_start = today - timedelta(days=365)
-    recent_year_rows = (
-        db.query(Expense.date, Expense.base_currency_amount)
-        .filter(
-            Expense.owner_email == user_email,
-            Expense.date >= twelve_month_start,
-            Expense.date <= today,
-        )
-        .all()
-    )
-    for tx_date, tx_amount in recent_year_rows:
-        key = tx_date.strftime("%Y-%m")
-        monthly_rollup[key] = monthly_rollup.get(key, 0.0) + float(tx_amount or 0.0)
-    spend_12m_total = sum(monthly_rollup.values())
-    avg_12m_monthly = (spend_12m_total / len(monthly_rollup)) if monthly_rollup else 0.0
-    latest_month_label = max(monthly_rollup.keys()) if monthly_rollup else "N/A"
-
-    # 5) Get Recent Activity (Last 5 expenses) in selected range
-    recent_expenses = (
-        base_query.order_by(Expense.date.desc(), Expense.id.desc()).limit(5).all()
-    )
-    monthly_rollup: dict[str, float] = {}
-    for tx_date, tx_amount in recent_year_rows:
-        key = tx_date.strftime("%Y-%m")
-        monthly_rollup[key] = monthly_rollup.get(key, 0.0) + float(tx_amount or 0.0)
-    spend_12m_total = sum(monthly_rollup.values())
-    avg_12m_monthly = (spend_12m_total / len(monthly_rollup)) if monthly_rollup else 0.0
-    latest_month_label = max(monthly_rollup.keys()) if monthly_rollup else "N/A"
-
-    # 5) Get Recent Activity (Last 5 expenses) in selected range
-    recent_expenses = (
-        base_query.order_by(Expense.date.desc(), Expense.id.desc()).limit(5).all()
+    metrics = result_cache.get_or_compute(
+        user_email,
+        ("dashboard", parsed_start, parsed_end, month_mode, display_currency, today),
+        lambda: dashboard_service.compute(
+            db=db,
+            owner_email=user_email,
+            start_date=parsed_start,
+            end_date=parsed_end,
+            month_mode=month_mode,
+            display_currency=display_currency,
+            today=today,
+        ),
     )
 
     return templates.TemplateResponse(
@@ -174,32 +120,35 @@ def read_root(
         context={
             **_inject_common_template_context(request),
             "app_name": settings.PROJECT_NAME,
-            "total_spent": total_spent,
-            "total_spent_display": f"{total_spent:.2f}",
-            "recent_count": recent_count,
-            "recent_expenses": recent_expenses,
+            "total_spent": metrics.total_spent,
+            "total_spent_display": f"{metrics.total_spent:.2f}",
+            "recent_count": metrics.recent_count,
+            "recent_expenses": metrics.recent_expenses,
             "base_currency": settings.BASE_CURRENCY,
-            "avg_spent": avg_spent,
-            "avg_spent_display": f"{avg_spent:.2f}",
-            "top_category": top_category_name,
-            "top_category_name": top_category_name,
-            "top_category_amount": top_category_amount,
-            "top_category_amount_display": f"{top_category_amount:.2f}",
-            "rolling_30d_spend": rolling_30d_spend,
-            "rolling_30d_spend_display": f"{rolling_30d_spend:.2f}",
-            "spend_delta_pct": f"{spend_delta_pct:.1f}",
-            "spend_delta_pct_value": spend_delta_pct,
-            "spend_delta_pct_display": f"{spend_delta_pct:.1f}",
-            "previous_30d_spend": previous_30d_spend,
-            "previous_30d_spend_display": f"{previous_30d_spend:.2f}",
-            "spend_12m_total": spend_12m_total,
-            "spend_12m_total_display": f"{spend_12m_total:.2f}",
-            "avg_12m_monthly": avg_12m_monthly,
-            "avg_12m_monthly_display": f"{avg_12m_monthly:.2f}",
-            "latest_month_label": latest_month_label,
+            "display_currency": display_currency,
+            "display_currencies": settings.DISPLAY_CURRENCIES,
+            "avg_spent": metrics.avg_spent,
+            "avg_spent_display": f"{metrics.avg_spent:.2f}",
+            "top_category": metrics.top_category_name,
+            "top_category_name": metrics.top_category_name,
+            "top_category_amount": metrics.top_category_amount,
+            "top_category_amount_display": f"{metrics.top_category_amount:.2f}",
+            "rolling_30d_spend": metrics.rolling_30d_spend,
+            "rolling_30d_spend_display": f"{metrics.rolling_30d_spend:.2f}",
+            "spend_delta_pct": f"{metrics.spend_delta_pct:.1f}",
+            "spend_delta_pct_value": metrics.spend_delta_pct,
+            "spend_delta_pct_display": f"{metrics.spend_delta_pct:.1f}",
+            "previous_30d_spend": metrics.previous_30d_spend,
+            "previous_30d_spend_display": f"{metrics.previous_30d_spend:.2f}",
+            "spend_12m_total": metrics.spend_12m_total,
+            "spend_12m_total_display": f"{metrics.spend_12m_total:.2f}",
+            "avg_12m_monthly": metrics.avg_12m_monthly,
+            "avg_12m_monthly_display": f"{metrics.avg_12m_monthly:.2f}",
+            "latest_month_label": metrics.latest_month_label,
             "filter_month": month or "",
             "filter_start_date": start_date or "",
             "filter_end_date": end_date or "",
+            "filter_currency": display_currency,
             "app_version": settings.PROJECT_VERSION,
         },
     )
@@ -223,4 +172,12 @@ def health_check(db: Session = Depends(get_db)):
                 "version": settings.PROJECT_VERSION,
                 "base_currency": settings.BASE_CURRENCY,
             },
-        )
\ No newline at end of file
+        )
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    # Prometheus text format; aggregates only, no per-user data.
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Date, Float, Integer, String, UniqueConstraint
+
+from app.db.session import Base
+
+
+class CategoryBaseline(Base):
+    """Rolling base-currency spend statistics per (owner, category), used to score new rows."""
+
+    __tablename__ = "category_baselines"
+    __table_args__ = (
+        UniqueConstraint("owner_email", "category", name="uq_category_baselines_owner_category"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_email = Column(String, index=True, nullable=False)
+    category = Column(String, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    median = Column(Float, nullable=False)
+    mad = Column(Float, nullable=False)  # Median absolute deviation.
+    p90 = Column(Float, nullable=False)
+    p95 = Column(Float, nullable=False)
+    p99 = Column(Float, nullable=False)
+    window_start = Column(Date, nullable=False)
+    window_end = Column(Date, nullable=False)
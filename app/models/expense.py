@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    Column,
+    Date,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+    func,
+)
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base
@@ -6,6 +16,18 @@ from app.db.session import Base
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Owner + date range is the shape of every dashboard/chart query; on
+        # Postgres the INCLUDE columns let aggregates run as index-only scans.
+        Index(
+            "ix_expenses_owner_date",
+            "owner_email",
+            "date",
+            postgresql_include=["base_currency_amount", "category"],
+        ),
+        # Duplicate detection in statement/receipt imports.
+        Index("ix_expenses_owner_dedup", "owner_email", "date", "amount", "currency", "vendor"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     owner_email = Column(String, index=True, nullable=False)
@@ -20,6 +42,9 @@ class Expense(Base):
     description = Column(String, nullable=True)
     receipt_url = Column(String, nullable=True)
     source_type = Column(String, nullable=False, default="manual")
+    # Set when the row is scored at import time against the owner's category baseline.
+    anomaly_score = Column(Float, nullable=True)
+    anomaly_reason = Column(String, nullable=True)
 
     items = relationship("ExpenseItem", back_populates="expense", cascade="all, delete-orphan")
 
@@ -28,9 +53,27 @@ class ExpenseItem(Base):
     __tablename__ = "expense_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"))
+    expense_id = Column(Integer, ForeignKey("expenses.id", ondelete="CASCADE"), index=True)
     name = Column(String, nullable=False)
     quantity = Column(Float, default=1.0)
     price = Column(Float, nullable=False)
+    # Copy of the parent's date: the partition key of expense_items on Postgres.
+    expense_date = Column(Date, nullable=False)
 
-    expense = relationship("Expense", back_populates="items")
\ No newline at end of file
+    expense = relationship("Expense", back_populates="items")
+
+
+# Fuzzy item lookups (`lower(name) LIKE '%tomato%'`); on Postgres a pg_trgm GIN
+# index, which also serves leading-wildcard patterns.
+Index(
+    "ix_expense_items_name_trgm",
+    func.lower(ExpenseItem.name).label("name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"name_lower": "gin_trgm_ops"},
+)
+
+
+@event.listens_for(ExpenseItem, "before_insert")
+def _copy_parent_date(mapper, connection, target: ExpenseItem) -> None:
+    if target.expense_date is None and target.expense is not None:
+        target.expense_date = target.expense.date
\ No newline at end of file
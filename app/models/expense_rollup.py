@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Date, Float, Integer, String, UniqueConstraint
+
+from app.db.session import Base
+
+
+class ExpenseRollup(Base):
+    """Monthly base-currency totals per (owner, month, category, vendor)."""
+
+    __tablename__ = "expense_rollups"
+    __table_args__ = (
+        UniqueConstraint("owner_email", "month", "category", "vendor", name="uq_expense_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_email = Column(String, index=True, nullable=False)
+    month = Column(Date, nullable=False)  # First day of the month.
+    category = Column(String, nullable=False, default="Uncategorized")
+    vendor = Column(String, nullable=False)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    tx_count = Column(Integer, nullable=False, default=0)
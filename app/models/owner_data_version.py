@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, String
+
+from app.db.session import Base
+
+
+class OwnerDataVersion(Base):
+    """Per-owner write counter behind cache keys and ETags (see app.core.cache.DataVersions)."""
+
+    __tablename__ = "owner_data_versions"
+
+    owner_email = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    rewrites = Column(Integer, nullable=False)  # Writes that changed existing rows in place.
+    modified_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Date, Float, Integer, String, UniqueConstraint
+
+from app.db.session import Base
+
+
+class RecurringPayment(Base):
+    """A detected recurring charge (subscription, rent, ...) per (owner, normalized vendor)."""
+
+    __tablename__ = "recurring_payments"
+    __table_args__ = (
+        UniqueConstraint("owner_email", "vendor_key", name="uq_recurring_payments_owner_vendor"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_email = Column(String, index=True, nullable=False)
+    vendor_key = Column(String, nullable=False)  # Normalized vendor the charges were grouped by.
+    vendor = Column(String, nullable=False)  # Most recent spelling, for display.
+    cadence = Column(String, nullable=False)  # weekly, biweekly, monthly, quarterly, yearly
+    interval_days = Column(Float, nullable=False)  # Median days between charges.
+    amount = Column(Float, nullable=False)  # Median charge in base currency.
+    amount_variation = Column(Float, nullable=False, default=0.0)  # Median absolute deviation / median.
+    occurrences = Column(Integer, nullable=False)
+    first_date = Column(Date, nullable=False)
+    last_date = Column(Date, nullable=False)
+    next_expected_date = Column(Date, nullable=False)
+    confidence = Column(Float, nullable=False)
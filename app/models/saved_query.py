@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Text
+from sqlalchemy import JSON, Boolean, Column, Integer, String, Text
 
 from app.db.session import Base
 
@@ -10,6 +10,10 @@ class SavedQuery(Base):
     owner_email = Column(String, index=True, nullable=False)
     name = Column(String, nullable=False)
     question = Column(Text, nullable=False)
+    # Resolved intent + filter params are what gets executed; sql_query is the
+    # server-generated SQL kept for display only.
+    intent = Column(String, nullable=True)
+    params = Column(JSON, nullable=True)
     sql_query = Column(Text, nullable=False)
     chart_type = Column(String, nullable=False, default="bar")
     is_pinned = Column(Boolean, nullable=False, default=False)
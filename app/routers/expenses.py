@@ -1,22 +1,41 @@
-from datetime import datetime
+from datetime import date as DateType
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Query, Request
-from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
 
+from app.core.cache import data_versions, result_cache
+from app.core.conditional import conditional_json
 from app.core.config import settings
 from app.core.parsing import parse_filter_dates, parse_iso_date
 from app.core.security import require_user_email
-from app.db.session import get_db
+from app.db.async_session import AsyncReadSessionDep, AsyncSessionDep
+from app.db.session import SessionDep, get_db
 from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
 from app.models.saved_query import SavedQuery
-from app.services.finance import fx_service
+from app.services.analytics_cube import analytics_cube
+from app.services.anomaly_service import anomaly_service
+from app.services.export_service import export_service
+from app.services.finance import RateMatrix, fx_service
+from app.services.forecast_service import forecast_service
+from app.services.recurring_service import recurring_service
+from app.services.reporting import reporting_service
+from app.services.rollup_service import rollup_service
+from app.services.trend_service import trend_service
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
+# Rows rendered per page of the expense list; further pages load on scroll.
+EXPENSE_PAGE_SIZE = 50
+
 
 @router.post("/expenses/confirm")
 async def confirm_expense(
@@ -49,6 +68,10 @@ async def confirm_expense(
         source_type="manual",
     )
     db.add(new_expense)
+    rollup_service.record(db, [new_expense])
+    recurring_service.refresh(db, user_email, [vendor])
+    anomaly_service.score(db, user_email, [new_expense])
+    data_versions.bump(db, user_email)
     db.commit()
     db.refresh(new_expense)
     return {"status": "success", "id": new_expense.id}
@@ -56,111 +79,338 @@ async def confirm_expense(
 @router.get("/expenses", response_class=HTMLResponse)
 async def my_expenses(
     request: Request,
+    db: AsyncSessionDep,
     month: str | None = Query(default=None),
     start_date: str | None = Query(default=None),
     end_date: str | None = Query(default=None),
-    db: Session = Depends(get_db),
+    currency: str | None = Query(default=None),
 ):
     user_email = require_user_email(request)
-    query = db.query(Expense).filter(Expense.owner_email == user_email)
-    filter_start, filter_end, month_mode = parse_filter_dates(month=month, start_date=start_date, end_date=end_date)
-    if filter_start:
-        query = query.filter(Expense.date >= filter_start)
-    if filter_end:
-        # End date is inclusive for explicit range; exclusive when derived from month.
-        if month_mode:
-            query = query.filter(Expense.date < filter_end)
-        else:
-            query = query.filter(Expense.date <= filter_end)
-    expenses = query.order_by(Expense.date.desc()).all()
+    expenses, next_cursor = await _expense_page(db, user_email, month, start_date, end_date, cursor=None)
+    pinned_queries = (
+        await db.scalars(
+            select(SavedQuery)
+            .where(SavedQuery.owner_email == user_email, SavedQuery.is_pinned.is_(True))
+            .order_by(SavedQuery.id.desc())
+        )
+    ).all()
     return templates.TemplateResponse(
         request=request,
         name="expenses.html",
         context={
             "request": request,
             "expenses": expenses,
+            "next_page_url": _next_page_url(month, start_date, end_date, next_cursor),
             "base_currency": settings.BASE_CURRENCY,
-            "pinned_queries": (
-                db.query(SavedQuery)
-                .filter(SavedQuery.owner_email == user_email, SavedQuery.is_pinned.is_(True))
-                .order_by(SavedQuery.id.desc())
-                .all()
-            ),
+            "pinned_queries": pinned_queries,
             "filter_month": month or "",
             "filter_start_date": start_date or "",
             "filter_end_date": end_date or "",
+            "filter_currency": reporting_service.resolve_display_currency(currency),
+            "display_currencies": settings.DISPLAY_CURRENCIES,
             "app_version": settings.PROJECT_VERSION,
         },
     )
 
+
+@router.get("/expenses/rows", response_class=HTMLResponse)
+async def expense_rows(
+    request: Request,
+    db: AsyncSessionDep,
+    cursor: str = Query(...),
+    month: str | None = Query(default=None),
+    start_date: str | None = Query(default=None),
+    end_date: str | None = Query(default=None),
+):
+    """HTMX fragment: the next page of expense rows after `cursor`."""
+    user_email = require_user_email(request)
+    expenses, next_cursor = await _expense_page(db, user_email, month, start_date, end_date, cursor=cursor)
+    return templates.TemplateResponse(
+        request=request,
+        name="expense_rows.html",
+        context={
+            "request": request,
+            "expenses": expenses,
+            "next_page_url": _next_page_url(month, start_date, end_date, next_cursor),
+            "base_currency": settings.BASE_CURRENCY,
+        },
+    )
+
+
+async def _expense_page(
+    db: AsyncSession,
+    user_email: str,
+    month: str | None,
+    start_date: str | None,
+    end_date: str | None,
+    cursor: str | None,
+) -> tuple[list[Expense], str | None]:
+    """
+    One page of expenses, newest first, seeking past `cursor` on (date, id)
+    so the cost of a page does not depend on how deep into the ledger it is.
+    """
+    query = select(Expense).where(Expense.owner_email == user_email)
+    filter_start, filter_end, month_mode = parse_filter_dates(month=month, start_date=start_date, end_date=end_date)
+    if filter_start:
+        query = query.where(Expense.date >= filter_start)
+    if filter_end:
+        # End date is inclusive for explicit range; exclusive when derived from month.
+        if month_mode:
+            query = query.where(Expense.date < filter_end)
+        else:
+            query = query.where(Expense.date <= filter_end)
+    if cursor:
+        cursor_date, cursor_id = _parse_cursor(cursor)
+        query = query.where(tuple_(Expense.date, Expense.id) < tuple_(cursor_date, cursor_id))
+    rows = (
+        await db.scalars(query.order_by(Expense.date.desc(), Expense.id.desc()).limit(EXPENSE_PAGE_SIZE + 1))
+    ).all()
+    if len(rows) <= EXPENSE_PAGE_SIZE:
+        return list(rows), None
+    last = rows[EXPENSE_PAGE_SIZE - 1]
+    return list(rows[:EXPENSE_PAGE_SIZE]), f"{last.date.isoformat()}_{last.id}"
+
+
+def _parse_cursor(cursor: str) -> tuple[DateType, int]:
+    try:
+        raw_date, raw_id = cursor.split("_", 1)
+        return DateType.fromisoformat(raw_date), int(raw_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _next_page_url(
+    month: str | None,
+    start_date: str | None,
+    end_date: str | None,
+    cursor: str | None,
+) -> str | None:
+    if cursor is None:
+        return None
+    params = {"month": month, "start_date": start_date, "end_date": end_date, "cursor": cursor}
+    return "/expenses/rows?" + urlencode({key: value for key, value in params.items() if value})
+
+
 @router.delete("/expenses/{expense_id}")
 async def delete_expense(expense_id: int, request: Request, db: Session = Depends(get_db)):
     user_email = require_user_email(request)
     expense = db.query(Expense).filter(Expense.id == expense_id, Expense.owner_email == user_email).first()
     if expense:
+        rollup_service.record(db, [expense], sign=-1)
         db.delete(expense)
+        recurring_service.refresh(db, user_email, [expense.vendor])
+        data_versions.bump(db, user_email)
         db.commit()
         return ""
     raise HTTPException(status_code=404, detail="Expense not found")
 
+@router.get("/api/expenses/export")
+async def export_expenses(
+    request: Request,
+    db: SessionDep,
+    format: str = Query(default="csv"),
+    month: str | None = Query(default=None),
+    start_date: str | None = Query(default=None),
+    end_date: str | None = Query(default=None),
+):
+    """Streams the filtered ledger as CSV, or as a ZIP with the receipt files (format=zip)."""
+    user_email = require_user_email(request)
+    export_format = (format or "csv").strip().lower()
+    if export_format not in ("csv", "zip"):
+        raise HTTPException(status_code=400, detail="format must be csv or zip")
+    filter_start, filter_end, month_mode = parse_filter_dates(month=month, start_date=start_date, end_date=end_date)
+    conditions = []
+    if filter_start:
+        conditions.append(Expense.date >= filter_start)
+    if filter_end:
+        conditions.append(Expense.date < filter_end if month_mode else Expense.date <= filter_end)
+
+    # The body is produced after this handler returns, so the export reads
+    # through its own session rather than the request-scoped one.
+    session_factory = sessionmaker(bind=db.get_bind(), autocommit=False, autoflush=False)
+    if filter_start and filter_end:
+        label = month if month_mode else f"{filter_start.isoformat()}_{filter_end.isoformat()}"
+    else:
+        label = "all"
+    if export_format == "zip":
+        body = export_service.iter_zip(session_factory, user_email, conditions)
+        media_type = "application/zip"
+    else:
+        body = export_service.iter_csv(session_factory, user_email, conditions)
+        media_type = "text/csv; charset=utf-8"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="xta-expenses-{label}.{export_format}"'},
+    )
+
+
+@router.get("/api/recurring")
+async def get_recurring_payments(request: Request, db: AsyncSessionDep):
+    """Detected subscriptions and other recurring charges (maintained on import, not per view)."""
+    user_email = require_user_email(request)
+
+    async def compute() -> dict:
+        return await db.run_sync(recurring_service.overview, user_email)
+
+    return await conditional_json(request, user_email, ("recurring", DateType.today()), compute)
+
+
+@router.get("/api/anomalies")
+async def get_anomalies(request: Request, db: AsyncSessionDep):
+    """Charges flagged as unusual when they were imported (last 90 days)."""
+    user_email = require_user_email(request)
+
+    async def compute() -> dict:
+        return await db.run_sync(anomaly_service.recent, user_email)
+
+    return await conditional_json(request, user_email, ("anomalies", DateType.today()), compute)
+
+
+@router.get("/api/forecast")
+async def get_forecast(request: Request, db: AsyncReadSessionDep):
+    """Month-end and next-month spend projections per category (base currency)."""
+    user_email = require_user_email(request)
+    today = DateType.today()
+
+    async def compute() -> dict:
+        return await db.run_sync(forecast_service.forecast, user_email, today)
+
+    return await conditional_json(request, user_email, ("forecast", today), compute)
+
+
 @router.get("/api/expenses/chart-data")
 async def get_chart_data(
     request: Request,
+    db: AsyncReadSessionDep,
     month: str | None = Query(default=None),
     start_date: str | None = Query(default=None),
     end_date: str | None = Query(default=None),
-    db: Session = Depends(get_db),
+    currency: str | None = Query(default=None),
+    granularity: str | None = Query(default=None),
 ):
     user_email = require_user_email(request)
+    display_currency = reporting_service.resolve_display_currency(currency)
+    trend_granularity = trend_service.resolve_granularity(granularity)
     filter_start, filter_end, month_mode = parse_filter_dates(month=month, start_date=start_date, end_date=end_date)
+    # Today's date, so relative defaults (the trend window, the current month) roll over at midnight.
+    cache_key = (
+        "chart-data", filter_start, filter_end, month_mode, display_currency, trend_granularity, DateType.today()
+    )
+
+    async def compute() -> dict:
+        # run_sync only adapts the async connection for the sync helpers: the
+        # callable runs on the event loop's thread, so it is kept to database
+        # reads. FX lookups and the NumPy conversion run in the threadpool.
+        filters = _chart_filters(user_email, filter_start, filter_end, month_mode)
+        rates = await reporting_service.prefetch_rates(db, filters, display_currency)
+        if analytics_cube.enabled:
+            cube = await analytics_cube.cube_for_async(db, user_email)
+            payload = await run_in_threadpool(
+                analytics_cube.chart_payload,
+                cube,
+                filter_start,
+                _inclusive_end(filter_end, month_mode),
+                display_currency,
+                trend_granularity,
+                rates,
+            )
+            return payload or _empty_chart_payload(display_currency)
+        if not reporting_service.is_base(display_currency):
+            facts = await db.run_sync(_chart_facts, filters)
+            return await run_in_threadpool(_chart_data_in_currency, facts, display_currency, trend_granularity, rates)
+        return await db.run_sync(
+            _chart_data_in_base, user_email, filter_start, filter_end, month_mode, trend_granularity
+        )
+
+    return await conditional_json(
+        request,
+        user_email,
+        cache_key,
+        lambda: result_cache.get_or_compute_async(user_email, cache_key, compute),
+    )
+
+
+def _compute_chart_data(
+    db: Session,
+    user_email: str,
+    filter_start: DateType | None,
+    filter_end: DateType | None,
+    month_mode: bool,
+    display_currency: str,
+    granularity: str = "month",
+    rates: RateMatrix | None = None,
+) -> dict:
+    if analytics_cube.enabled:
+        payload = analytics_cube.chart_data(
+            db,
+            user_email,
+            filter_start,
+            _inclusive_end(filter_end, month_mode),
+            display_currency,
+            granularity,
+            rates,
+        )
+        return payload or _empty_chart_payload(display_currency)
+    if not reporting_service.is_base(display_currency):
+        facts = _chart_facts(db, _chart_filters(user_email, filter_start, filter_end, month_mode))
+        return _chart_data_in_currency(facts, display_currency, granularity, rates)
+    return _chart_data_in_base(db, user_email, filter_start, filter_end, month_mode, granularity)
+
+
+def _chart_data_in_base(
+    db: Session,
+    user_email: str,
+    filter_start: DateType | None,
+    filter_end: DateType | None,
+    month_mode: bool,
+    granularity: str = "month",
+) -> dict:
+    """Chart payload in the base currency, aggregated in SQL."""
+    base_filter = _chart_filters(user_email, filter_start, filter_end, month_mode)
+    # Month-aligned filters are answered from the incrementally maintained rollups.
+    bounds = rollup_service.month_bounds(filter_start, filter_end, month_mode)
+    if bounds is not None:
+        first_month, end_exclusive = bounds
+        source_filter = [ExpenseRollup.owner_email == user_email]
+        if first_month:
+            source_filter.append(ExpenseRollup.month >= first_month)
+        if end_exclusive:
+            source_filter.append(ExpenseRollup.month < end_exclusive)
+        category_col, vendor_col = ExpenseRollup.category, ExpenseRollup.vendor
+        date_col, amount_col = ExpenseRollup.month, ExpenseRollup.total_amount
+    else:
+        source_filter = base_filter
+        category_col, vendor_col = Expense.category, Expense.vendor
+        date_col, amount_col = Expense.date, Expense.base_currency_amount
 
-    base_filter = [Expense.owner_email == user_email]
-    if filter_start:
-        base_filter.append(Expense.date >= filter_start)
-    if filter_end:
-        if month_mode:
-            base_filter.append(Expense.date < filter_end)
-        else:
-            base_filter.append(Expense.date <= filter_end)
     # 1. Category Breakdown (Doughnut)
     cat_data = (
-        db.query(Expense.category, func.sum(Expense.base_currency_amount))
-        .filter(*base_filter)
-        .group_by(Expense.category)
+        db.query(category_col, func.sum(amount_col))
+        .filter(*source_filter)
+        .group_by(category_col)
         .all()
     )
     
     # 2. Top 5 Vendors (Bar)
     vendor_data = (
-        db.query(Expense.vendor, func.sum(Expense.base_currency_amount))
-        .filter(*base_filter)
-        .group_by(Expense.vendor)
-        .order_by(func.sum(Expense.base_currency_amount).desc())
+        db.query(vendor_col, func.sum(amount_col))
+        .filter(*source_filter)
+        .group_by(vendor_col)
+        .order_by(func.sum(amount_col).desc())
         .limit(5)
         .all()
     )
     
-    # 3. Monthly Trend (Line)
-    trend_rows = (
-        db.query(Expense.date, Expense.base_currency_amount)
-        .filter(*base_filter)
-        .order_by(Expense.date.asc())
-        .all()
-    )
-    trend_map: dict[str, float] = {}
-    for tx_date, tx_amount in trend_rows:
-        key = tx_date.strftime("%Y-%m")
-        trend_map[key] = trend_map.get(key, 0.0) + float(tx_amount or 0.0)
-    trend_data = list(trend_map.items())[-12:]
+    # 3. Spending Trend (Line) - bucketed in SQL; rollups only hold monthly buckets.
+    if granularity != "month":
+        source_filter = base_filter
+        date_col, amount_col = Expense.date, Expense.base_currency_amount
+    trend_data = trend_service.series(db, date_col, amount_col, source_filter, granularity)
 
     # Fallback if DB is empty
     if not cat_data:
-        return {
-            "categories": {"labels": ["No Data"], "data": [1]},
-            "vendors": {"labels": ["No Data"], "data": [1]},
-            "trend": {"labels": ["No Data"], "data": [1]},
-            "base_currency": settings.BASE_CURRENCY,
-        }
+        return _empty_chart_payload(settings.BASE_CURRENCY)
 
     return {
         "categories": {
@@ -176,4 +426,77 @@ async def get_chart_data(
             "data": [float(row[1]) for row in trend_data]
         },
         "base_currency": settings.BASE_CURRENCY,
+        "display_currency": settings.BASE_CURRENCY,
+    }
+
+
+def _inclusive_end(filter_end: DateType | None, month_mode: bool) -> DateType | None:
+    # Month filters end at the (exclusive) first of the next month.
+    return filter_end - timedelta(days=1) if filter_end and month_mode else filter_end
+
+
+def _chart_filters(
+    user_email: str, filter_start: DateType | None, filter_end: DateType | None, month_mode: bool
+) -> list:
+    filters = [Expense.owner_email == user_email]
+    if filter_start:
+        filters.append(Expense.date >= filter_start)
+    if filter_end:
+        if month_mode:
+            filters.append(Expense.date < filter_end)
+        else:
+            filters.append(Expense.date <= filter_end)
+    return filters
+
+
+def _empty_chart_payload(display_currency: str) -> dict:
+    return {
+        "categories": {"labels": ["No Data"], "data": [1]},
+        "vendors": {"labels": ["No Data"], "data": [1]},
+        "trend": {"labels": ["No Data"], "data": [1]},
+        "base_currency": settings.BASE_CURRENCY,
+        "display_currency": display_currency,
+    }
+
+
+def _chart_facts(db: Session, base_filter: list) -> tuple[list, list, list]:
+    """Per-currency daily (category, vendor, day) facts for `_chart_data_in_currency`."""
+    return (
+        reporting_service.grouped_facts(db, base_filter, key_column=Expense.category),
+        reporting_service.grouped_facts(db, base_filter, key_column=Expense.vendor),
+        reporting_service.grouped_facts(db, base_filter),
+    )
+
+
+def _chart_data_in_currency(
+    facts: tuple[list, list, list],
+    display_currency: str,
+    granularity: str = "month",
+    rates: RateMatrix | None = None,
+) -> dict:
+    """Chart payload converted from per-currency daily facts (see `_chart_facts`) into `display_currency`."""
+    category_facts, vendor_facts, daily_facts = facts
+    category_totals = reporting_service.convert_grouped(category_facts, display_currency, rates)
+    if not category_totals:
+        return _empty_chart_payload(display_currency)
+    vendor_totals = reporting_service.convert_grouped(vendor_facts, display_currency, rates)
+    top_vendors = sorted(vendor_totals.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    trend_data = trend_service.bucket_totals(
+        reporting_service.convert_grouped(daily_facts, display_currency, rates), granularity
+    )
+    return {
+        "categories": {
+            "labels": list(category_totals.keys()),
+            "data": list(category_totals.values()),
+        },
+        "vendors": {
+            "labels": [label for label, _ in top_vendors],
+            "data": [value for _, value in top_vendors],
+        },
+        "trend": {
+            "labels": [label for label, _ in trend_data],
+            "data": [value for _, value in trend_data],
+        },
+        "base_currency": settings.BASE_CURRENCY,
+        "display_currency": display_currency,
     }
\ No newline at end of file
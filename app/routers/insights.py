@@ -1,10 +1,21 @@
+from datetime import date
+
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.cache import data_versions
+from app.core.conditional import conditional_json
 from app.core.security import require_user_email
+from app.db.async_session import AsyncReadSessionDep, AsyncSessionDep
 from app.db.session import get_db
 from app.models.saved_query import SavedQuery
-from app.services.query_service import query_service
+from app.services.query_guard import QueryGuardError
+from app.services.query_service import QueryResult, query_service
+from app.services.saved_query_service import saved_query_service
 
 router = APIRouter(prefix="/api/insights", tags=["insights"])
 
@@ -12,30 +23,47 @@ router = APIRouter(prefix="/api/insights", tags=["insights"])
 @router.post("/ask")
 async def ask_question(
     request: Request,
+    db: AsyncReadSessionDep,
     question: str = Form(...),
     month: str = Form(default=""),
     start_date: str = Form(default=""),
     end_date: str = Form(default=""),
-    db: Session = Depends(get_db),
+    currency: str = Form(default=""),
 ):
     user_email = require_user_email(request)
-    result = query_service.answer_question(
-        db=db,
-        owner_email=user_email,
-        question=question,
-        month=month or None,
-        start_date=start_date or None,
-        end_date=end_date or None,
-    )
+    try:
+        # Planning may call the LLM; keep that blocking call off the event loop.
+        prepared = await run_in_threadpool(
+            query_service.prepare,
+            owner_email=user_email,
+            question=question,
+            month=month or None,
+            start_date=start_date or None,
+            end_date=end_date or None,
+            currency=currency or None,
+        )
+        rates = await query_service.prefetch_rates(db, prepared)
+        result = await db.run_sync(query_service.execute, prepared, rates)
+    except QueryGuardError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _result_payload(result)
+
+
+def _result_payload(result: QueryResult, chart_type: str | None = None) -> dict:
     return {
         "question": result.question,
         "intent": result.intent,
         "summary": result.summary,
         "sql": result.sql_query,
+        "currency": result.currency,
+        "cache_hit": result.cache_hit,
         "chart": {
-            "type": result.chart_type,
+            "type": chart_type or result.chart_type,
             "labels": result.labels,
             "values": result.values,
+            **({"series": result.series} if result.series else {}),
         },
     }
 
@@ -45,20 +73,38 @@ async def save_question(
     request: Request,
     name: str = Form(...),
     question: str = Form(...),
-    sql_query: str = Form(...),
-    chart_type: str = Form("bar"),
+    intent: str = Form(default=""),
+    month: str = Form(default=""),
+    start_date: str = Form(default=""),
+    end_date: str = Form(default=""),
+    currency: str = Form(default=""),
+    chart_type: str = Form(default=""),
     db: Session = Depends(get_db),
 ):
     user_email = require_user_email(request)
+    # Store what to run, not SQL from the browser: the intent is resolved and
+    # the SQL regenerated server-side (kept only for display).
+    params = saved_query_service.clean_params(
+        month=month, start_date=start_date, end_date=end_date, currency=currency
+    )
+    try:
+        prepared = await run_in_threadpool(
+            query_service.prepare, owner_email=user_email, question=question, intent=intent or None, **params
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     saved = SavedQuery(
         owner_email=user_email,
         name=name.strip() or "Saved query",
         question=question.strip(),
-        sql_query=sql_query.strip(),
-        chart_type=chart_type.strip() or "bar",
+        intent=prepared.plan.name,
+        params=params,
+        sql_query=prepared.sql_query,
+        chart_type=chart_type.strip() or prepared.plan.chart_type,
         is_pinned=False,
     )
     db.add(saved)
+    data_versions.bump(db, user_email)
     db.commit()
     db.refresh(saved)
     return {"id": saved.id, "status": "saved"}
@@ -75,26 +121,67 @@ async def pin_saved_query(saved_query_id: int, request: Request, db: Session = D
     if not saved:
         raise HTTPException(status_code=404, detail="Saved query not found")
     saved.is_pinned = True
+    data_versions.bump(db, user_email)
     db.commit()
     return {"id": saved.id, "status": "pinned"}
 
 
+@router.get("/pinned/results")
+async def pinned_results(request: Request, db: AsyncReadSessionDep):
+    """Run every pinned query for the owner in one batch, on one snapshot."""
+    user_email = require_user_email(request)
+    return await conditional_json(
+        # Pinned questions like "last month" resolve against today's date.
+        request, user_email, ("insights-pinned", date.today()), lambda: _pinned_payload(db, user_email)
+    )
+
+
+async def _pinned_payload(db: AsyncSession, user_email: str) -> list[dict] | JSONResponse:
+    payload = []
+    failed = False
+    for saved, result in await saved_query_service.run_pinned(db, user_email):
+        if isinstance(result, ValueError):
+            failed = True
+            payload.append(
+                {
+                    "id": saved.id,
+                    "name": saved.name,
+                    "summary": str(result),
+                    "error": str(result),
+                    "chart": {"type": saved.chart_type, "labels": [], "values": []},
+                }
+            )
+        else:
+            payload.append({"id": saved.id, "name": saved.name, **_result_payload(result, chart_type=saved.chart_type)})
+    if failed:
+        # Without validators, so the next load retries instead of revalidating the failure.
+        return JSONResponse(payload, headers={"Cache-Control": "no-store"})
+    return payload
 
 
 @router.get("/saved")
-async def list_saved_queries(request: Request, db: Session = Depends(get_db)):
+async def list_saved_queries(request: Request, db: AsyncSessionDep):
     user_email = require_user_email(request)
-    rows = (
-        db.query(SavedQuery)
-        .filter(SavedQuery.owner_email == user_email)
-        .order_by(SavedQuery.is_pinned.desc(), SavedQuery.id.desc())
-        .all()
+    return await conditional_json(
+        request, user_email, ("insights-saved",), lambda: _saved_query_payload(db, user_email)
     )
+
+
+async def _saved_query_payload(db: AsyncSession, user_email: str) -> list[dict]:
+    rows = (
+        await db.scalars(
+            select(SavedQuery)
+            .where(SavedQuery.owner_email == user_email)
+            .order_by(SavedQuery.is_pinned.desc(), SavedQuery.id.desc())
+        )
+    ).all()
     return [
         {
             "id": row.id,
             "name": row.name,
             "question": row.question,
+            "intent": row.intent,
+            "params": row.params or {},
             "sql": row.sql_query,
             "chart_type": row.chart_type,
             "is_pinned": row.is_pinned,
@@ -114,5 +201,6 @@ async def delete_saved_query(saved_query_id: int, request: Request, db: Session
     if not saved:
         raise HTTPException(status_code=404, detail="Saved query not found")
     db.delete(saved)
+    data_versions.bump(db, user_email)
     db.commit()
     return {"id": saved_query_id, "status": "deleted"}
@@ -8,13 +8,18 @@ from fastapi import APIRouter, Depends, File, Request, UploadFile
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 
+from app.core.cache import data_versions
 from app.core.config import settings
+from app.core.metrics import registry
 from app.core.parsing import parse_iso_date
 from app.core.security import require_user_email
 from app.db.session import get_db
 from app.models.expense import Expense, ExpenseItem
+from app.services.anomaly_service import anomaly_service
 from app.services.finance import fx_service
 from app.services.ocr_service import ocr_service
+from app.services.recurring_service import recurring_service
+from app.services.rollup_service import rollup_service
 from app.services.statement_service import statement_service
 
 router = APIRouter()
@@ -22,6 +27,12 @@ MAX_UPLOAD_SIZE_BYTES = int(os.getenv("MAX_UPLOAD_SIZE_MB", "10")) * 1024 * 1024
 SPREADSHEET_SUFFIXES = (".csv", ".xls", ".xlsx")
 IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg")
 
+upload_rows = registry.counter(
+    "xta_upload_rows_total",
+    "Uploaded rows by source (statement, receipt) and outcome (parsed, skipped, duplicate, inserted).",
+    ("source", "outcome"),
+)
+
 
 def _escape(value: object) -> str:
     return html.escape(str(value), quote=True)
@@ -116,7 +127,10 @@ def _upsert_receipt_with_items(
         )
         db.add(expense)
         db.flush()
+        rollup_service.record(db, [expense])
     else:
+        # Re-pricing/re-categorising moves the row between rollup buckets.
+        rollup_service.record(db, [expense], sign=-1)
         expense.source_type = "receipt"
         expense.category = extracted_data.get("category", expense.category)
         if extracted_data.get("description"):
@@ -124,6 +138,7 @@ def _upsert_receipt_with_items(
         expense.base_currency_amount = base_currency_amount
         expense.base_currency = settings.BASE_CURRENCY
         expense.fx_rate = fx_rate
+        rollup_service.record(db, [expense])
 
     existing_item_keys = {
         (item.name, float(item.quantity), float(item.price))
@@ -232,7 +247,16 @@ async def upload_file(request: Request, file: UploadFile = File(...), db: Sessio
         
         if db_expenses:
             db.add_all(db_expenses)
+            rollup_service.record(db, db_expenses)
+            # Only the vendor groups this import touched are re-analysed.
+            recurring_service.refresh(db, user_email, {expense.vendor for expense in db_expenses})
+            anomaly_service.score(db, user_email, db_expenses)
+            data_versions.bump(db, user_email)
             db.commit()
+        upload_rows.inc(parsed_rows, source="statement", outcome="parsed")
+        upload_rows.inc(skipped_rows, source="statement", outcome="skipped")
+        upload_rows.inc(duplicates_skipped, source="statement", outcome="duplicate")
+        upload_rows.inc(len(db_expenses), source="statement", outcome="inserted")
 
         dup_msg = f"<br><span class='text-sm text-green-700 font-bold'>Skipped {duplicates_skipped} duplicates.</span>" if duplicates_skipped > 0 else ""
         parse_msg = (
@@ -281,7 +305,9 @@ async def upload_file(request: Request, file: UploadFile = File(...), db: Sessio
             os.remove(temp_file_path)
 
         if "error" in extracted_data:
+            upload_rows.inc(source="receipt", outcome="skipped")
             return _render_status_card("Extraction Error:", extracted_data["error"])
+        upload_rows.inc(source="receipt", outcome="parsed")
 
         date_str = extracted_data.get("date", datetime.now().strftime("%Y-%m-%d"))
         parsed_date = parse_iso_date(date_str) or datetime.now().date()
@@ -303,6 +329,7 @@ async def upload_file(request: Request, file: UploadFile = File(...), db: Sessio
             extracted_data=extracted_data,
         )
         if is_duplicate:
+            upload_rows.inc(source="receipt", outcome="duplicate")
             safe_vendor = _escape(vendor)
             return f"""
             <div class="p-8 text-center bg-yellow-50 rounded-lg border-2 border-yellow-500 border-dashed">
@@ -311,7 +338,14 @@ async def upload_file(request: Request, file: UploadFile = File(...), db: Sessio
             </div>
             """
         db.add(expense)
+        recurring_service.refresh(db, user_email, [expense.vendor])
+        anomaly_service.score(db, user_email, [expense])
+        # A receipt can re-price/re-categorise an imported statement row in place,
+        # which the cube's append-or-rebuild check can't see.
+        data_versions.bump(db, user_email, rewrite=True)
         db.commit()
+        # New, or merged into the matching statement row.
+        upload_rows.inc(source="receipt", outcome="inserted")
         items_count = len(expense.items)
 
         return f"""
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import data_versions
+from app.core.config import settings
+from app.models.expense import Expense
+from app.services.finance import RateMatrix, fx_service
+from app.services.trend_service import trend_service
+
+EPOCH = date(1970, 1, 1)
+# Intent name -> (dimension, measure) for the QueryService intents the cube can answer.
+CUBE_INTENTS = {
+    "visits": ("vendor", "count"),
+    "spend_by_category": ("category", "sum"),
+    "spend_by_vendor": ("vendor", "sum"),
+    "monthly_trend": ("month", "sum"),
+    "category_split": ("category", "sum"),
+}
+
+
+def _day_number(value: date) -> int:
+    return (value - EPOCH).days
+
+
+@dataclass
+class OwnerCube:
+    """
+    One owner's expenses as parallel columns sorted by day.
+
+    Dates are int32 day numbers, amounts float64, and currency/category/vendor
+    int32 codes into per-cube dictionaries, so a date filter is a binary
+    search and a group-by is one `np.bincount`.
+    """
+
+    version: str
+    rewrites: int  # The owner's in-place rewrite count when the cube was built.
+    max_id: int
+    ids: np.ndarray
+    days: np.ndarray
+    base_amounts: np.ndarray
+    amounts: np.ndarray
+    currency_codes: np.ndarray
+    category_codes: np.ndarray
+    vendor_codes: np.ndarray
+    currencies: list[str] = field(default_factory=list)
+    categories: list[Any] = field(default_factory=list)
+    vendors: list[Any] = field(default_factory=list)
+
+    @property
+    def row_count(self) -> int:
+        return int(self.days.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        columns = (
+            self.ids, self.days, self.base_amounts, self.amounts,
+            self.currency_codes, self.category_codes, self.vendor_codes,
+        )
+        # Dictionary entries are small strings; ~64 bytes each is a fair estimate.
+        return sum(column.nbytes for column in columns) + 64 * (
+            len(self.currencies) + len(self.categories) + len(self.vendors)
+        )
+
+    def window(self, start: date | None, end: date | None) -> slice:
+        """Rows with start <= date <= end (either bound optional)."""
+        lo = int(np.searchsorted(self.days, _day_number(start), side="left")) if start else 0
+        hi = int(np.searchsorted(self.days, _day_number(end), side="right")) if end else self.row_count
+        return slice(lo, max(lo, hi))
+
+    def values(
+        self, rows: slice, display_currency: str, measure: str = "sum", rates: RateMatrix | None = None
+    ) -> np.ndarray:
+        if measure == "count":
+            return np.ones(rows.stop - rows.start, dtype=np.float64)
+        if display_currency.upper() == settings.BASE_CURRENCY:
+            return self.base_amounts[rows]
+        if rows.stop == rows.start:
+            return np.zeros(0, dtype=np.float64)
+        # Same conversion as ReportingService, as direct array lookups into the rate matrix.
+        days = self.days[rows]
+        codes = self.currency_codes[rows]
+        currencies = [self.currencies[code] for code in np.unique(codes)]
+        start_date, end_date = EPOCH + timedelta(days=int(days[0])), EPOCH + timedelta(days=int(days[-1]))
+        matrix = rates
+        if matrix is None or not matrix.covers(display_currency, currencies, start_date, end_date):
+            matrix = fx_service.build_rate_matrix(
+                target_currency=display_currency,
+                currencies=currencies,
+                start_date=start_date,
+                end_date=end_date,
+            )
+        # Currencies absent from these rows never index their (unused) column.
+        column_of = np.array(
+            [matrix.currencies.index(code) if code in matrix.currencies else 0 for code in self.currencies],
+            dtype=np.int64,
+        )
+        first = (matrix.start_date - EPOCH).days
+        return self.amounts[rows] * matrix.rates[days - first, column_of[codes]]
+
+    def group(self, dimension: str, rows: slice, weights: np.ndarray) -> tuple[list[Any], np.ndarray]:
+        """(labels, totals) per dimension value present in `rows`."""
+        if dimension == "month":
+            months = self.days[rows].astype("datetime64[D]").astype("datetime64[M]")
+            keys, inverse = np.unique(months, return_inverse=True)
+            totals = np.bincount(inverse, weights=weights, minlength=len(keys))
+            return [str(key) for key in keys], totals
+        codes = self.category_codes if dimension == "category" else self.vendor_codes
+        dictionary = self.categories if dimension == "category" else self.vendors
+        totals = np.bincount(codes[rows], weights=weights, minlength=len(dictionary))
+        counts = np.bincount(codes[rows], minlength=len(dictionary))
+        present = np.flatnonzero(counts)
+        return [dictionary[idx] for idx in present], totals[present]
+
+    def trend(self, rows: slice, weights: np.ndarray, granularity: str) -> list[tuple[str, float]]:
+        days = self.days[rows]
+        if granularity == "month":
+            buckets = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        elif granularity == "week":
+            # Day 0 (1970-01-01) was a Thursday; weeks start on Monday.
+            buckets = days - (days + 3) % 7
+        else:
+            buckets = days.astype(np.int64)
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        totals = np.bincount(inverse, weights=weights, minlength=len(keys))
+        return trend_service.fill(
+            ((EPOCH + timedelta(days=int(key)), float(total)) for key, total in zip(keys, totals)),
+            granularity,
+        )
+
+
+class AnalyticsCubeService:
+    """
+    Optional in-memory analytics engine (ANALYTICS_CUBE_ENABLED).
+
+    Cubes are built lazily per owner on first use and checked against the
+    owner's data version on every read. After a write, rows with a higher id
+    are appended; if the row count shows anything else changed (deletes,
+    out-of-order commits), or a write rewrote existing rows in place, the cube
+    is rebuilt. Least recently used cubes are
+    evicted once their total size exceeds ANALYTICS_CUBE_MAX_MB.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._cubes: OrderedDict[str, OwnerCube] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ANALYTICS_CUBE_ENABLED
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(cube.nbytes for cube in self._cubes.values())
+
+    def cube_for(self, db: Session, owner_email: str) -> OwnerCube:
+        version = data_versions.get(owner_email)
+        cube = self._cached(owner_email)
+        if cube is not None and cube.version == version:
+            return cube
+        base, rows = self._fetch(db, owner_email, data_versions.rewrites(owner_email), cube)
+        cube = self._append(base, rows, version)
+        self._store(owner_email, cube)
+        return cube
+
+    async def cube_for_async(self, db: AsyncSession, owner_email: str) -> OwnerCube:
+        """`cube_for` for async routes: rows are read under run_sync, encoded in a worker thread."""
+        version = data_versions.get(owner_email)
+        cube = self._cached(owner_email)
+        if cube is not None and cube.version == version:
+            return cube
+        base, rows = await db.run_sync(self._fetch, owner_email, data_versions.rewrites(owner_email), cube)
+        cube = await run_in_threadpool(self._append, base, rows, version)
+        self._store(owner_email, cube)
+        return cube
+
+    def _cached(self, owner_email: str) -> OwnerCube | None:
+        # Never hold the lock across database I/O: under run_sync this code
+        # shares one thread with other requests on the event loop.
+        with self._lock:
+            cube = self._cubes.get(owner_email)
+            if cube is not None:
+                self._cubes.move_to_end(owner_email)
+        return cube
+
+    def invalidate(self, owner_email: str | None = None) -> None:
+        with self._lock:
+            if owner_email is None:
+                self._cubes.clear()
+            else:
+                self._cubes.pop(owner_email, None)
+
+    def intent_totals(
+        self,
+        db: Session,
+        owner_email: str,
+        intent: str,
+        start: date | None,
+        end: date | None,
+        display_currency: str,
+        order_by_label: bool,
+        limit: int,
+        rates: RateMatrix | None = None,
+    ) -> tuple[list[str], list[float]]:
+        dimension, measure = CUBE_INTENTS[intent]
+        cube = self.cube_for(db, owner_email)
+        rows = cube.window(start, end)
+        labels, totals = cube.group(dimension, rows, cube.values(rows, display_currency, measure, rates))
+        if order_by_label:
+            order = sorted(range(len(labels)), key=lambda idx: str(labels[idx]))
+        else:
+            order = np.argsort(-totals, kind="stable").tolist()
+        order = order[:limit]
+        return [str(labels[idx]) for idx in order], [float(totals[idx]) for idx in order]
+
+    def chart_data(
+        self,
+        db: Session,
+        owner_email: str,
+        start: date | None,
+        end: date | None,
+        display_currency: str,
+        granularity: str,
+        rates: RateMatrix | None = None,
+    ) -> dict | None:
+        """Chart payload for start <= date <= end, or None if the owner has no rows in range."""
+        return self.chart_payload(self.cube_for(db, owner_email), start, end, display_currency, granularity, rates)
+
+    @staticmethod
+    def chart_payload(
+        cube: OwnerCube,
+        start: date | None,
+        end: date | None,
+        display_currency: str,
+        granularity: str,
+        rates: RateMatrix | None = None,
+    ) -> dict | None:
+        """`chart_data` on an already loaded cube (no database access)."""
+        rows = cube.window(start, end)
+        if rows.stop == rows.start:
+            return None
+        weights = cube.values(rows, display_currency, rates=rates)
+        category_labels, category_totals = cube.group("category", rows, weights)
+        vendor_labels, vendor_totals = cube.group("vendor", rows, weights)
+        top_vendors = np.argsort(-vendor_totals, kind="stable")[:5]
+        trend = cube.trend(rows, weights, granularity)
+        return {
+            "categories": {"labels": category_labels, "data": [float(value) for value in category_totals]},
+            "vendors": {
+                "labels": [vendor_labels[idx] for idx in top_vendors],
+                "data": [float(vendor_totals[idx]) for idx in top_vendors],
+            },
+            "trend": {"labels": [label for label, _ in trend], "data": [value for _, value in trend]},
+            "base_currency": settings.BASE_CURRENCY,
+            "display_currency": display_currency,
+        }
+
+    def _fetch(
+        self, db: Session, owner_email: str, rewrites: int, stale: OwnerCube | None
+    ) -> tuple[OwnerCube, list[Any]]:
+        """The cube to extend and the rows to append to it: `stale` plus new rows, or everything."""
+        if stale is not None and stale.rewrites == rewrites:
+            row_count = db.execute(
+                select(func.count()).select_from(Expense).where(Expense.owner_email == owner_email)
+            ).scalar_one()
+            delta = self._load(db, owner_email, after_id=stale.max_id)
+            if row_count == stale.row_count + len(delta):
+                return stale, delta
+        return self._empty(rewrites), self._load(db, owner_email)
+
+    @staticmethod
+    def _load(db: Session, owner_email: str, after_id: int = 0) -> list[Any]:
+        return db.execute(
+            select(
+                Expense.id,
+                Expense.date,
+                Expense.base_currency_amount,
+                Expense.amount,
+                Expense.currency,
+                Expense.category,
+                Expense.vendor,
+            )
+            .where(Expense.owner_email == owner_email, Expense.id > after_id)
+            .order_by(Expense.date, Expense.id)
+        ).all()
+
+    @staticmethod
+    def _empty(rewrites: int) -> OwnerCube:
+        # `_append` stamps the version on the cube it builds from this one.
+        return OwnerCube(
+            version="",
+            rewrites=rewrites,
+            max_id=0,
+            ids=np.zeros(0, dtype=np.int64),
+            days=np.zeros(0, dtype=np.int32),
+            base_amounts=np.zeros(0, dtype=np.float64),
+            amounts=np.zeros(0, dtype=np.float64),
+            currency_codes=np.zeros(0, dtype=np.int32),
+            category_codes=np.zeros(0, dtype=np.int32),
+            vendor_codes=np.zeros(0, dtype=np.int32),
+        )
+
+    @staticmethod
+    def _append(cube: OwnerCube, rows: list[Any], version: str) -> OwnerCube:
+        currencies, categories, vendors = list(cube.currencies), list(cube.categories), list(cube.vendors)
+        lookups = [
+            {value: idx for idx, value in enumerate(dictionary)} for dictionary in (currencies, categories, vendors)
+        ]
+
+        def encode(values: list[Any], dictionary: list[Any], lookup: dict[Any, int]) -> np.ndarray:
+            codes = np.empty(len(values), dtype=np.int32)
+            for position, value in enumerate(values):
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(dictionary)
+                    dictionary.append(value)
+                codes[position] = code
+            return codes
+
+        ids = [row.id for row in rows]
+        days = [_day_number(row.date) for row in rows]
+        row_currencies = [(row.currency or settings.BASE_CURRENCY).upper() for row in rows]
+        columns = {
+            "ids": np.concatenate([cube.ids, np.asarray(ids, dtype=np.int64)]),
+            "days": np.concatenate([cube.days, np.asarray(days, dtype=np.int32)]),
+            "base_amounts": np.concatenate(
+                [cube.base_amounts, np.asarray([row.base_currency_amount for row in rows], dtype=np.float64)]
+            ),
+            "amounts": np.concatenate([cube.amounts, np.asarray([row.amount for row in rows], dtype=np.float64)]),
+            "currency_codes": np.concatenate([cube.currency_codes, encode(row_currencies, currencies, lookups[0])]),
+            "category_codes": np.concatenate(
+                [cube.category_codes, encode([row.category for row in rows], categories, lookups[1])]
+            ),
+            "vendor_codes": np.concatenate(
+                [cube.vendor_codes, encode([row.vendor for row in rows], vendors, lookups[2])]
+            ),
+        }
+        if rows and cube.row_count:
+            # Appended rows can be back-dated; restore day order.
+            order = np.argsort(columns["days"], kind="stable")
+            columns = {name: column[order] for name, column in columns.items()}
+        return OwnerCube(
+            version=version,
+            rewrites=cube.rewrites,
+            max_id=max([cube.max_id, *ids]),
+            currencies=currencies,
+            categories=categories,
+            vendors=vendors,
+            **columns,
+        )
+
+    def _store(self, owner_email: str, cube: OwnerCube) -> None:
+        with self._lock:
+            current = self._cubes.get(owner_email)
+            # A concurrent refresh may already have stored a newer version.
+            if current is not None and current.version == data_versions.get(owner_email):
+                return
+            self._cubes[owner_email] = cube
+            self._cubes.move_to_end(owner_email)
+            total = sum(entry.nbytes for entry in self._cubes.values())
+            while total > self.max_bytes and len(self._cubes) > 1:
+                _, evicted = self._cubes.popitem(last=False)
+                total -= evicted.nbytes
+
+
+analytics_cube = AnalyticsCubeService(max_bytes=settings.ANALYTICS_CUBE_MAX_MB * 1024 * 1024)
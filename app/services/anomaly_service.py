@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Sequence
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import data_versions
+from app.core.config import settings
+from app.models.category_baseline import CategoryBaseline
+from app.models.expense import Expense
+from app.services.recurring_service import normalize_vendor
+from app.services.rollup_service import DEFAULT_CATEGORY
+
+# Scales the MAD so the robust z-score is comparable to a standard z-score.
+_MAD_SCALE = 0.6745
+# Floor for the MAD relative to the median, so a category with identical
+# charges (MAD 0) still yields finite scores.
+_MIN_RELATIVE_MAD = 0.05
+
+DUPLICATE_REASON = "Possible duplicate: same vendor, amount and day"
+
+
+class AnomalyService:
+    """
+    Flags unusual charges as they are written.
+
+    `refresh_baselines` (a scheduled job) stores robust per-owner, per-category
+    statistics over a rolling window in `category_baselines`. Write paths call
+    `score` with their new rows inside their own transaction: one query loads
+    the baselines the batch needs, each row is then scored by dictionary lookup,
+    and one indexed query on the batch's days finds same-day duplicates.
+    """
+
+    def refresh_baselines(self, db: Session, owner_email: str | None = None, today: date | None = None) -> int:
+        """Recompute baselines (all owners, or one) and commit. Returns baselines stored."""
+        window_end = today or date.today()
+        window_start = window_end - timedelta(days=settings.ANOMALY_BASELINE_WINDOW_DAYS)
+        category = func.coalesce(Expense.category, DEFAULT_CATEGORY)
+        query = select(Expense.owner_email, category, Expense.base_currency_amount).where(
+            Expense.date >= window_start,
+            Expense.date <= window_end,
+            Expense.base_currency_amount > 0,
+        )
+        clear = delete(CategoryBaseline)
+        if owner_email:
+            query = query.where(Expense.owner_email == owner_email)
+            clear = clear.where(CategoryBaseline.owner_email == owner_email)
+        rows = db.execute(query).all()
+        db.execute(clear)
+
+        baselines = [
+            CategoryBaseline(owner_email=owner, category=name, window_start=window_start, window_end=window_end, **stats)
+            for (owner, name), stats in self.compute_baselines(rows).items()
+        ]
+        db.add_all(baselines)
+        data_versions.bump(db, *([owner_email] if owner_email else {owner for owner, _, _ in rows}))
+        db.commit()
+        return len(baselines)
+
+    @staticmethod
+    def compute_baselines(rows: Sequence[Any]) -> dict[tuple[str, str], dict[str, Any]]:
+        """(owner, category, base amount) rows -> {(owner, category): statistics}."""
+        if not rows:
+            return {}
+        owners, categories, amounts = zip(*rows)
+        keys = np.array([f"{owner}\x00{name}" for owner, name in zip(owners, categories)], dtype=object)
+        values = np.array(amounts, dtype=np.float64)
+        names, codes = np.unique(keys, return_inverse=True)
+        # One sort by group; each group is then a contiguous slice.
+        order = np.argsort(codes, kind="stable")
+        codes, values = codes[order], values[order]
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+
+        baselines: dict[tuple[str, str], dict[str, Any]] = {}
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(codes)]):
+            group = values[start:end]
+            median = float(np.median(group))
+            p90, p95, p99 = np.percentile(group, [90, 95, 99])
+            owner, name = str(names[codes[start]]).split("\x00", 1)
+            baselines[(owner, name)] = {
+                "sample_count": int(end - start),
+                "median": round(median, 4),
+                "mad": round(float(np.median(np.abs(group - median))), 4),
+                "p90": round(float(p90), 4),
+                "p95": round(float(p95), 4),
+                "p99": round(float(p99), 4),
+            }
+        return baselines
+
+    def score(self, db: Session, owner_email: str, expenses: Sequence[Expense]) -> int:
+        """Set anomaly_score/anomaly_reason on new rows (before commit). Returns rows flagged."""
+        if not expenses:
+            return 0
+        db.flush()
+        categories = {expense.category or DEFAULT_CATEGORY for expense in expenses}
+        baselines = {
+            baseline.category: baseline
+            for baseline in db.scalars(
+                select(CategoryBaseline).where(
+                    CategoryBaseline.owner_email == owner_email,
+                    CategoryBaseline.category.in_(categories),
+                )
+            ).all()
+        }
+        duplicates = self._duplicate_ids(db, owner_email, expenses)
+
+        flagged = 0
+        for expense in expenses:
+            amount = float(expense.base_currency_amount or 0.0)
+            baseline = baselines.get(expense.category or DEFAULT_CATEGORY)
+            reason = None
+            if baseline is not None and amount > 0:
+                expense.anomaly_score = round(self.robust_z(amount, baseline.median, baseline.mad), 2)
+                if self.is_outlier(amount, baseline):
+                    ratio = amount / baseline.median
+                    reason = f"{ratio:.1f}× your typical {baseline.category} charge"
+            if expense.id in duplicates:
+                reason = DUPLICATE_REASON
+            expense.anomaly_reason = reason
+            flagged += reason is not None
+        return flagged
+
+    @staticmethod
+    def robust_z(amount: float, median: float, mad: float) -> float:
+        scale = max(mad, _MIN_RELATIVE_MAD * abs(median), 1e-9)
+        return _MAD_SCALE * (amount - median) / scale
+
+    def is_outlier(self, amount: float, baseline: CategoryBaseline) -> bool:
+        if baseline.sample_count < settings.ANOMALY_MIN_SAMPLES or baseline.median <= 0:
+            return False
+        # Both tests: the ratio keeps tiny, volatile categories quiet, the
+        # z-score keeps categories with a wide normal range quiet.
+        return (
+            amount >= settings.ANOMALY_RATIO * baseline.median
+            and self.robust_z(amount, baseline.median, baseline.mad) >= settings.ANOMALY_ROBUST_Z
+        )
+
+    @staticmethod
+    def _duplicate_ids(db: Session, owner_email: str, expenses: Sequence[Expense]) -> set[int]:
+        """Ids of new rows that share day, normalized vendor and amount with another row."""
+        days = {expense.date for expense in expenses}
+        same_days = db.execute(
+            select(Expense.vendor, Expense.date, Expense.base_currency_amount).where(
+                Expense.owner_email == owner_email, Expense.date.in_(days)
+            )
+        ).all()
+
+        def key(vendor: str | None, day: date, amount: float | None) -> tuple:
+            return day, normalize_vendor(vendor), round(float(amount or 0.0), 2)
+
+        counts = Counter(key(*row) for row in same_days)
+        return {
+            expense.id
+            for expense in expenses
+            if counts[key(expense.vendor, expense.date, expense.base_currency_amount)] > 1
+        }
+
+    def recent(self, db: Session, owner_email: str, days: int = 90, limit: int = 10) -> dict[str, Any]:
+        """JSON-ready flagged charges from the last `days` days, newest first."""
+        since = date.today() - timedelta(days=days)
+        rows = db.scalars(
+            select(Expense)
+            .where(
+                Expense.owner_email == owner_email,
+                Expense.date >= since,
+                Expense.anomaly_reason.is_not(None),
+            )
+            .order_by(Expense.date.desc(), Expense.id.desc())
+            .limit(limit)
+        ).all()
+        return {
+            "anomalies": [
+                {
+                    "id": row.id,
+                    "date": row.date.isoformat(),
+                    "vendor": row.vendor,
+                    "category": row.category or DEFAULT_CATEGORY,
+                    "amount": row.amount,
+                    "currency": row.currency,
+                    "base_currency_amount": row.base_currency_amount,
+                    "score": row.anomaly_score,
+                    "reason": row.anomaly_reason,
+                }
+                for row in rows
+            ]
+        }
+
+
+anomaly_service = AnomalyService()
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import and_, func, select, true
+from sqlalchemy.orm import Session, joinedload
+
+from app.db.functions import month_label
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+from app.services.reporting import reporting_service
+from app.services.rollup_service import rollup_service
+
+
+@dataclass
+class DashboardMetrics:
+    total_spent: float = 0.0
+    recent_count: int = 0
+    avg_spent: float = 0.0
+    rolling_30d_spend: float = 0.0
+    previous_30d_spend: float = 0.0
+    spend_delta_pct: float = 0.0
+    top_category_name: str = "N/A"
+    top_category_amount: float = 0.0
+    spend_12m_total: float = 0.0
+    avg_12m_monthly: float = 0.0
+    latest_month_label: str = "N/A"
+    recent_expenses: list[Expense] = field(default_factory=list)
+
+
+class DashboardService:
+    """
+    Computes dashboard KPIs in a single aggregate round trip (plus one query
+    for recent activity). Month-aligned ranges are answered from rollups.
+    """
+
+    def compute(
+        self,
+        db: Session,
+        owner_email: str,
+        start_date: date | None,
+        end_date: date | None,
+        month_mode: bool,
+        display_currency: str,
+        today: date | None = None,
+    ) -> DashboardMetrics:
+        today = today or date.today()
+        rolling_start = today - timedelta(days=30)
+        previous_start = rolling_start - timedelta(days=30)
+        twelve_month_start = today - timedelta(days=365)
+        window_start = min(previous_start, twelve_month_start)
+
+        range_conditions = []
+        if start_date:
+            range_conditions.append(Expense.date >= start_date)
+        if end_date:
+            range_conditions.append(Expense.date < end_date if month_mode else Expense.date <= end_date)
+
+        in_rolling = and_(Expense.date >= rolling_start, Expense.date <= today)
+        in_previous = and_(Expense.date >= previous_start, Expense.date < rolling_start)
+        in_12m = and_(Expense.date >= twelve_month_start, Expense.date <= today)
+        amount = Expense.base_currency_amount
+
+        range_totals, top_category = self._range_ctes(
+            owner_email, start_date, end_date, month_mode, range_conditions
+        )
+        # Trailing windows are FILTERed aggregates over a single scan of the last year.
+        windows = (
+            select(
+                func.coalesce(func.sum(amount).filter(in_rolling), 0.0).label("rolling_30d_spend"),
+                func.coalesce(func.sum(amount).filter(in_previous), 0.0).label("previous_30d_spend"),
+                func.coalesce(func.sum(amount).filter(in_12m), 0.0).label("spend_12m_total"),
+                func.count(month_label(Expense.date).distinct()).filter(in_12m).label("months_12m"),
+                func.max(month_label(Expense.date)).filter(in_12m).label("latest_month_label"),
+            )
+            .where(Expense.owner_email == owner_email, Expense.date >= window_start)
+            .cte("windows")
+        )
+        row = db.execute(
+            select(range_totals, windows, top_category.c.category, top_category.c.amount).select_from(
+                range_totals.join(windows, true()).outerjoin(top_category, true())
+            )
+        ).mappings().one()
+
+        result = DashboardMetrics(
+            total_spent=float(row["total_spent"] or 0.0),
+            recent_count=int(row["recent_count"] or 0),
+            rolling_30d_spend=float(row["rolling_30d_spend"] or 0.0),
+            previous_30d_spend=float(row["previous_30d_spend"] or 0.0),
+            spend_12m_total=float(row["spend_12m_total"] or 0.0),
+            latest_month_label=row["latest_month_label"] or "N/A",
+        )
+        months_12m = int(row["months_12m"] or 0)
+        if row["amount"] is not None:
+            result.top_category_name = row["category"]
+            result.top_category_amount = float(row["amount"])
+
+        if not reporting_service.is_base(display_currency):
+            self._apply_display_currency(
+                db, result, owner_email, range_conditions, display_currency, today, window_start
+            )
+        else:
+            result.avg_12m_monthly = (result.spend_12m_total / months_12m) if months_12m else 0.0
+
+        result.avg_spent = (result.total_spent / result.recent_count) if result.recent_count > 0 else 0.0
+        if result.previous_30d_spend > 0:
+            result.spend_delta_pct = (
+                (result.rolling_30d_spend - result.previous_30d_spend) / result.previous_30d_spend
+            ) * 100.0
+
+        result.recent_expenses = (
+            db.query(Expense)
+            .options(joinedload(Expense.items))
+            .filter(Expense.owner_email == owner_email, *range_conditions)
+            .order_by(Expense.date.desc(), Expense.id.desc())
+            .limit(5)
+            .all()
+        )
+        return result
+
+    @staticmethod
+    def _range_ctes(
+        owner_email: str,
+        start_date: date | None,
+        end_date: date | None,
+        month_mode: bool,
+        range_conditions: Sequence[Any],
+    ) -> tuple[Any, Any]:
+        """Selected-range totals and top category, from rollups when the range is month-aligned."""
+        bounds = rollup_service.month_bounds(start_date, end_date, month_mode)
+        if bounds is not None:
+            first_month, end_exclusive = bounds
+            conditions = [ExpenseRollup.owner_email == owner_email]
+            if first_month:
+                conditions.append(ExpenseRollup.month >= first_month)
+            if end_exclusive:
+                conditions.append(ExpenseRollup.month < end_exclusive)
+            range_totals = select(
+                func.coalesce(func.sum(ExpenseRollup.total_amount), 0.0).label("total_spent"),
+                func.coalesce(func.sum(ExpenseRollup.tx_count), 0).label("recent_count"),
+            ).where(*conditions)
+            top_category = (
+                select(
+                    ExpenseRollup.category.label("category"),
+                    func.sum(ExpenseRollup.total_amount).label("amount"),
+                )
+                .where(*conditions)
+                .group_by(ExpenseRollup.category)
+                .order_by(func.sum(ExpenseRollup.total_amount).desc())
+                .limit(1)
+            )
+        else:
+            conditions = [Expense.owner_email == owner_email, *range_conditions]
+            range_totals = select(
+                func.coalesce(func.sum(Expense.base_currency_amount), 0.0).label("total_spent"),
+                func.count().label("recent_count"),
+            ).where(*conditions)
+            top_category = (
+                select(
+                    Expense.category.label("category"),
+                    func.sum(Expense.base_currency_amount).label("amount"),
+                )
+                .where(*conditions)
+                .group_by(Expense.category)
+                .order_by(func.sum(Expense.base_currency_amount).desc())
+                .limit(1)
+            )
+        return range_totals.cte("range_totals"), top_category.cte("top_category")
+
+    @staticmethod
+    def _apply_display_currency(
+        db: Session,
+        result: DashboardMetrics,
+        owner_email: str,
+        range_conditions: Sequence[Any],
+        display_currency: str,
+        today: date,
+        window_start: date,
+    ) -> None:
+        """Re-express amount KPIs from per-currency daily facts."""
+        rolling_start = today - timedelta(days=30)
+        previous_start = rolling_start - timedelta(days=30)
+        twelve_month_start = today - timedelta(days=365)
+
+        category_totals = reporting_service.sum_by(
+            db,
+            [Expense.owner_email == owner_email, *range_conditions],
+            display_currency,
+            key_column=Expense.category,
+        )
+        result.total_spent = sum(category_totals.values())
+        if category_totals:
+            result.top_category_name, result.top_category_amount = max(
+                category_totals.items(), key=lambda kv: kv[1]
+            )
+        daily_totals = reporting_service.sum_by(
+            db,
+            [Expense.owner_email == owner_email, Expense.date >= window_start, Expense.date <= today],
+            display_currency,
+        )
+        result.rolling_30d_spend = sum(v for d, v in daily_totals.items() if d >= rolling_start)
+        result.previous_30d_spend = sum(
+            v for d, v in daily_totals.items() if previous_start <= d < rolling_start
+        )
+        monthly_rollup: dict[str, float] = {}
+        for tx_date, tx_amount in daily_totals.items():
+            if tx_date >= twelve_month_start:
+                key = tx_date.strftime("%Y-%m")
+                monthly_rollup[key] = monthly_rollup.get(key, 0.0) + tx_amount
+        result.spend_12m_total = sum(monthly_rollup.values())
+        result.avg_12m_monthly = (result.spend_12m_total / len(monthly_rollup)) if monthly_rollup else 0.0
+
+
+dashboard_service = DashboardService()
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import zipfile
+from collections.abc import Callable, Iterator, Sequence
+from datetime import date
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.expense import Expense, ExpenseItem
+from app.services.ingestion import ingestion_service
+
+# Rows fetched per round trip from the server-side cursor.
+EXPORT_BATCH_SIZE = 1000
+# Flush the CSV buffer to the client once it grows past this many characters.
+CSV_FLUSH_CHARS = 64 * 1024
+# Chunk size when copying receipt files into the archive.
+FILE_CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = [
+    "expense_id",
+    "date",
+    "vendor",
+    "category",
+    "amount",
+    "currency",
+    "base_currency_amount",
+    "base_currency",
+    "fx_rate",
+    "description",
+    "source_type",
+    "receipt_file",
+    "item_name",
+    "item_quantity",
+    "item_price",
+]
+
+
+class _ArchiveBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands back whatever zipfile wrote since the last drain."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._pending = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._pending += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+
+class ExportService:
+    """
+    Streams filtered expenses (one row per line item) as CSV, or as a ZIP of
+    that CSV plus the receipt files.
+
+    Generators open their own session from `session_factory`, because they
+    run after the request handler has returned; rows are read through a
+    server-side cursor so memory stays flat regardless of export size.
+
+    Only receipt files in the owner's receipt folder are exported (see
+    `IngestionService.receipt_dir`); `receipt_url` is user input, so any
+    other path is skipped.
+    """
+
+    def iter_csv(
+        self,
+        session_factory: Callable[[], Session],
+        owner_email: str,
+        conditions: Sequence[Any],
+        receipts: list[tuple[str, date, Path]] | None = None,
+    ) -> Iterator[bytes]:
+        """CSV chunks; `receipts` collects (archive name, date, path) of each receipt file listed."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        with session_factory() as db:
+            for row in self._line_rows(db, owner_email, conditions, receipts):
+                writer.writerow(row)
+                if buffer.tell() >= CSV_FLUSH_CHARS:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    def iter_zip(
+        self,
+        session_factory: Callable[[], Session],
+        owner_email: str,
+        conditions: Sequence[Any],
+    ) -> Iterator[bytes]:
+        sink = _ArchiveBuffer()
+        receipts: list[tuple[str, date, Path]] = []
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open("expenses.csv", mode="w") as member:
+                for chunk in self.iter_csv(session_factory, owner_email, conditions, receipts):
+                    member.write(chunk)
+                    yield sink.drain()
+            # Exactly the files the CSV lists, from the same read; receipts are
+            # already compressed images.
+            for name, tx_date, path in receipts:
+                info = zipfile.ZipInfo(name, date_time=(tx_date.year, tx_date.month, tx_date.day, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_STORED
+                with archive.open(info, mode="w") as member, path.open("rb") as source:
+                    while chunk := source.read(FILE_CHUNK_BYTES):
+                        member.write(chunk)
+                        yield sink.drain()
+        yield sink.drain()
+
+    def _line_rows(
+        self,
+        db: Session,
+        owner_email: str,
+        conditions: Sequence[Any],
+        receipts: list[tuple[str, date, Path]] | None = None,
+    ) -> Iterator[list[Any]]:
+        stmt = (
+            select(
+                Expense.id,
+                Expense.date,
+                Expense.vendor,
+                Expense.category,
+                Expense.amount,
+                Expense.currency,
+                Expense.base_currency_amount,
+                Expense.base_currency,
+                Expense.fx_rate,
+                Expense.description,
+                Expense.source_type,
+                Expense.receipt_url,
+                ExpenseItem.name,
+                ExpenseItem.quantity,
+                ExpenseItem.price,
+            )
+            .outerjoin(ExpenseItem, ExpenseItem.expense_id == Expense.id)
+            .where(Expense.owner_email == owner_email, *conditions)
+            .order_by(Expense.date, Expense.id, ExpenseItem.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        current_id, receipt_file = None, ""
+        for row in db.execute(stmt):
+            if row.id != current_id:
+                # Rows arrive grouped by expense; check the receipt once per expense.
+                current_id = row.id
+                path = self.resolve_receipt_path(owner_email, row.receipt_url)
+                receipt_file = self.receipt_archive_name(row.id, row.date, row.receipt_url) if path else ""
+                if path and receipts is not None:
+                    receipts.append((receipt_file, row.date, path))
+            yield [
+                row.id,
+                row.date.isoformat(),
+                row.vendor,
+                row.category or "",
+                row.amount,
+                row.currency,
+                row.base_currency_amount,
+                row.base_currency,
+                row.fx_rate,
+                row.description or "",
+                row.source_type,
+                receipt_file,
+                row.name or "",
+                "" if row.quantity is None else row.quantity,
+                "" if row.price is None else row.price,
+            ]
+
+    @staticmethod
+    def resolve_receipt_path(owner_email: str, receipt_url: str | None) -> Path | None:
+        """The owner's receipt file named by a receipt URL, or None if it isn't in their receipt folder."""
+        if not receipt_url:
+            return None
+        root = Path(ingestion_service.receipt_dir(owner_email)).resolve()
+        candidate = root / os.path.basename(receipt_url)
+        try:
+            resolved = candidate.resolve()
+        except OSError:
+            return None
+        if not resolved.is_relative_to(root) or not resolved.is_file():
+            return None
+        return resolved
+
+    @staticmethod
+    def receipt_archive_name(expense_id: int, tx_date: date, receipt_url: str) -> str:
+        return f"receipts/{tx_date.isoformat()}_{expense_id}_{os.path.basename(receipt_url)}"
+
+
+export_service = ExportService()
@@ -1,10 +1,60 @@
 from __future__ import annotations
 
-from datetime import date
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, timedelta
 
 import httpx
+import numpy as np
 
+from app.core.cache import mark_uncacheable
 from app.core.config import settings
+from app.core.instrumentation import fx_failures, fx_seconds
+from app.core.metrics import timed
+
+RATE_MATRIX_CACHE_SIZE = 32
+
+
+@dataclass
+class RateMatrix:
+    """Daily rates (target units per source unit) for a set of source currencies."""
+
+    target_currency: str
+    start_date: date
+    currencies: tuple[str, ...]
+    rates: np.ndarray  # shape: (days, len(currencies))
+    complete: bool = True  # False when some currency fell back to 1.0 or a latest rate.
+
+    @property
+    def end_date(self) -> date:
+        return self.start_date + timedelta(days=self.rates.shape[0] - 1)
+
+    def covers(self, target_currency: str, currencies: Sequence[str], start_date: date, end_date: date) -> bool:
+        """Whether this matrix can convert `currencies` into `target_currency` on every day in the range."""
+        return (
+            self.target_currency == target_currency.upper()
+            and self.start_date <= start_date
+            and end_date <= self.end_date
+            and {(code or settings.BASE_CURRENCY).upper() for code in currencies} <= set(self.currencies)
+        )
+
+    def convert(
+        self,
+        currencies: Sequence[str],
+        days: Sequence[date],
+        amounts: Sequence[float],
+    ) -> np.ndarray:
+        """Convert parallel (currency, day, amount) columns in one vectorized lookup."""
+        if not len(amounts):
+            return np.zeros(0, dtype=np.float64)
+        column_of = {code: idx for idx, code in enumerate(self.currencies)}
+        column_idx = np.array([column_of[code] for code in currencies], dtype=np.int64)
+        day_idx = (
+            np.array(days, dtype="datetime64[D]") - np.datetime64(self.start_date, "D")
+        ).astype(np.int64)
+        day_idx = np.clip(day_idx, 0, self.rates.shape[0] - 1)
+        return np.asarray(amounts, dtype=np.float64) * self.rates[day_idx, column_idx]
 
 
 class FXService:
@@ -13,6 +63,7 @@ class FXService:
     def __init__(self) -> None:
         self.base_currency = settings.BASE_CURRENCY
         self.fx_api_url = settings.FX_API_URL.rstrip("/")
+        self._matrix_cache: OrderedDict[tuple, RateMatrix] = OrderedDict()
 
     def convert_to_base(
         self,
@@ -37,6 +88,106 @@ class FXService:
             return float(amount), 1.0
         return float(amount) * rate, float(rate)
 
+    def build_rate_matrix(
+        self,
+        target_currency: str,
+        currencies: Sequence[str],
+        start_date: date,
+        end_date: date,
+    ) -> RateMatrix:
+        """
+        Returns a day x currency matrix of rates into `target_currency`.
+        One timeseries request covers the whole window; gaps (weekends, holidays)
+        are forward-filled and currencies without quotes fall back to 1.0,
+        mirroring `convert_to_base`. Such a fallback matrix isn't cached, and
+        marks the enclosing computation uncacheable, so the next request retries
+        the lookup.
+        """
+        target = target_currency.upper()
+        codes = tuple(sorted({(code or self.base_currency).upper() for code in currencies} | {target}))
+        cache_key = (target, codes, start_date, end_date)
+        cached = self._matrix_cache.get(cache_key)
+        if cached is not None:
+            self._matrix_cache.move_to_end(cache_key)
+            return cached
+
+        day_count = (end_date - start_date).days + 1
+        rates = np.full((day_count, len(codes)), np.nan, dtype=np.float64)
+        rates[:, codes.index(target)] = 1.0
+        complete = True
+        foreign = [code for code in codes if code != target]
+        if foreign:
+            for quote_date, quotes in self._fetch_timeseries(target, foreign, start_date, end_date).items():
+                row = (quote_date - start_date).days
+                if not 0 <= row < day_count:
+                    continue
+                for code, value in quotes.items():
+                    if code in codes and value:
+                        # Provider quotes target->source; we need source->target.
+                        rates[row, codes.index(code)] = 1.0 / float(value)
+            for col, code in enumerate(codes):
+                if code == target:
+                    continue
+                column = rates[:, col]
+                if np.isnan(column).all():
+                    latest = self._fetch_rate(from_currency=code, to_currency=target, tx_date=None)
+                    complete = complete and bool(latest and latest > 0)
+                    column[:] = latest if latest and latest > 0 else 1.0
+                    continue
+                # Forward-fill, then back-fill the leading gap before the first quote.
+                valid = ~np.isnan(column)
+                filled_idx = np.maximum.accumulate(np.where(valid, np.arange(day_count), 0))
+                column[:] = column[filled_idx]
+                first_valid = int(np.argmax(valid))
+                column[:first_valid] = column[first_valid]
+
+        matrix = RateMatrix(
+            target_currency=target, start_date=start_date, currencies=codes, rates=rates, complete=complete
+        )
+        if not complete:
+            mark_uncacheable()
+            return matrix
+        self._matrix_cache[cache_key] = matrix
+        while len(self._matrix_cache) > RATE_MATRIX_CACHE_SIZE:
+            self._matrix_cache.popitem(last=False)
+        return matrix
+
+    def _fetch_timeseries(
+        self,
+        base_currency: str,
+        quote_currencies: Sequence[str],
+        start_date: date,
+        end_date: date,
+    ) -> dict[date, dict[str, float]]:
+        # Frankfurter only publishes on business days; pad the start so the
+        # first days of the window can be forward-filled from a prior quote.
+        padded_start = start_date - timedelta(days=7)
+        try:
+            with timed(fx_seconds, fx_failures, provider="frankfurter_timeseries"):
+                response = httpx.get(
+                    f"{self.fx_api_url}/{padded_start.isoformat()}..{end_date.isoformat()}",
+                    params={"from": base_currency, "to": ",".join(quote_currencies)},
+                    timeout=8.0,
+                )
+                response.raise_for_status()
+            payload = response.json()
+        except (httpx.HTTPError, ValueError):
+            return {}
+        series: dict[date, dict[str, float]] = {}
+        prior: dict[str, float] = {}
+        for raw_date, quotes in sorted(payload.get("rates", {}).items()):
+            try:
+                quote_date = date.fromisoformat(raw_date)
+            except ValueError:
+                continue
+            if quote_date < start_date:
+                prior.update(quotes)
+                continue
+            series[quote_date] = quotes
+        if prior and start_date not in series:
+            series[start_date] = {**prior, **series.get(start_date, {})}
+        return series
+
     def _fetch_rate(self, from_currency: str, to_currency: str, tx_date: date | None) -> float | None:
         # Historical rate path (Frankfurter supports date snapshots).
         if tx_date:
@@ -57,12 +208,13 @@ class FXService:
     @staticmethod
     def _fetch_from_frankfurter(url: str, from_currency: str, to_currency: str) -> float | None:
         try:
-            response = httpx.get(
-                url,
-                params={"from": from_currency, "to": to_currency},
-                timeout=8.0,
-            )
-            response.raise_for_status()
+            with timed(fx_seconds, fx_failures, provider="frankfurter"):
+                response = httpx.get(
+                    url,
+                    params={"from": from_currency, "to": to_currency},
+                    timeout=8.0,
+                )
+                response.raise_for_status()
             payload = response.json()
             rates = payload.get("rates", {})
             value = rates.get(to_currency)
@@ -75,11 +227,12 @@ class FXService:
     @staticmethod
     def _fetch_from_open_er_api(from_currency: str, to_currency: str) -> float | None:
         try:
-            response = httpx.get(
-                f"https://open.er-api.com/v6/latest/{from_currency}",
-                timeout=8.0,
-            )
-            response.raise_for_status()
+            with timed(fx_seconds, fx_failures, provider="open_er_api"):
+                response = httpx.get(
+                    f"https://open.er-api.com/v6/latest/{from_currency}",
+                    timeout=8.0,
+                )
+                response.raise_for_status()
             payload = response.json()
             if payload.get("result") != "success":
                 return None
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import calendar
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.cache import result_cache
+from app.core.config import settings
+from app.models.expense_rollup import ExpenseRollup
+from app.models.recurring_payment import RecurringPayment
+from app.services.recurring_service import normalize_vendor
+from app.services.rollup_service import DEFAULT_CATEGORY
+
+# Complete months of history the baselines are fitted on.
+HISTORY_MONTHS = 24
+# Trailing months averaged into the spending level.
+LEVEL_MONTHS = 6
+# Seasonal factors are shrunk halfway towards 1 and clipped; one or two
+# years of a single month are a noisy estimate.
+SEASONAL_WEIGHT = 0.5
+SEASONAL_CLIP = (0.5, 2.0)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_end(month: date) -> date:
+    return month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+@dataclass
+class ForecastModel:
+    """Per-category inputs for one (owner, month); only the day of month is applied later."""
+
+    month: date
+    history_months: int
+    categories: list[str]
+    month_to_date: np.ndarray
+    # Typical non-recurring spend for the current and the next month.
+    variable_this_month: np.ndarray
+    variable_next_month: np.ndarray
+    # Recurring charges still expected this month (not yet paid) and next month.
+    recurring_this_month: np.ndarray
+    recurring_next_month: np.ndarray
+
+
+def seasonal_baselines(history: np.ndarray, history_months: int, horizon: int = 2) -> np.ndarray:
+    """
+    Typical spend per category (rows) for the next `horizon` months.
+
+    `history` holds HISTORY_MONTHS complete months per category, oldest first;
+    only the last `history_months` columns are real data. The level is the
+    trailing LEVEL_MONTHS mean; with a year or more of data it is scaled by
+    the month's share of its year(s).
+    """
+    categories = history.shape[0]
+    if history_months <= 0 or categories == 0:
+        return np.zeros((categories, horizon))
+    window = min(LEVEL_MONTHS, history_months)
+    level = history[:, -window:].mean(axis=1)
+
+    years = min(history_months // 12, HISTORY_MONTHS // 12)
+    if years == 0:
+        return np.repeat(level[:, None], horizon, axis=1)
+    # Same calendar month in each of the last `years` years, per target month.
+    offsets = np.arange(horizon)[None, :] + HISTORY_MONTHS - 12 * np.arange(1, years + 1)[:, None]
+    same_month = history[:, offsets].sum(axis=1)
+    yearly_mean = sum(
+        history[:, HISTORY_MONTHS - 12 * year : HISTORY_MONTHS - 12 * (year - 1)].mean(axis=1)
+        for year in range(1, years + 1)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw = np.where(yearly_mean[:, None] > 0, same_month / yearly_mean[:, None], 1.0)
+    factor = np.clip(1.0 + SEASONAL_WEIGHT * (raw - 1.0), *SEASONAL_CLIP)
+    return level[:, None] * factor
+
+
+class ForecastService:
+    """
+    Month-end and next-month spend projections per category (base currency).
+
+    Non-recurring spend is projected from seasonal baselines fitted on the
+    monthly rollups; detected recurring payments are excluded from that
+    history and added back on their expected dates instead. The fitted model
+    is cached per (owner, month) under the owner's data version, so it is
+    rebuilt only after new data arrives; projecting it to a given day is cheap.
+    """
+
+    def forecast(self, db: Session, owner_email: str, today: date | None = None) -> dict[str, Any]:
+        today = today or date.today()
+        month = today.replace(day=1)
+        model = result_cache.get_or_compute(
+            owner_email,
+            ("forecast-model", month),
+            lambda: self.build_model(db, owner_email, month),
+        )
+        return self.project(model, today)
+
+    def build_model(self, db: Session, owner_email: str, month: date) -> ForecastModel:
+        window_start = _add_months(month, -HISTORY_MONTHS)
+        rollups = db.execute(
+            select(
+                ExpenseRollup.month, ExpenseRollup.category, ExpenseRollup.vendor, ExpenseRollup.total_amount
+            ).where(
+                ExpenseRollup.owner_email == owner_email,
+                ExpenseRollup.month >= window_start,
+                ExpenseRollup.month <= month,
+            )
+        ).all()
+        payments = db.scalars(
+            select(RecurringPayment).where(RecurringPayment.owner_email == owner_email)
+        ).all()
+        return self.fit(month, rollups, payments)
+
+    def fit(self, month: date, rollups: Sequence[Any], payments: Sequence[RecurringPayment]) -> ForecastModel:
+        """Builds the model from (month, category, vendor, total) rollup rows and recurring payments."""
+        recurring_keys = {payment.vendor_key for payment in payments}
+        # Latest category seen per recurring vendor, to file its future charges under.
+        vendor_category: dict[str, tuple[date, str]] = {}
+        for row_month, category, vendor, _ in rollups:
+            key = normalize_vendor(vendor)
+            if key in recurring_keys and vendor_category.get(key, (date.min, ""))[0] <= row_month:
+                vendor_category[key] = (row_month, category or DEFAULT_CATEGORY)
+
+        scheduled: list[tuple[str, float, float]] = []
+        next_month = _add_months(month, 1)
+        for payment in payments:
+            category = vendor_category.get(payment.vendor_key, (None, DEFAULT_CATEGORY))[1]
+            this_month, following = self._scheduled_charges(payment, month, next_month)
+            scheduled.append((category, this_month, following))
+
+        categories = sorted({row[1] or DEFAULT_CATEGORY for row in rollups} | {row[0] for row in scheduled})
+        index = {category: position for position, category in enumerate(categories)}
+        history = np.zeros((len(categories), HISTORY_MONTHS))
+        month_to_date = np.zeros(len(categories))
+        first_month = month
+        for row_month, category, vendor, total in rollups:
+            row = index[category or DEFAULT_CATEGORY]
+            if row_month == month:
+                month_to_date[row] += total
+                continue
+            first_month = min(first_month, row_month)
+            if normalize_vendor(vendor) not in recurring_keys:
+                column = (row_month.year - month.year) * 12 + row_month.month - month.month + HISTORY_MONTHS
+                history[row, column] += total
+
+        history_months = (month.year - first_month.year) * 12 + month.month - first_month.month
+        baselines = seasonal_baselines(history, history_months)
+        recurring = np.zeros((len(categories), 2))
+        for category, this_month, following in scheduled:
+            recurring[index[category]] += (this_month, following)
+
+        return ForecastModel(
+            month=month,
+            history_months=history_months,
+            categories=categories,
+            month_to_date=month_to_date,
+            variable_this_month=baselines[:, 0],
+            variable_next_month=baselines[:, 1],
+            recurring_this_month=recurring[:, 0],
+            recurring_next_month=recurring[:, 1],
+        )
+
+    @staticmethod
+    def _scheduled_charges(payment: RecurringPayment, month: date, next_month: date) -> tuple[float, float]:
+        """Charges expected in this month and next month, continuing the detected cadence."""
+        interval = max(payment.interval_days, 1.0)
+        # Overdue by more than a cycle before this month: treat as cancelled.
+        if payment.next_expected_date + timedelta(days=interval) < month:
+            return 0.0, 0.0
+        totals = [0.0, 0.0]
+        step = 0
+        while True:
+            expected = payment.next_expected_date + timedelta(days=round(step * interval))
+            if expected > _month_end(next_month):
+                break
+            if expected >= next_month:
+                totals[1] += payment.amount
+            elif expected >= month:
+                totals[0] += payment.amount
+            step += 1
+        return totals[0], totals[1]
+
+    @staticmethod
+    def project(model: ForecastModel, today: date) -> dict[str, Any]:
+        """JSON-ready projection as of `today` (a day within the model's month)."""
+        days_in_month = calendar.monthrange(model.month.year, model.month.month)[1]
+        remaining = (days_in_month - today.day) / days_in_month
+        month_end = model.month_to_date + model.variable_this_month * remaining + model.recurring_this_month
+        next_month = model.variable_next_month + model.recurring_next_month
+
+        order = np.argsort(-month_end, kind="stable")
+        return {
+            "month": model.month.strftime("%Y-%m"),
+            "next_month": _add_months(model.month, 1).strftime("%Y-%m"),
+            "as_of": today.isoformat(),
+            "currency": settings.BASE_CURRENCY,
+            "history_months": model.history_months,
+            "categories": [
+                {
+                    "category": model.categories[position],
+                    "month_to_date": round(float(model.month_to_date[position]), 2),
+                    "month_end": round(float(month_end[position]), 2),
+                    "next_month": round(float(next_month[position]), 2),
+                    "recurring_next_month": round(float(model.recurring_next_month[position]), 2),
+                }
+                for position in order
+                if month_end[position] > 0 or next_month[position] > 0
+            ],
+            "totals": {
+                "month_to_date": round(float(model.month_to_date.sum()), 2),
+                "month_end": round(float(month_end.sum()), 2),
+                "next_month": round(float(next_month.sum()), 2),
+            },
+        }
+
+
+forecast_service = ForecastService()
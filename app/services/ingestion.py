@@ -1,3 +1,4 @@
+import hashlib
 import os
 import shutil
 from datetime import datetime
@@ -12,10 +13,18 @@ class IngestionService:
         if not os.path.exists(self.UPLOAD_DIR):
             os.makedirs(self.UPLOAD_DIR)
 
-    async def save_upload(self, file: UploadFile) -> str:
+    def receipt_dir(self, owner_email: str) -> str:
         """
-        Saves the uploaded file to disk with a timestamped name.
-        Returns the absolute file path.
+        The owner's receipt folder. Exports only pick up files from here, so a
+        receipt_url naming another user's upload resolves to nothing.
+        """
+        owner_key = hashlib.sha256(owner_email.strip().lower().encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.UPLOAD_DIR, owner_key)
+
+    async def save_upload(self, file: UploadFile, owner_email: str) -> str:
+        """
+        Saves the uploaded file to the owner's receipt folder with a timestamped name.
+        Returns the file path.
         """
         # 1. Basic Security: Validate file type
         allowed_types = [
@@ -39,7 +48,9 @@ class IngestionService:
         safe_filename = os.path.basename(file.filename).replace(" ", "_")
         new_filename = f"{timestamp}_{safe_filename}"
         
-        file_path = os.path.join(self.UPLOAD_DIR, new_filename)
+        owner_dir = self.receipt_dir(owner_email)
+        os.makedirs(owner_dir, exist_ok=True)
+        file_path = os.path.join(owner_dir, new_filename)
 
         # 3. Save to disk efficiently
         try:
@@ -4,6 +4,8 @@ import os
 from datetime import datetime
 from openai import OpenAI
 from app.core.config import settings
+from app.core.instrumentation import llm_failures, llm_seconds
+from app.core.metrics import timed
 
 class OCRService:
     def __init__(self):
@@ -42,24 +44,25 @@ class OCRService:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model, 
-                response_format={ "type": "json_object" }, 
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1500,  # Increased capacity for itemization
-                temperature=0.0
-            )
+            with timed(llm_seconds, llm_failures, operation="receipt_ocr"):
+                response = self.client.chat.completions.create(
+                    model=self.model, 
+                    response_format={ "type": "json_object" }, 
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
+                                }
+                            ]
+                        }
+                    ],
+                    max_tokens=1500,  # Increased capacity for itemization
+                    temperature=0.0
+                )
 
             raw_content = response.choices[0].message.content.strip()
             
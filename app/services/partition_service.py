@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import logging
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Partitioned table -> its partition key column.
+PARTITIONED_TABLES = {"expenses": "date", "expense_items": "expense_date"}
+
+
+class PartitionService:
+    """
+    Creates yearly range partitions for `expenses` and `expense_items`.
+
+    Only applies on Postgres after the partitioning migration; elsewhere
+    every method is a no-op. Rows outside the created years land in the
+    `<table>_default` partition.
+    """
+
+    def is_partitioned(self, db: Session, table_name: str = "expenses") -> bool:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        relkind = db.execute(
+            text(
+                "SELECT relkind FROM pg_class "
+                "WHERE relname = :name AND relnamespace = current_schema()::regnamespace"
+            ),
+            {"name": table_name},
+        ).scalar()
+        return relkind == "p"
+
+    def ensure_partitions(self, db: Session, years_ahead: int | None = None, today: date | None = None) -> list[str]:
+        """Creates missing partitions from this year through `years_ahead` years out. Returns new table names."""
+        if not self.is_partitioned(db):
+            return []
+        current_year = (today or date.today()).year
+        ahead = settings.PARTITION_YEARS_AHEAD if years_ahead is None else years_ahead
+        created: list[str] = []
+        for year in range(current_year, current_year + ahead + 1):
+            for table_name, key_column in PARTITIONED_TABLES.items():
+                partition = f"{table_name}_y{year}"
+                if self._exists(db, partition):
+                    continue
+                start, end = f"{year}-01-01", f"{year + 1}-01-01"
+                # Postgres refuses a new partition whose range already has rows
+                # in DEFAULT; leave those years in DEFAULT rather than fail.
+                if db.execute(
+                    text(
+                        f"SELECT 1 FROM {table_name}_default "
+                        f"WHERE {key_column} >= :start AND {key_column} < :end LIMIT 1"
+                    ),
+                    {"start": start, "end": end},
+                ).first():
+                    logger.warning("Skipping %s: %s_default already holds rows for %s", partition, table_name, year)
+                    continue
+                db.execute(
+                    text(
+                        f"CREATE TABLE {partition} PARTITION OF {table_name} "
+                        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+                    )
+                )
+                created.append(partition)
+        db.commit()
+        return created
+
+    @staticmethod
+    def _exists(db: Session, table_name: str) -> bool:
+        return db.execute(text("SELECT to_regclass(:name)"), {"name": table_name}).scalar() is not None
+
+
+partition_service = PartitionService()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE query_canceled: raised when statement_timeout fires.
+_QUERY_CANCELED = "57014"
+
+guard_outcomes = registry.counter(
+    "xta_query_guard_total",
+    "Insight queries by guard outcome (ok, truncated, timeout, cost_rejected, row_limit).",
+    ("outcome",),
+)
+guard_seconds = registry.histogram(
+    "xta_query_guard_seconds",
+    "Wall time of guarded insight queries, including the cost check.",
+)
+
+
+class QueryGuardError(ValueError):
+    """A query was stopped by the guard; the message is safe to show to users."""
+
+    status_code = 400
+    outcome = "rejected"
+
+
+class QueryTimeoutError(QueryGuardError):
+    status_code = 504
+    outcome = "timeout"
+
+
+class QueryCostError(QueryGuardError):
+    status_code = 422
+    outcome = "cost_rejected"
+
+
+class QueryRowLimitError(QueryGuardError):
+    status_code = 422
+    outcome = "row_limit"
+
+
+class QueryGuard:
+    """
+    Limits applied to every SQL-backed insight query.
+
+    - statement_timeout (QUERY_STATEMENT_TIMEOUT_MS) via SET LOCAL, so it only
+      lasts for the current transaction and pooled connections are unaffected;
+    - an optional EXPLAIN cost ceiling (QUERY_MAX_PLAN_COST, 0 = off) that
+      rejects a plan before it runs;
+    - a row cap (QUERY_MAX_ROWS): chart rows beyond it are dropped, while
+      intermediate rows that feed an aggregate raise instead of under-counting.
+
+    Timeouts and cost checks need Postgres; on other dialects only the row cap
+    applies.
+    """
+
+    def fetch(
+        self,
+        db: Session,
+        sql: str,
+        params: dict[str, Any],
+        limit: int | None = None,
+        truncate: bool = True,
+    ) -> Sequence[Any]:
+        cap = max(1, settings.QUERY_MAX_ROWS)
+        if limit is not None:
+            cap = min(cap, limit)
+        started = time.perf_counter()
+        with self.guarded(db):
+            self.apply_timeout(db)
+            self.check_cost(db, sql, params)
+            rows = db.execute(text(sql), params).fetchmany(cap + 1)
+        guard_seconds.observe(time.perf_counter() - started)
+
+        if len(rows) <= cap:
+            guard_outcomes.inc(outcome="ok")
+            return rows
+        if truncate:
+            guard_outcomes.inc(outcome="truncated")
+            return rows[:cap]
+        guard_outcomes.inc(outcome=QueryRowLimitError.outcome)
+        raise QueryRowLimitError("This question matches too many rows to chart. Narrow the date range.")
+
+    @staticmethod
+    def apply_timeout(db: Session) -> None:
+        if db.get_bind().dialect.name == "postgresql":
+            # SET LOCAL: scoped to the current transaction, so pooled connections reset.
+            db.execute(text(f"SET LOCAL statement_timeout = {int(settings.QUERY_STATEMENT_TIMEOUT_MS)}"))
+
+    def check_cost(self, db: Session, sql: str, params: dict[str, Any]) -> None:
+        max_cost = settings.QUERY_MAX_PLAN_COST
+        if max_cost <= 0 or db.get_bind().dialect.name != "postgresql":
+            return
+        explained = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar_one()
+        cost = self.plan_cost(explained)
+        if cost > max_cost:
+            logger.warning("Rejected insight query with plan cost %.0f (limit %.0f)", cost, max_cost)
+            guard_outcomes.inc(outcome=QueryCostError.outcome)
+            raise QueryCostError("This question is too expensive to answer. Narrow the date range.")
+
+    @staticmethod
+    def plan_cost(explained: Any) -> float:
+        """Top-level "Total Cost" from EXPLAIN (FORMAT JSON) output."""
+        if isinstance(explained, str):
+            explained = json.loads(explained)
+        return float(explained[0]["Plan"]["Total Cost"])
+
+    @contextmanager
+    def guarded(self, db: Session) -> Iterator[None]:
+        """Turns a statement timeout into QueryTimeoutError (and resets the aborted transaction)."""
+        try:
+            yield
+        except DBAPIError as exc:
+            if not self.is_timeout(exc):
+                raise
+            db.rollback()
+            guard_outcomes.inc(outcome=QueryTimeoutError.outcome)
+            raise QueryTimeoutError("This question took too long to answer. Narrow the date range.") from exc
+
+    @staticmethod
+    def is_timeout(exc: DBAPIError) -> bool:
+        # psycopg2 exposes pgcode; the asyncpg adapter sets both pgcode and sqlstate.
+        code = getattr(exc.orig, "pgcode", None) or getattr(exc.orig, "sqlstate", None)
+        return code == _QUERY_CANCELED
+
+
+query_guard = QueryGuard()
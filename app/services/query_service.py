@@ -1,13 +1,71 @@
 from __future__ import annotations
 
 import calendar
+import logging
+import re
 from dataclasses import dataclass
-from datetime import date
+from datetime import date, timedelta
+from typing import ClassVar
 
-from sqlalchemy import text
+from openai import OpenAIError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.cache import computation, data_versions, query_cache
 from app.core.config import settings
+from app.models.expense import Expense
+from app.services.analytics_cube import CUBE_INTENTS, analytics_cube
+from app.services.finance import RateMatrix
+from app.services.query_guard import QueryGuardError, query_guard
+from app.services.reporting import reporting_service
+from app.services.rollup_service import DEFAULT_CATEGORY
+from app.services.text_to_sql_service import (
+    SqlValidationError,
+    question_template,
+    scoped_sql,
+    text_to_sql_service,
+)
+
+logger = logging.getLogger(__name__)
+
+TEXT_TO_SQL_INTENT = "text_to_sql"
+
+# Receipt line items joined to their expense. expense_date is part of the join
+# so Postgres can match yearly partitions of both tables pairwise.
+ITEM_SOURCE_SQL = "expenses e JOIN expense_items i ON i.expense_id = e.id AND i.expense_date = e.date"
+# Item prices are in the receipt currency; fx_rate converts them to base.
+ITEM_UNIT_PRICE_SQL = "i.price / NULLIF(i.quantity, 0) * e.fx_rate"
+# "average price I pay for tomatoes" -> "tomatoes": the words after the last
+# for/on/of, minus trailing time phrases.
+_ITEM_TERM = re.compile(
+    r".*\b(?:for|on|of)\s+(?:the\s+|my\s+)?([a-z][a-z0-9 '&-]*?)"
+    r"\s*(?:\b(?:in|last|this|per|during|since|over)\b.*)?$"
+)
+# Categories receipts and statements are filed under (see the OCR and statement
+# prompts), singular and lower case; "spend on groceries" asks about one of
+# these rather than an item.
+_KNOWN_CATEGORIES = frozenset(
+    {"grocery", "dining", "transport", "utility", "shopping", "entertainment", "health", "travel", "home", "other"}
+)
+# Plural endings that take "es"; other words just drop the "s".
+_ES_PLURALS = ("ches", "shes", "sses", "xes", "zes", "oes")
+# Period comparisons: "yoy"/"mom" or the spelled-out forms, or any comparison
+# wording (then "last year"/"last month" pick the period).
+_COMPARE_PHRASES = (" vs ", " vs. ", " versus ", "compare", "previous period", "prior period", "period over period")
+
+
+def _month_index(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+def _month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _period_label(first_index: int, last_index: int) -> str:
+    first = _month_start(first_index).strftime("%Y-%m")
+    return first if first_index == last_index else f"{first} to {_month_start(last_index).strftime('%Y-%m')}"
 
 
 @dataclass
@@ -19,6 +77,35 @@ class QueryResult:
     labels: list[str]
     values: list[float]
     summary: str
+    currency: str = settings.BASE_CURRENCY
+    cache_hit: bool = False
+    # Named series for multi-dataset charts (period comparisons: current/previous/delta).
+    series: dict[str, list[float]] | None = None
+
+
+@dataclass
+class IntentPlan:
+    name: str
+    label_sql: str
+    measure: str  # "count" or "sum"
+    order_by: str
+    limit: int
+    chart_type: str
+    summary: str
+    from_sql: str = "expenses"
+    value_expr: str = ""
+    # Period comparisons: "mom", "yoy" or "period" (previous period of the same length).
+    comparison: str = ""
+
+    @property
+    def value_sql(self) -> str:
+        if self.value_expr:
+            return self.value_expr
+        return "COUNT(*)" if self.measure == "count" else "SUM(base_currency_amount)"
+
+    @property
+    def is_item_plan(self) -> bool:
+        return self.from_sql != "expenses"
 
 
 @dataclass
@@ -27,12 +114,49 @@ class DateRange:
     end_date: date | None
 
 
+@dataclass
+class PreparedQuery:
+    """A question resolved to its intent plan and parameterized SQL, not yet executed."""
+
+    owner_email: str
+    question: str
+    intent: str
+    plan: IntentPlan
+    sql_query: str
+    params: dict[str, object]
+    currency: str
+    converted: bool
+    summary: str
+    # Set for LLM-generated SQL: its cache template and the date filters that
+    # go into the owner-scoped CTEs at execution time.
+    template: str | None = None
+    date_filters: str = ""
+
+
 class QueryService:
     """A constrained natural-language to SQL helper for expense analytics."""
 
     def __init__(self) -> None:
         self.base_currency = settings.BASE_CURRENCY
 
+    # Explicit intents map onto the phrases the keyword planner recognises.
+    INTENT_PHRASES: ClassVar[dict[str, str]] = {
+        "visits": "visits by vendor",
+        "spend_by_category": "biggest category spend",
+        "spend_by_vendor": "vendor spend",
+        "monthly_trend": "monthly trend",
+        "category_split": "category split",
+        "item_spend": "item spend",
+        "item_unit_price": "average unit price",
+        "item_price_trend": "item price trend",
+        "category_mom": "category month over month",
+        "vendor_mom": "vendor month over month",
+        "category_yoy": "category year over year",
+        "vendor_yoy": "vendor year over year",
+        "category_period": "category vs previous period",
+        "vendor_period": "vendor vs previous period",
+    }
+
     def answer_question(
         self,
         db: Session,
@@ -42,7 +166,29 @@ class QueryService:
         start_date: str | None = None,
         end_date: str | None = None,
         intent: str | None = None,
+        currency: str | None = None,
     ) -> QueryResult:
+        prepared = self.prepare(
+            owner_email=owner_email,
+            question=question,
+            month=month,
+            start_date=start_date,
+            end_date=end_date,
+            intent=intent,
+            currency=currency,
+        )
+        return self.execute(db, prepared)
+
+    def prepare(
+        self,
+        owner_email: str,
+        question: str,
+        month: str | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None,
+        intent: str | None = None,
+        currency: str | None = None,
+    ) -> PreparedQuery:
         normalized = (question or "").strip().lower()
         if not normalized:
             raise ValueError("Question cannot be empty.")
@@ -50,94 +196,493 @@ class QueryService:
         date_range = self._resolve_date_range(month=month, start_date=start_date, end_date=end_date)
         where_clause, params = self._build_where_clause(owner_email=owner_email, date_range=date_range)
         normalized_intent = (intent or "").strip().lower()
-        if normalized_intent:
-            if normalized_intent == "visits":
-                normalized = "visits by vendor"
-            elif normalized_intent == "spend_by_category":
-                normalized = "biggest category spend"
-            elif normalized_intent == "spend_by_vendor":
-                normalized = "vendor spend"
-            elif normalized_intent == "monthly_trend":
-                normalized = "monthly trend"
-            elif normalized_intent == "category_split":
-                normalized = "category split"
+        if text_to_sql_service.enabled and normalized_intent in ("", TEXT_TO_SQL_INTENT):
+            generated = self._prepare_generated(owner_email, question, date_range, params)
+            if generated is not None:
+                return generated
+        normalized = self.INTENT_PHRASES.get(normalized_intent, normalized)
 
-        if "visit" in normalized and ("store" in normalized or "vendor" in normalized or "merchant" in normalized):
-            sql_query = """
-                SELECT vendor AS label, COUNT(*) AS value
-                FROM expenses
-            """
-            sql_query += where_clause + """
-                GROUP BY vendor
-                ORDER BY value DESC
-                LIMIT 10
-            """
-            chart_type = "bar"
-            summary = "Most visited stores by transaction count."
-        elif "biggest" in normalized and ("category" in normalized or "spend pot" in normalized):
-            sql_query = """
-                SELECT category AS label, SUM(base_currency_amount) AS value
-                FROM expenses
-            """
-            sql_query += where_clause + """
-                GROUP BY category
-                ORDER BY value DESC
-                LIMIT 10
-            """
-            chart_type = "bar"
-            summary = f"Top spending categories in {self.base_currency}."
-        elif "vendor" in normalized or "merchant" in normalized:
-            sql_query = """
-                SELECT vendor AS label, SUM(base_currency_amount) AS value
-                FROM expenses
-            """
-            sql_query += where_clause + """
-                GROUP BY vendor
-                ORDER BY value DESC
-                LIMIT 10
-            """
-            chart_type = "bar"
-            summary = f"Top vendors by spend in {self.base_currency}."
-        elif "month" in normalized or "trend" in normalized:
-            sql_query = """
-                SELECT to_char(date, 'YYYY-MM') AS label, SUM(base_currency_amount) AS value
-                FROM expenses
-            """
-            sql_query += where_clause + """
-                GROUP BY label
-                ORDER BY label
-                LIMIT 24
-            """
-            chart_type = "line"
-            summary = f"Monthly spending trend in {self.base_currency}."
+        display_currency = reporting_service.resolve_display_currency(currency)
+        plan = self._plan_for(normalized, display_currency)
+        if plan.comparison:
+            return self._prepare_comparison(owner_email, question, normalized_intent, plan, date_range)
+        if plan.is_item_plan:
+            # Item prices are only converted to base; they are reported as such.
+            display_currency = self.base_currency
+            where_clause, params = self._item_where_clause(
+                where_clause, params, date_range, self._item_terms(question)
+            )
+        converted = plan.measure == "sum" and not reporting_service.is_base(display_currency)
+        if converted:
+            sql_query = self._converted_sql(plan, where_clause)
         else:
-            sql_query = """
-                SELECT category AS label, SUM(base_currency_amount) AS value
-                FROM expenses
-            """
-            sql_query += where_clause + """
-                GROUP BY category
-                ORDER BY value DESC
-                LIMIT 10
+            sql_query = f"""
+                SELECT {plan.label_sql} AS label, {plan.value_sql} AS value
+                FROM {plan.from_sql}
+                {where_clause}
+                GROUP BY {plan.label_sql}
+                ORDER BY {plan.order_by}
+                LIMIT {plan.limit}
             """
-            chart_type = "pie"
-            summary = f"Category split in {self.base_currency}."
 
-        rows = db.execute(text(sql_query), params).mappings().all()
-        labels: list[str] = [str(r["label"]) for r in rows]
-        values: list[float] = [float(r["value"]) for r in rows]
+        summary = plan.summary
         if date_range.start_date and date_range.end_date:
             summary += f" Date range: {date_range.start_date.isoformat()} to {date_range.end_date.isoformat()}."
-        return QueryResult(
+        return PreparedQuery(
+            owner_email=owner_email,
             question=question,
             intent=normalized_intent or "auto",
+            plan=plan,
             sql_query=" ".join(sql_query.split()),
-            chart_type=chart_type,
-            labels=labels,
-            values=values,
+            params=params,
+            currency=display_currency,
+            converted=converted,
             summary=summary,
         )
 
+    def _prepare_comparison(
+        self,
+        owner_email: str,
+        question: str,
+        normalized_intent: str,
+        plan: IntentPlan,
+        date_range: DateRange,
+    ) -> PreparedQuery:
+        """
+        Current vs previous period per label, in one statement: monthly totals
+        are laid on a dense label x month grid, summed over the period length
+        with a window frame, and LAG reaches back one period. Periods are whole
+        months; the current one ends with the month of the range end (or today).
+        """
+        current_month = _month_index(date_range.end_date or date.today())
+        if plan.comparison == "period" and date_range.start_date and date_range.end_date:
+            months = max(1, current_month - _month_index(date_range.start_date) + 1)
+        else:
+            months = 1
+        lag = 12 if plan.comparison == "yoy" else months
+        first_month = current_month - lag - months + 1
+        grid = " UNION ALL ".join(f"SELECT {index} AS month_index" for index in range(first_month, current_month + 1))
+        month_sql = (
+            "CAST(substr(CAST(date AS TEXT), 1, 4) AS INTEGER) * 12"
+            " + CAST(substr(CAST(date AS TEXT), 6, 2) AS INTEGER) - 1"
+        )
+        sql_query = f"""
+            WITH grid AS ({grid}),
+            monthly AS (
+                SELECT {plan.label_sql} AS label,
+                       {month_sql} AS month_index,
+                       SUM(base_currency_amount) AS value
+                FROM expenses
+                WHERE owner_email = :owner_email AND date >= :window_start AND date <= :window_end
+                GROUP BY 1, 2
+            ),
+            dense AS (
+                SELECT labels.label, grid.month_index, COALESCE(monthly.value, 0) AS value
+                FROM (SELECT DISTINCT label FROM monthly) AS labels
+                CROSS JOIN grid
+                LEFT JOIN monthly ON monthly.label = labels.label AND monthly.month_index = grid.month_index
+            ),
+            periods AS (
+                SELECT label, month_index, SUM(value) OVER (
+                    PARTITION BY label ORDER BY month_index ROWS BETWEEN {months - 1} PRECEDING AND CURRENT ROW
+                ) AS current_value
+                FROM dense
+            ),
+            compared AS (
+                SELECT label, month_index, current_value,
+                       COALESCE(LAG(current_value, {lag}) OVER (PARTITION BY label ORDER BY month_index), 0)
+                           AS previous_value
+                FROM periods
+            )
+            SELECT label, current_value, previous_value, current_value - previous_value AS delta
+            FROM compared
+            WHERE month_index = {current_month}
+            ORDER BY current_value + previous_value DESC, label
+            LIMIT {plan.limit}
+        """
+        current_label = _period_label(current_month - months + 1, current_month)
+        previous_label = _period_label(current_month - lag - months + 1, current_month - lag)
+        summary = f"{plan.summary} {current_label} vs {previous_label}, in {self.base_currency}."
+        return PreparedQuery(
+            owner_email=owner_email,
+            question=question,
+            intent=normalized_intent or "auto",
+            plan=plan,
+            sql_query=" ".join(sql_query.split()),
+            params={
+                "owner_email": owner_email,
+                "window_start": _month_start(first_month),
+                "window_end": _month_start(current_month + 1) - timedelta(days=1),
+            },
+            currency=self.base_currency,
+            converted=False,
+            summary=summary,
+        )
+
+    def _prepare_generated(
+        self,
+        owner_email: str,
+        question: str,
+        date_range: DateRange,
+        params: dict[str, object],
+    ) -> PreparedQuery | None:
+        """LLM-planned query, or None to fall back to the keyword intents."""
+        template, template_params = question_template(question)
+        try:
+            sql_plan, _ = text_to_sql_service.plan_for(template, template_params)
+        except (SqlValidationError, OpenAIError) as exc:
+            logger.warning("Text-to-SQL unavailable for %r, using keyword intents: %s", template, exc)
+            return None
+
+        date_filters = ""
+        if date_range.start_date:
+            date_filters += " AND date >= :start_date"
+        if date_range.end_date:
+            date_filters += " AND date <= :end_date"
+        summary = sql_plan.summary or "Answer generated from your question."
+        if date_range.start_date and date_range.end_date:
+            summary += f" Date range: {date_range.start_date.isoformat()} to {date_range.end_date.isoformat()}."
+        return PreparedQuery(
+            owner_email=owner_email,
+            question=question,
+            intent=TEXT_TO_SQL_INTENT,
+            plan=IntentPlan(
+                name=TEXT_TO_SQL_INTENT,
+                label_sql="label",
+                measure="sum",
+                order_by="",
+                limit=settings.TEXT_TO_SQL_MAX_ROWS,
+                chart_type=sql_plan.chart_type,
+                summary=summary,
+            ),
+            sql_query=sql_plan.sql,
+            params={**template_params, **params},
+            currency=self.base_currency,
+            converted=False,
+            summary=summary,
+            template=template,
+            date_filters=date_filters,
+        )
+
+    async def prefetch_rates(self, db: AsyncSession, prepared: PreparedQuery) -> RateMatrix | None:
+        """
+        The FX rates `execute` needs for a converted query, fetched before it
+        runs: under `run_sync` the provider call would block the event loop.
+        """
+        if not prepared.converted:
+            return None
+        filters = [Expense.owner_email == prepared.owner_email]
+        if prepared.params.get("start_date"):
+            filters.append(Expense.date >= prepared.params["start_date"])
+        if prepared.params.get("end_date"):
+            filters.append(Expense.date <= prepared.params["end_date"])
+        return await reporting_service.prefetch_rates(db, filters, prepared.currency)
+
+    def execute(self, db: Session, prepared: PreparedQuery, rates: RateMatrix | None = None) -> QueryResult:
+        cache_key = (
+            "insights-query",
+            prepared.sql_query,
+            self._params_key(prepared.params),
+            prepared.currency,
+        )
+        cache_hit, cached = query_cache.lookup(prepared.owner_email, cache_key)
+        series = None
+        if cache_hit:
+            labels, values, series = cached
+        else:
+            # Version captured before running, so a racing write can't leave a stale entry.
+            version = data_versions.get(prepared.owner_email)
+            with computation() as scope:
+                if prepared.template is not None:
+                    labels, values = self._run_generated(db, prepared)
+                elif prepared.plan.comparison:
+                    labels, values, series = self._run_comparison(db, prepared)
+                elif analytics_cube.enabled and prepared.plan.name in CUBE_INTENTS:
+                    labels, values = analytics_cube.intent_totals(
+                        db,
+                        prepared.owner_email,
+                        prepared.plan.name,
+                        start=prepared.params.get("start_date"),
+                        end=prepared.params.get("end_date"),
+                        display_currency=prepared.currency,
+                        order_by_label=prepared.plan.order_by == "label",
+                        limit=prepared.plan.limit,
+                        rates=rates,
+                    )
+                elif prepared.converted:
+                    labels, values = self._run_converted(
+                        db, prepared.plan, prepared.sql_query, prepared.params, prepared.currency, rates
+                    )
+                else:
+                    rows = query_guard.fetch(db, prepared.sql_query, prepared.params)
+                    labels = [str(r.label) for r in rows]
+                    values = [float(r.value) for r in rows]
+            # Results built from fallback FX rates are served, not kept.
+            if scope.cacheable and (rates is None or rates.complete):
+                query_cache.store(
+                    prepared.owner_email, cache_key, (tuple(labels), tuple(values), series), version=version
+                )
+
+        return QueryResult(
+            question=prepared.question,
+            intent=prepared.intent,
+            sql_query=prepared.sql_query,
+            chart_type=prepared.plan.chart_type,
+            labels=list(labels),
+            values=list(values),
+            summary=prepared.summary,
+            currency=prepared.currency,
+            cache_hit=cache_hit,
+            series={name: list(data) for name, data in series.items()} if series else None,
+        )
+
+    def _plan_for(self, normalized: str, display_currency: str) -> IntentPlan:
+        comparison_plan = self._comparison_plan_for(normalized)
+        if comparison_plan is not None:
+            return comparison_plan
+        item_plan = self._item_plan_for(normalized)
+        if item_plan is not None:
+            return item_plan
+        if "visit" in normalized and ("store" in normalized or "vendor" in normalized or "merchant" in normalized):
+            return IntentPlan(
+                name="visits",
+                label_sql="vendor",
+                measure="count",
+                order_by="value DESC",
+                limit=10,
+                chart_type="bar",
+                summary="Most visited stores by transaction count.",
+            )
+        if "biggest" in normalized and ("category" in normalized or "spend pot" in normalized):
+            return IntentPlan(
+                name="spend_by_category",
+                label_sql="category",
+                measure="sum",
+                order_by="value DESC",
+                limit=10,
+                chart_type="bar",
+                summary=f"Top spending categories in {display_currency}.",
+            )
+        if "vendor" in normalized or "merchant" in normalized:
+            return IntentPlan(
+                name="spend_by_vendor",
+                label_sql="vendor",
+                measure="sum",
+                order_by="value DESC",
+                limit=10,
+                chart_type="bar",
+                summary=f"Top vendors by spend in {display_currency}.",
+            )
+        if "month" in normalized or "trend" in normalized:
+            return IntentPlan(
+                name="monthly_trend",
+                label_sql="to_char(date, 'YYYY-MM')",
+                measure="sum",
+                order_by="label",
+                limit=24,
+                chart_type="line",
+                summary=f"Monthly spending trend in {display_currency}.",
+            )
+        return IntentPlan(
+            name="category_split",
+            label_sql="category",
+            measure="sum",
+            order_by="value DESC",
+            limit=10,
+            chart_type="pie",
+            summary=f"Category split in {display_currency}.",
+        )
+
+    @staticmethod
+    def _comparison_plan_for(normalized: str) -> IntentPlan | None:
+        text = " ".join(re.findall(r"[a-z.]+", normalized.replace("-", " ")))
+        words = set(text.split())
+        comparing = any(phrase in f" {text} " for phrase in _COMPARE_PHRASES)
+        if "yoy" in words or "year over year" in text or (comparing and ("last year" in text or "previous year" in text)):
+            comparison, label = "yoy", "year over year"
+        elif "mom" in words or "month over month" in text or (
+            comparing and ("last month" in text or "previous month" in text)
+        ):
+            comparison, label = "mom", "month over month"
+        elif comparing:
+            comparison, label = "period", "vs the previous period"
+        else:
+            return None
+        if "vendor" in normalized or "merchant" in normalized or "store" in normalized:
+            name, label_sql, noun = "vendor", "vendor", "Vendor spend"
+        else:
+            name, label_sql, noun = "category", f"COALESCE(category, '{DEFAULT_CATEGORY}')", "Category spend"
+        return IntentPlan(
+            name=f"{name}_{comparison}",
+            label_sql=label_sql,
+            measure="sum",
+            order_by="value DESC",
+            limit=10,
+            chart_type="bar",
+            summary=f"{noun} {label}:",
+            comparison=comparison,
+        )
+
+    def _item_plan_for(self, normalized: str) -> IntentPlan | None:
+        mentions_price = "price" in normalized or "cost per" in normalized
+        if mentions_price and ("trend" in normalized or "history" in normalized or "over time" in normalized):
+            return IntentPlan(
+                name="item_price_trend",
+                # Portable YYYY-MM label: ISO text of the date, first seven characters.
+                label_sql="substr(CAST(e.date AS TEXT), 1, 7)",
+                measure="avg",
+                order_by="label",
+                limit=24,
+                chart_type="line",
+                summary=f"Average unit price per month in {self.base_currency}.",
+                from_sql=ITEM_SOURCE_SQL,
+                value_expr=f"AVG({ITEM_UNIT_PRICE_SQL})",
+            )
+        asks_unit_price = mentions_price and ("average" in normalized or "unit" in normalized or "pay" in normalized)
+        if asks_unit_price or ("average" in normalized and "pay" in normalized):
+            return IntentPlan(
+                name="item_unit_price",
+                label_sql="i.name",
+                measure="avg",
+                order_by="value DESC",
+                limit=10,
+                chart_type="bar",
+                summary=f"Average unit price per item in {self.base_currency}.",
+                from_sql=ITEM_SOURCE_SQL,
+                value_expr=f"AVG({ITEM_UNIT_PRICE_SQL})",
+            )
+        asks_spend_on = "spend on" in normalized or "spent on" in normalized
+        if "item" in normalized or (asks_spend_on and not self._names_category(normalized)):
+            return IntentPlan(
+                name="item_spend",
+                label_sql="i.name",
+                measure="sum",
+                order_by="value DESC",
+                limit=10,
+                chart_type="bar",
+                summary=f"Spend per item in {self.base_currency}.",
+                from_sql=ITEM_SOURCE_SQL,
+                value_expr="SUM(i.price * e.fx_rate)",
+            )
+        return None
+
+    @classmethod
+    def _names_category(cls, question: str) -> bool:
+        terms = cls._item_terms(question)
+        return bool(terms) and terms[0] in _KNOWN_CATEGORIES
+
+    @staticmethod
+    def _item_terms(question: str) -> tuple[str, ...]:
+        """The item asked about, singular first and then as asked ("berries" -> berry, berries)."""
+        match = _ITEM_TERM.search(" ".join((question or "").lower().split()).rstrip("?!. "))
+        if not match:
+            return ()
+        term = match.group(1).strip()
+        if term in {"", "items", "item", "each item", "everything", "all items"}:
+            return ()
+        head, _, word = term.rpartition(" ")
+        if word.endswith("ies") and len(word) > 4:
+            word = word[:-3] + "y"
+        elif word.endswith(_ES_PLURALS) and len(word) > 4:
+            word = word[:-2]
+        elif word.endswith("s") and not word.endswith(("ss", "us", "is")) and len(word) > 3:
+            word = word[:-1]
+        singular = f"{head} {word}" if head else word
+        return (singular,) if singular == term else (singular, term)
+
+    @staticmethod
+    def _item_where_clause(
+        where_clause: str,
+        params: dict[str, object],
+        date_range: DateRange,
+        item_terms: tuple[str, ...],
+    ) -> tuple[str, dict[str, object]]:
+        params = dict(params)
+        clauses = []
+        # Same range on the items' own partition key so their partitions are pruned too.
+        if date_range.start_date:
+            clauses.append("i.expense_date >= :start_date")
+        if date_range.end_date:
+            clauses.append("i.expense_date <= :end_date")
+        if item_terms:
+            # Served by the pg_trgm GIN index on lower(name), even with the leading wildcard.
+            # The terms never contain LIKE wildcards: _ITEM_TERM only captures [a-z0-9 '&-].
+            # Both forms, since "berry" isn't a substring of "Berries".
+            patterns = []
+            for index, term in enumerate(item_terms):
+                patterns.append(f"lower(i.name) LIKE :item_pattern_{index}")
+                params[f"item_pattern_{index}"] = f"%{term}%"
+            clauses.append(f"({' OR '.join(patterns)})")
+        if not clauses:
+            return where_clause, params
+        return where_clause + " AND " + " AND ".join(clauses), params
+
+    @staticmethod
+    def _run_generated(db: Session, prepared: PreparedQuery) -> tuple[list[str], list[float]]:
+        # SQLite resolves an unqualified self-reference inside a CTE to the CTE itself.
+        table_prefix = "main." if db.get_bind().dialect.name == "sqlite" else ""
+        sql_query = scoped_sql(prepared.sql_query, prepared.date_filters, table_prefix)
+        try:
+            rows = query_guard.fetch(db, sql_query, prepared.params, limit=prepared.plan.limit)
+            labels = [str(r._mapping["label"]) for r in rows]
+            values = [float(r._mapping["value"] or 0) for r in rows]
+        except QueryGuardError:
+            # The plan itself is fine; the data or the limits made it fail.
+            raise
+        except (SQLAlchemyError, KeyError, TypeError, ValueError) as exc:
+            db.rollback()
+            # Don't keep serving a plan that cannot run; the next ask regenerates it.
+            text_to_sql_service.forget(prepared.template)
+            raise ValueError("The generated query could not be run. Try rephrasing the question.") from exc
+        return labels, values
+
+    @staticmethod
+    def _run_comparison(
+        db: Session, prepared: PreparedQuery
+    ) -> tuple[list[str], list[float], dict[str, tuple[float, ...]]]:
+        rows = query_guard.fetch(db, prepared.sql_query, prepared.params)
+        labels = [str(r.label) for r in rows]
+        series = {
+            "current": tuple(float(r.current_value or 0) for r in rows),
+            "previous": tuple(float(r.previous_value or 0) for r in rows),
+            "delta": tuple(float(r.delta or 0) for r in rows),
+        }
+        # Single-series consumers (saved chart types, summaries) see the change.
+        return labels, list(series["delta"]), series
+
+    @staticmethod
+    def _converted_sql(plan: IntentPlan, where_clause: str) -> str:
+        return f"""
+            SELECT {plan.label_sql} AS label, currency, date, SUM(amount) AS value
+            FROM expenses
+            {where_clause}
+            GROUP BY {plan.label_sql}, currency, date
+        """
+
+    @staticmethod
+    def _run_converted(
+        db: Session,
+        plan: IntentPlan,
+        sql_query: str,
+        params: dict[str, object],
+        display_currency: str,
+        rates: RateMatrix | None = None,
+    ) -> tuple[list[str], list[float]]:
+        """Group original amounts per (label, currency, day) and convert them in one pass."""
+        # Every fact feeds a total, so too many rows is an error rather than a truncation.
+        rows = query_guard.fetch(db, sql_query, params, truncate=False)
+        totals = reporting_service.convert_grouped(rows, display_currency, rates)
+        if plan.order_by == "label":
+            ordered = sorted(totals.items(), key=lambda kv: str(kv[0]))
+        else:
+            ordered = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+        ordered = ordered[: plan.limit]
+        return [str(label) for label, _ in ordered], [value for _, value in ordered]
+
+    @staticmethod
+    def _params_key(params: dict[str, object]) -> tuple:
+        return tuple(sorted((name, str(value)) for name, value in params.items()))
+
     @staticmethod
     def _resolve_date_range(month: str | None, start_date: str | None, end_date: str | None) -> DateRange:
         if month:
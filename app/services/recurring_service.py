@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import data_versions
+from app.models.expense import Expense
+from app.models.recurring_payment import RecurringPayment
+
+EPOCH = date(1970, 1, 1)
+
+# (cadence, expected days between charges, tolerance in days)
+CADENCES = (
+    ("weekly", 7.0, 1.5),
+    ("biweekly", 14.0, 2.5),
+    ("monthly", 30.44, 4.0),
+    ("quarterly", 91.31, 10.0),
+    ("yearly", 365.25, 20.0),
+)
+MIN_OCCURRENCES = 3
+# Share of intervals that must sit within the cadence tolerance.
+MIN_REGULARITY = 0.75
+# Median absolute deviation of the amounts, relative to their median.
+MAX_AMOUNT_VARIATION = 0.2
+
+_PAYMENT_PREFIX = re.compile(r"^(?:paypal|sq|sumup|stripe|pp)\s*\*\s*")
+_LEGAL_SUFFIX = re.compile(r"\b(?:gmbh|ag|inc|llc|ltd|limited|corp|co|sarl|bv|se|plc|www|com|de|net)\b")
+
+
+def normalize_vendor(vendor: str | None) -> str:
+    """'PAYPAL *Netflix.com 4029357733' and 'NETFLIX' both become 'netflix'."""
+    raw = (vendor or "").strip().lower()
+    text = _PAYMENT_PREFIX.sub("", raw)
+    # Digits are mostly reference numbers, card suffixes and store numbers.
+    text = re.sub(r"[^a-z]+", " ", text)
+    text = _LEGAL_SUFFIX.sub(" ", text)
+    return " ".join(text.split()) or raw
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@dataclass
+class Detection:
+    cadence: str
+    interval_days: float
+    amount: float
+    amount_variation: float
+    occurrences: int
+    first_date: date
+    last_date: date
+    next_expected_date: date
+    confidence: float
+
+
+def detect_series(days: np.ndarray, amounts: np.ndarray) -> Detection | None:
+    """
+    Interval and amount-stability test for one vendor's charges (epoch days,
+    base amounts, in any order). If the whole series isn't recurring, the
+    charges around its most frequent amount are tried on their own, so a
+    subscription is still found among one-off purchases at the same vendor.
+    """
+    # Charges on the same day count once (split or corrected payments).
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    totals = np.bincount(inverse, weights=amounts)
+    detection = _analyse(unique_days, totals)
+    if detection is not None or len(days) < MIN_OCCURRENCES:
+        return detection
+
+    rounded, counts = np.unique(np.round(amounts, 0), return_counts=True)
+    typical = amounts[np.round(amounts, 0) == rounded[np.argmax(counts)]]
+    center = float(np.median(typical))
+    band = np.abs(amounts - center) <= MAX_AMOUNT_VARIATION * max(abs(center), 1e-9)
+    if band.all() or band.sum() < MIN_OCCURRENCES:
+        return None
+    unique_days, inverse = np.unique(days[band], return_inverse=True)
+    return _analyse(unique_days, np.bincount(inverse, weights=amounts[band]))
+
+
+def _analyse(days: np.ndarray, amounts: np.ndarray) -> Detection | None:
+    if len(days) < MIN_OCCURRENCES:
+        return None
+    intervals = np.diff(days).astype(np.float64)
+    median_interval = float(np.median(intervals))
+    for cadence, expected, tolerance in CADENCES:
+        if abs(median_interval - expected) <= tolerance:
+            break
+    else:
+        return None
+
+    regularity = float(np.mean(np.abs(intervals - expected) <= tolerance))
+    median_amount = float(np.median(amounts))
+    if regularity < MIN_REGULARITY or median_amount <= 0:
+        return None
+    variation = float(np.median(np.abs(amounts - median_amount))) / median_amount
+    if variation > MAX_AMOUNT_VARIATION:
+        return None
+
+    # More occurrences and steadier amounts raise confidence; capped at 1.
+    support = min(1.0, len(days) / 6)
+    confidence = regularity * (1.0 - variation / (2 * MAX_AMOUNT_VARIATION)) * (0.5 + 0.5 * support)
+    last_day = int(days[-1])
+    return Detection(
+        cadence=cadence,
+        interval_days=round(median_interval, 2),
+        amount=round(median_amount, 2),
+        amount_variation=round(variation, 4),
+        occurrences=len(days),
+        first_date=EPOCH + timedelta(days=int(days[0])),
+        last_date=EPOCH + timedelta(days=last_day),
+        next_expected_date=EPOCH + timedelta(days=last_day + round(median_interval)),
+        confidence=round(confidence, 3),
+    )
+
+
+class RecurringPaymentService:
+    """
+    Maintains `recurring_payments` from the ledger.
+
+    Charges are grouped per owner by normalized vendor. Write paths call
+    `refresh` with the vendors they touched inside their own transaction, so
+    only those groups are re-analysed; `rebuild` re-analyses everything.
+    """
+
+    def refresh(self, db: Session, owner_email: str, vendors: Iterable[str | None]) -> int:
+        """Re-detect the groups of the given vendors. Returns recurring payments stored."""
+        vendors = {vendor for vendor in vendors if vendor is not None}
+        keys = {normalize_vendor(vendor) for vendor in vendors}
+        if not keys:
+            return 0
+        db.flush()
+        # Every spelling that normalizes into an affected group must be reloaded.
+        # Each word of a key appears in the lowercased spelling, so the database
+        # only returns candidate charges; the exact group check is done here.
+        lowered = func.lower(Expense.vendor)
+        candidates = [
+            Expense.vendor.in_(vendors),
+            *(
+                and_(*(lowered.like(f"%{_like_escape(word)}%", escape="\\") for word in key.split()))
+                for key in keys
+                if key.split()
+            ),
+        ]
+        rows = [
+            row
+            for row in db.execute(
+                select(Expense.vendor, Expense.date, Expense.base_currency_amount).where(
+                    Expense.owner_email == owner_email, or_(*candidates)
+                )
+            ).all()
+            if normalize_vendor(row.vendor) in keys
+        ]
+        db.execute(
+            delete(RecurringPayment).where(
+                RecurringPayment.owner_email == owner_email, RecurringPayment.vendor_key.in_(keys)
+            )
+        )
+        return self._store(db, owner_email, rows)
+
+    def rebuild(self, db: Session, owner_email: str | None = None) -> int:
+        """Re-detect every group (all owners, or one) and commit. Returns rows stored."""
+        owners = (
+            [owner_email]
+            if owner_email
+            else db.scalars(select(Expense.owner_email).distinct()).all()
+        )
+        stored = 0
+        for owner in owners:
+            rows = db.execute(
+                select(Expense.vendor, Expense.date, Expense.base_currency_amount).where(
+                    Expense.owner_email == owner
+                )
+            ).all()
+            db.execute(delete(RecurringPayment).where(RecurringPayment.owner_email == owner))
+            stored += self._store(db, owner, rows)
+        data_versions.bump(db, *owners)
+        db.commit()
+        return stored
+
+    def detect(self, rows: Sequence[Any]) -> dict[str, tuple[str, Detection]]:
+        """(vendor, date, base amount) rows -> {vendor_key: (display vendor, detection)}."""
+        if not rows:
+            return {}
+        vendors, raw_days, amounts = zip(*rows)
+        group_keys = [normalize_vendor(vendor) for vendor in vendors]
+        names, codes = np.unique(np.array(group_keys, dtype=object), return_inverse=True)
+        days = np.array(
+            [(d if isinstance(d, date) else date.fromisoformat(str(d)[:10])).toordinal() for d in raw_days],
+            dtype=np.int64,
+        ) - EPOCH.toordinal()
+        values = np.array([float(amount or 0.0) for amount in amounts], dtype=np.float64)
+
+        # One sort by (group, day); each group is then a contiguous slice.
+        order = np.lexsort((days, codes))
+        codes, days, values = codes[order], days[order], values[order]
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        detected: dict[str, tuple[str, Detection]] = {}
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(codes)]):
+            if end - start < MIN_OCCURRENCES:
+                continue
+            detection = detect_series(days[start:end], values[start:end])
+            if detection is None:
+                continue
+            # Display the spelling of the latest charge.
+            latest = order[end - 1]
+            detected[str(names[codes[start]])] = (vendors[latest], detection)
+        return detected
+
+    def list_active(self, db: Session, owner_email: str, today: date | None = None) -> list[RecurringPayment]:
+        """Recurring payments not overdue by more than one cycle, most expensive first."""
+        today = today or date.today()
+        payments = db.scalars(
+            select(RecurringPayment).where(RecurringPayment.owner_email == owner_email)
+        ).all()
+        active = [
+            payment
+            for payment in payments
+            if payment.next_expected_date + timedelta(days=payment.interval_days) >= today
+        ]
+        return sorted(active, key=lambda payment: self.monthly_amount(payment), reverse=True)
+
+    @staticmethod
+    def monthly_amount(payment: RecurringPayment) -> float:
+        return payment.amount * 30.44 / max(payment.interval_days, 1.0)
+
+    def overview(self, db: Session, owner_email: str, today: date | None = None) -> dict[str, Any]:
+        """JSON-ready active recurring payments plus their combined monthly cost (base currency)."""
+        payments = self.list_active(db, owner_email, today=today)
+        return {
+            "payments": [
+                {
+                    "vendor": payment.vendor,
+                    "cadence": payment.cadence,
+                    "amount": payment.amount,
+                    "monthly_amount": round(self.monthly_amount(payment), 2),
+                    "occurrences": payment.occurrences,
+                    "last_date": payment.last_date.isoformat(),
+                    "next_expected_date": payment.next_expected_date.isoformat(),
+                    "confidence": payment.confidence,
+                }
+                for payment in payments
+            ],
+            "monthly_total": round(sum(self.monthly_amount(payment) for payment in payments), 2),
+        }
+
+    def _store(self, db: Session, owner_email: str, rows: Sequence[Any]) -> int:
+        detected = self.detect(rows)
+        db.add_all(
+            RecurringPayment(owner_email=owner_email, vendor_key=key, vendor=vendor, **vars(detection))
+            for key, (vendor, detection) in detected.items()
+        )
+        db.flush()
+        return len(detected)
+
+
+recurring_service = RecurringPaymentService()
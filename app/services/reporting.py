@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from datetime import date
+from typing import Any
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.parsing import normalize_currency_code
+from app.models.expense import Expense
+from app.services.finance import RateMatrix, fx_service
+
+
+class ReportingService:
+    """
+    Re-expresses expense aggregates in any display currency.
+
+    The ledger keeps `base_currency_amount` frozen at ingestion time. For other
+    display currencies we aggregate original amounts per (key, currency, day) in
+    SQL and convert the grouped facts through a cached FX rate matrix.
+
+    Building a matrix may call the FX provider. Async routes fetch it with
+    `prefetch_rates` in a worker thread and pass it down, so the lookup never
+    runs inside `AsyncSession.run_sync` on the event loop.
+    """
+
+    def __init__(self) -> None:
+        self.base_currency = settings.BASE_CURRENCY
+
+    def resolve_display_currency(self, raw_currency: str | None) -> str:
+        """The requested currency if it is one of DISPLAY_CURRENCIES, else the base currency."""
+        code = normalize_currency_code(raw_currency, self.base_currency)
+        if code == self.base_currency or code in settings.DISPLAY_CURRENCIES:
+            return code
+        return self.base_currency
+
+    def is_base(self, display_currency: str) -> bool:
+        return display_currency.upper() == self.base_currency
+
+    def rate_window(self, db: Session, filters: Sequence[Any]) -> tuple[list[str], date, date] | None:
+        """(currencies, first day, last day) of the expenses matching `filters`, or None if there are none."""
+        rows = (
+            db.query(Expense.currency, func.min(Expense.date), func.max(Expense.date))
+            .filter(*filters)
+            .group_by(Expense.currency)
+            .all()
+        )
+        if not rows:
+            return None
+        days = [d if isinstance(d, date) else date.fromisoformat(str(d)[:10]) for row in rows for d in row[1:]]
+        return [row[0] for row in rows], min(days), max(days)
+
+    async def prefetch_rates(
+        self, db: AsyncSession, filters: Sequence[Any], display_currency: str
+    ) -> RateMatrix | None:
+        """The rate matrix converting the expenses matching `filters`, built in a worker thread."""
+        if self.is_base(display_currency):
+            return None
+        window = await db.run_sync(self.rate_window, filters)
+        if window is None:
+            return None
+        currencies, start_date, end_date = window
+        return await run_in_threadpool(
+            fx_service.build_rate_matrix,
+            target_currency=display_currency,
+            currencies=currencies,
+            start_date=start_date,
+            end_date=end_date,
+        )
+
+    def sum_by(
+        self,
+        db: Session,
+        filters: Sequence[Any],
+        display_currency: str,
+        key_column: Any = None,
+        rates: RateMatrix | None = None,
+    ) -> dict[Any, float]:
+        """
+        Sum expenses per `key_column` (or per day when omitted) in `display_currency`.
+        Issues one grouped query regardless of row count.
+        """
+        return self.convert_grouped(self.grouped_facts(db, filters, key_column), display_currency, rates)
+
+    @staticmethod
+    def grouped_facts(db: Session, filters: Sequence[Any], key_column: Any = None) -> list[Any]:
+        """(key, currency, day, amount) facts for `convert_grouped`, per `key_column` or per day."""
+        key = key_column if key_column is not None else Expense.date
+        return (
+            db.query(key, Expense.currency, Expense.date, func.sum(Expense.amount))
+            .filter(*filters)
+            .group_by(key, Expense.currency, Expense.date)
+            .all()
+        )
+
+    def convert_grouped(
+        self,
+        rows: Iterable[Sequence[Any]],
+        display_currency: str,
+        rates: RateMatrix | None = None,
+    ) -> dict[Any, float]:
+        """
+        Convert (key, currency, day, amount) facts and roll them up per key,
+        through `rates` when it covers them.
+        """
+        facts = list(rows)
+        if not facts:
+            return {}
+        keys, currencies, raw_days, amounts = zip(*facts)
+        # Textual SQL on SQLite hands dates back as ISO strings.
+        days = [d if isinstance(d, date) else date.fromisoformat(str(d)[:10]) for d in raw_days]
+        matrix = rates
+        if matrix is None or not matrix.covers(display_currency, currencies, min(days), max(days)):
+            matrix = fx_service.build_rate_matrix(
+                target_currency=display_currency,
+                currencies=currencies,
+                start_date=min(days),
+                end_date=max(days),
+            )
+        converted = matrix.convert(
+            currencies=[(code or self.base_currency).upper() for code in currencies],
+            days=days,
+            amounts=[float(value or 0.0) for value in amounts],
+        )
+        key_index: dict[Any, int] = {}
+        codes = np.array([key_index.setdefault(k, len(key_index)) for k in keys], dtype=np.int64)
+        totals = np.bincount(codes, weights=converted, minlength=len(key_index))
+        return {k: float(totals[idx]) for k, idx in key_index.items()}
+
+
+reporting_service = ReportingService()
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.cache import data_versions
+from app.db.functions import month_start
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+
+DEFAULT_CATEGORY = "Uncategorized"
+_ROLLUP_KEY = ("owner_email", "month", "category", "vendor")
+
+
+class RollupService:
+    """
+    Keeps `expense_rollups` in step with the ledger.
+
+    Write paths call `record` with the affected expenses inside their own
+    transaction, so rollups commit (or roll back) together with the rows.
+    """
+
+    def record(self, db: Session, expenses: Iterable[Expense], sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) the given expenses from their rollup buckets."""
+        deltas: dict[tuple, list[float]] = {}
+        for expense in expenses:
+            key = (
+                expense.owner_email,
+                expense.date.replace(day=1),
+                expense.category or DEFAULT_CATEGORY,
+                expense.vendor,
+            )
+            bucket = deltas.setdefault(key, [0.0, 0])
+            bucket[0] += sign * float(expense.base_currency_amount or 0.0)
+            bucket[1] += sign
+        if not deltas:
+            return
+
+        values = [
+            {**dict(zip(_ROLLUP_KEY, key)), "total_amount": total, "tx_count": count}
+            for key, (total, count) in deltas.items()
+        ]
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            insert_fn = pg_insert if dialect == "postgresql" else sqlite_insert
+            stmt = insert_fn(ExpenseRollup).values(values)
+            db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=list(_ROLLUP_KEY),
+                    set_={
+                        "total_amount": ExpenseRollup.total_amount + stmt.excluded.total_amount,
+                        "tx_count": ExpenseRollup.tx_count + stmt.excluded.tx_count,
+                    },
+                )
+            )
+        else:
+            for value in values:
+                row = db.query(ExpenseRollup).filter_by(**{k: value[k] for k in _ROLLUP_KEY}).first()
+                if row is None:
+                    db.add(ExpenseRollup(**value))
+                else:
+                    row.total_amount += value["total_amount"]
+                    row.tx_count += value["tx_count"]
+            db.flush()
+
+        if sign < 0:
+            owners = {key[0] for key in deltas}
+            db.execute(
+                delete(ExpenseRollup).where(
+                    ExpenseRollup.owner_email.in_(owners),
+                    ExpenseRollup.tx_count <= 0,
+                )
+            )
+
+    def rebuild(self, db: Session, owner_email: str | None = None) -> int:
+        """Recompute rollups from `expenses` (all owners, or one). Returns bucket count."""
+        clear = delete(ExpenseRollup)
+        source = select(
+            Expense.owner_email,
+            month_start(Expense.date).label("month"),
+            func.coalesce(Expense.category, DEFAULT_CATEGORY).label("category"),
+            Expense.vendor,
+            func.sum(Expense.base_currency_amount).label("total_amount"),
+            func.count().label("tx_count"),
+        )
+        if owner_email:
+            clear = clear.where(ExpenseRollup.owner_email == owner_email)
+            source = source.where(Expense.owner_email == owner_email)
+        source = source.group_by(
+            Expense.owner_email,
+            month_start(Expense.date),
+            func.coalesce(Expense.category, DEFAULT_CATEGORY),
+            Expense.vendor,
+        )
+        owners = (
+            [owner_email]
+            if owner_email
+            else db.scalars(select(ExpenseRollup.owner_email).union(select(Expense.owner_email))).all()
+        )
+        db.execute(clear)
+        result = db.execute(
+            insert(ExpenseRollup).from_select(
+                ["owner_email", "month", "category", "vendor", "total_amount", "tx_count"],
+                source,
+            )
+        )
+        data_versions.bump(db, *owners)
+        db.commit()
+        return int(result.rowcount or 0)
+
+    @staticmethod
+    def month_bounds(
+        start: date | None,
+        end: date | None,
+        month_mode: bool,
+    ) -> tuple[date | None, date | None] | None:
+        """
+        Returns [first_month, end_exclusive) when a filter lines up with whole
+        months (so rollups can answer it), otherwise None.
+        """
+        if start and start.day != 1:
+            return None
+        if end is None or month_mode:
+            return start, end
+        end_exclusive = end + timedelta(days=1)
+        if end_exclusive.day != 1:
+            return None
+        return start, end_exclusive
+
+
+rollup_service = RollupService()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.saved_query import SavedQuery
+from app.services.finance import RateMatrix
+from app.services.query_service import PreparedQuery, QueryResult, query_service
+
+logger = logging.getLogger(__name__)
+
+# pg_export_snapshot() ids look like "00000003-0000001B-1"; checked before being
+# inlined, since SET TRANSACTION SNAPSHOT takes no bind parameters.
+_SNAPSHOT_ID = re.compile(r"^[0-9A-Fa-f]+(-[0-9A-Fa-f]+)+$")
+
+
+class SavedQueryService:
+    """
+    Saved insights are stored as intent + filter params and re-planned on the
+    server; pinned ones run as one batch against a single snapshot.
+
+    On Postgres the request session exports a REPEATABLE READ snapshot and every
+    query runs on its own pooled connection that imports it, so the charts are
+    mutually consistent while executing concurrently. Other dialects run the
+    batch sequentially inside the request session's transaction.
+
+    A query that cannot be planned or run (stopped by the query guard, or a
+    generated query that no longer works) comes back as a ValueError with a
+    message safe to show, so one broken chart doesn't fail the whole batch.
+    """
+
+    PARAM_KEYS = ("month", "start_date", "end_date", "currency")
+
+    def clean_params(self, **raw: str | None) -> dict[str, str]:
+        return {key: (raw.get(key) or "").strip() for key in self.PARAM_KEYS if (raw.get(key) or "").strip()}
+
+    def prepare(self, saved: SavedQuery) -> PreparedQuery:
+        params = saved.params or {}
+        return query_service.prepare(
+            owner_email=saved.owner_email,
+            question=saved.question,
+            # Rows saved before intents were stored are re-planned from their question.
+            intent=saved.intent,
+            **{key: params.get(key) for key in self.PARAM_KEYS},
+        )
+
+    async def run_pinned(
+        self, db: AsyncSession, owner_email: str
+    ) -> list[tuple[SavedQuery, QueryResult | ValueError]]:
+        snapshot_id = None
+        if db.bind.dialect.name == "postgresql":
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            snapshot_id = (await db.execute(text("SELECT pg_export_snapshot()"))).scalar_one()
+
+        pinned = (
+            await db.scalars(
+                select(SavedQuery)
+                .where(SavedQuery.owner_email == owner_email, SavedQuery.is_pinned.is_(True))
+                .order_by(SavedQuery.id.desc())
+            )
+        ).all()
+        # Detached, so a failed query rolling back the session doesn't expire them.
+        for saved in pinned:
+            db.expunge(saved)
+        # Plans for LLM-generated queries may need a model call on a cold cache.
+        planned: list[PreparedQuery | ValueError] = []
+        for saved in pinned:
+            try:
+                planned.append(await run_in_threadpool(self.prepare, saved))
+            except ValueError as exc:
+                planned.append(exc)
+        prepared = [item for item in planned if isinstance(item, PreparedQuery)]
+        # FX lookups for converted charts run in a worker thread, not under run_sync.
+        rates = [await query_service.prefetch_rates(db, item) for item in prepared]
+
+        if snapshot_id and len(prepared) > 1:
+            executed = await self._run_on_snapshot(db, snapshot_id, prepared, rates)
+        else:
+            executed = [
+                await db.run_sync(_execute_guarded, item, item_rates) for item, item_rates in zip(prepared, rates)
+            ]
+        results = iter(executed)
+        return [
+            (saved, next(results) if isinstance(item, PreparedQuery) else item)
+            for saved, item in zip(pinned, planned)
+        ]
+
+    @staticmethod
+    async def _run_on_snapshot(
+        db: AsyncSession,
+        snapshot_id: str,
+        prepared: list[PreparedQuery],
+        rates: list[RateMatrix | None],
+    ) -> list[QueryResult | ValueError]:
+        if not _SNAPSHOT_ID.match(snapshot_id):
+            raise ValueError(f"Unexpected snapshot id: {snapshot_id!r}")
+        session_factory = async_sessionmaker(bind=db.bind, autoflush=False, expire_on_commit=False)
+        semaphore = asyncio.Semaphore(max(1, settings.SAVED_QUERY_BATCH_CONCURRENCY))
+
+        async def run_one(item: PreparedQuery, item_rates: RateMatrix | None) -> QueryResult | ValueError:
+            async with semaphore, session_factory() as worker:
+                await worker.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                await worker.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+                return await worker.run_sync(_execute_guarded, item, item_rates)
+
+        # The request session keeps the exporting transaction open until every
+        # worker has imported the snapshot.
+        return list(await asyncio.gather(*(run_one(item, item_rates) for item, item_rates in zip(prepared, rates))))
+
+
+def _execute_guarded(
+    db: Session, prepared: PreparedQuery, rates: RateMatrix | None = None
+) -> QueryResult | ValueError:
+    try:
+        return query_service.execute(db, prepared, rates)
+    except ValueError as exc:
+        # Includes QueryGuardError; the messages are written for users.
+        return exc
+    except SQLAlchemyError:
+        db.rollback()
+        logger.warning("Pinned query failed: %s", prepared.summary, exc_info=True)
+        return ValueError("This query could not be run. Try saving it again.")
+
+
+saved_query_service = SavedQueryService()
@@ -5,6 +5,8 @@ import os
 import pandas as pd
 from openai import OpenAI
 from app.core.config import settings
+from app.core.instrumentation import llm_failures, llm_seconds
+from app.core.metrics import timed
 from app.core.parsing import normalize_date_string
 
 class StatementService:
@@ -107,12 +109,13 @@ class StatementService:
         """
 
         try:
-            col_response = self.client.chat.completions.create(
-                model=self.model,
-                response_format={ "type": "json_object" },
-                messages=[{"role": "user", "content": col_prompt}],
-                temperature=0.0
-            )
+            with timed(llm_seconds, llm_failures, operation="statement_columns"):
+                col_response = self.client.chat.completions.create(
+                    model=self.model,
+                    response_format={ "type": "json_object" },
+                    messages=[{"role": "user", "content": col_prompt}],
+                    temperature=0.0
+                )
             mapping = self._clean_json_response(col_response.choices[0].message.content)
             
             date_col = mapping.get('date_column')
@@ -156,12 +159,13 @@ class StatementService:
         """
 
         try:
-            vendor_response = self.client.chat.completions.create(
-                model=self.model,
-                response_format={ "type": "json_object" },
-                messages=[{"role": "user", "content": vendor_prompt}],
-                temperature=0.0
-            )
+            with timed(llm_seconds, llm_failures, operation="statement_vendors"):
+                vendor_response = self.client.chat.completions.create(
+                    model=self.model,
+                    response_format={ "type": "json_object" },
+                    messages=[{"role": "user", "content": vendor_prompt}],
+                    temperature=0.0
+                )
             vendor_map = self._clean_json_response(vendor_response.choices[0].message.content)
         except Exception as e:
             print(f"Vendor mapping failed, falling back to raw data: {e}")
@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from openai import OpenAI
+
+from app.core.config import settings
+from app.core.instrumentation import llm_failures, llm_seconds
+from app.core.metrics import timed
+from app.db.base import Base
+
+ALLOWED_TABLES = frozenset({"expenses", "expense_items"})
+# Every table the app defines; no CTE or window may take one of these names.
+DATABASE_TABLES = frozenset(Base.metadata.tables)
+# Set-returning functions that may appear as FROM items.
+ALLOWED_TABLE_FUNCTIONS = frozenset({"generate_series", "unnest"})
+CHART_TYPES = frozenset({"bar", "line", "pie"})
+
+FORBIDDEN_KEYWORDS = frozenset(
+    {
+        "alter", "analyze", "attach", "call", "cluster", "copy", "create", "deallocate", "delete",
+        "detach", "do", "drop", "execute", "explain", "grant", "insert", "into", "listen", "load",
+        "lock", "merge", "notify", "pragma", "prepare", "recursive", "reindex", "reset", "revoke",
+        "set", "share", "table", "truncate", "unlisten", "update", "vacuum",
+    }
+)
+FORBIDDEN_FUNCTIONS = frozenset(
+    {
+        "current_setting", "set_config", "dblink", "dblink_exec", "query_to_xml", "table_to_xml",
+        "cursor_to_xml", "load_extension", "readfile", "writefile", "nextval", "setval", "currval",
+        "lastval", "txid_current",
+    }
+)
+FORBIDDEN_PREFIXES = ("pg_", "lo_", "sqlite_", "information_schema")
+# Functions whose argument syntax uses FROM without it introducing a table.
+_FROM_ARGUMENT_FUNCTIONS = frozenset({"extract", "substring", "trim", "overlay", "position"})
+# Words that end a FROM item, i.e. cannot be a table alias.
+_CLAUSE_WORDS = frozenset(
+    {
+        "where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using", "group",
+        "order", "having", "window", "limit", "offset", "fetch", "union", "except", "intersect",
+        "lateral", "select", "from",
+    }
+)
+
+_TOKEN = re.compile(
+    r"""
+    (?P<string>'(?:[^']|'')*')
+    |(?P<comment>--|/\*)
+    |(?P<cast>::)
+    |(?P<param>:[A-Za-z_]\w*)
+    |(?P<word>[A-Za-z_]\w*)
+    |(?P<number>\d+(?:\.\d+)?)
+    |(?P<space>\s+)
+    |(?P<op>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_ALLOWED_OPERATORS = set("(),.*+-/%<>=!|")
+
+_QUOTED = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+_ISO_DATE = re.compile(r"\b\d{4}-\d{2}(?:-\d{2})?\b")
+_NUMBER = re.compile(r"(?<![\w:])\d+(?:\.\d+)?\b")
+
+
+class SqlValidationError(ValueError):
+    """Generated SQL that is not a single read-only SELECT over the allowed tables."""
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str
+    value: str
+
+    @property
+    def word(self) -> str:
+        return self.value.lower() if self.kind == "word" else ""
+
+
+@dataclass(frozen=True)
+class SqlPlan:
+    """Validated SQL for one question template (owner scoping is added at execution time)."""
+
+    sql: str
+    chart_type: str
+    summary: str
+
+
+def question_template(question: str) -> tuple[str, dict[str, object]]:
+    """
+    Normalize a question and lift its literals into bind parameters.
+
+    "Top 5 vendors in 2026-03" and "top 10 vendors in 2026-04" share the
+    template "top :n1 vendors in :d1", so both reuse one generated query.
+    """
+    params: dict[str, object] = {}
+
+    def lift(prefix: str, value: object) -> str:
+        name = f"{prefix}{sum(1 for key in params if key.startswith(prefix)) + 1}"
+        params[name] = value
+        return f":{name}"
+
+    text = _QUOTED.sub(lambda m: lift("s", m.group(1) if m.group(1) is not None else m.group(2)), question)
+    text = _ISO_DATE.sub(lambda m: lift("d", m.group(0)), text)
+    text = _NUMBER.sub(lambda m: lift("n", float(m.group(0)) if "." in m.group(0) else int(m.group(0))), text)
+    text = " ".join(text.lower().split()).rstrip("?!. ")
+    return text, params
+
+
+def _tokenize(sql: str) -> list[Token]:
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        if kind == "comment":
+            raise SqlValidationError("Comments are not allowed.")
+        if kind == "op" and match.group() not in _ALLOWED_OPERATORS:
+            raise SqlValidationError(f"Unexpected character {match.group()!r}.")
+        tokens.append(Token(kind, match.group()))
+    return tokens
+
+
+def _skip_parens(tokens: list[Token], index: int) -> int:
+    """Index just past the parenthesis group opening at `index`."""
+    depth = 0
+    for position in range(index, len(tokens)):
+        if tokens[position].value == "(":
+            depth += 1
+        elif tokens[position].value == ")":
+            depth -= 1
+            if depth == 0:
+                return position + 1
+    raise SqlValidationError("Unbalanced parentheses.")
+
+
+def _defined_names(tokens: list[Token], index: int) -> list[str]:
+    """Names in a `name [(columns)] AS [[NOT] MATERIALIZED] (...), ...` list starting at `index`."""
+    names = []
+    while index < len(tokens) and tokens[index].kind == "word":
+        name = tokens[index].word
+        index += 1
+        if index < len(tokens) and tokens[index].value == "(":
+            index = _skip_parens(tokens, index)
+        if index >= len(tokens) or tokens[index].word != "as":
+            break
+        index += 1
+        while index < len(tokens) and tokens[index].word in {"not", "materialized"}:
+            index += 1
+        if index >= len(tokens) or tokens[index].value != "(":
+            break
+        index = _skip_parens(tokens, index)
+        names.append(name)
+        if index >= len(tokens) or tokens[index].value != ",":
+            break
+        index += 1
+    return names
+
+
+def _check_from_items(tokens: list[Token], index: int, relations: set[str]) -> None:
+    while index < len(tokens):
+        token = tokens[index]
+        if token.word == "lateral":
+            index += 1
+            continue
+        if token.value == "(":
+            return  # derived table; its own FROM clauses are checked separately
+        if token.kind != "word":
+            raise SqlValidationError("Expected a table name.")
+        following = tokens[index + 1].value if index + 1 < len(tokens) else ""
+        if following == ".":
+            raise SqlValidationError("Schema-qualified tables are not allowed.")
+        if following == "(":
+            if token.word not in ALLOWED_TABLE_FUNCTIONS:
+                raise SqlValidationError(f"Function {token.value} is not allowed in FROM.")
+            index = _skip_parens(tokens, index + 1)
+        elif token.word not in relations:
+            raise SqlValidationError(f"Table {token.value} is not allowed.")
+        else:
+            index += 1
+        if index < len(tokens) and tokens[index].word == "as":
+            index += 1
+        if index < len(tokens) and tokens[index].kind == "word" and tokens[index].word not in _CLAUSE_WORDS:
+            index += 1
+            if index < len(tokens) and tokens[index].value == "(":
+                index = _skip_parens(tokens, index)
+        if index < len(tokens) and tokens[index].value == ",":
+            index += 1
+            continue
+        return
+
+
+def validate_sql(sql: str, allowed_params: set[str]) -> str:
+    """Return `sql` (whitespace-normalized) if it is a single read-only SELECT, else raise."""
+    cleaned = " ".join((sql or "").split()).rstrip(";").strip()
+    if not cleaned:
+        raise SqlValidationError("Empty query.")
+    tokens = _tokenize(cleaned)
+    if tokens[0].word not in {"select", "with"}:
+        raise SqlValidationError("Only SELECT statements are allowed.")
+
+    # Only names a WITH list defines become relations; WINDOW lists share the
+    # `name AS (` shape but define no relation.
+    relations = set(ALLOWED_TABLES)
+    for position, token in enumerate(tokens):
+        if token.word in {"with", "window"}:
+            names = _defined_names(tokens, position + 1)
+            for name in names:
+                if name in DATABASE_TABLES:
+                    raise SqlValidationError(f"{name} cannot be redefined.")
+            if token.word == "with":
+                relations.update(names)
+
+    openers: list[str] = []
+    for position, token in enumerate(tokens):
+        word = token.word
+        following = tokens[position + 1].value if position + 1 < len(tokens) else ""
+        if token.value == "(":
+            previous = tokens[position - 1].word if position else ""
+            openers.append(previous)
+        elif token.value == ")":
+            if not openers:
+                raise SqlValidationError("Unbalanced parentheses.")
+            openers.pop()
+        elif token.kind == "param" and token.value[1:] not in allowed_params:
+            raise SqlValidationError(f"Unknown parameter {token.value}.")
+        elif word:
+            if word in FORBIDDEN_KEYWORDS:
+                raise SqlValidationError(f"{token.value.upper()} is not allowed.")
+            if word.startswith(FORBIDDEN_PREFIXES) or (following == "(" and word in FORBIDDEN_FUNCTIONS):
+                raise SqlValidationError(f"{token.value} is not allowed.")
+            if word in {"from", "join"}:
+                in_function_arguments = bool(openers) and openers[-1] in _FROM_ARGUMENT_FUNCTIONS
+                is_distinct_from = position > 0 and tokens[position - 1].word == "distinct"
+                if not in_function_arguments and not is_distinct_from:
+                    _check_from_items(tokens, position + 1, relations)
+    if openers:
+        raise SqlValidationError("Unbalanced parentheses.")
+    return cleaned
+
+
+def scoped_sql(sql: str, date_filters: str, table_prefix: str = "") -> str:
+    """
+    Run validated SQL against owner-scoped CTEs that shadow the real tables.
+
+    The generated SQL can only name `expenses`/`expense_items` unqualified,
+    so it only ever sees the owner's rows within the selected date range.
+    """
+    scope = (
+        f"expenses AS (SELECT * FROM {table_prefix}expenses WHERE owner_email = :owner_email{date_filters}), "
+        f"expense_items AS (SELECT * FROM {table_prefix}expense_items "
+        "WHERE expense_id IN (SELECT id FROM expenses))"
+    )
+    if sql[:4].lower() == "with":
+        return f"WITH {scope}, {sql[4:].lstrip()}"
+    return f"WITH {scope} {sql}"
+
+
+class TextToSqlService:
+    """
+    Generates SQL for free-form insight questions with the LLM.
+
+    Only validated plans are cached, per normalized question template, so a
+    repeated (or re-parameterized) question skips the model entirely.
+    """
+
+    SCHEMA_PROMPT = """
+    You translate questions about one person's expenses into a single PostgreSQL SELECT statement.
+
+    Tables (already limited to the current user and the selected date range; never filter by owner):
+      expenses(id INTEGER, date DATE, vendor TEXT, category TEXT, amount REAL, currency TEXT,
+               base_currency_amount REAL, description TEXT, source_type TEXT)
+        -- amount is in the original currency; base_currency_amount is the amount in {base_currency}.
+      expense_items(id INTEGER, expense_id INTEGER REFERENCES expenses(id), name TEXT,
+                    quantity REAL, price REAL)
+        -- receipt line items; join to expenses for date, vendor or category.
+
+    Rules:
+    - Return exactly two columns named label and value. Sum money with base_currency_amount.
+    - Use only the tables above. One SELECT (WITH is allowed), no comments, no semicolons.
+    - Tokens such as :n1, :d1 or :s1 in the question are bind parameters; use them verbatim.
+    - Match item names case-insensitively: lower(expense_items.name) LIKE '%tomato%'.
+    - Express relative dates ("last month", "this year") with CURRENT_DATE, never a fixed date.
+    - Return at most {max_rows} rows.
+
+    Respond with JSON only: {{"sql": "...", "chart_type": "bar" | "line" | "pie", "summary": "<one short sentence>"}}
+    """
+
+    def __init__(self) -> None:
+        self.ai_mode = os.getenv("AI_MODE", "cloud").lower()
+        if self.ai_mode == "local":
+            self.client = OpenAI(base_url="http://ollama:11434/v1", api_key="ollama")
+            self.model = "llama3.2"
+        else:
+            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.model = "gpt-4o-mini"
+        self.max_entries = settings.SQL_PLAN_CACHE_MAX_ENTRIES
+        self._plans: OrderedDict[str, SqlPlan] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.TEXT_TO_SQL_ENABLED
+
+    def plan_for(self, template: str, params: dict[str, object]) -> tuple[SqlPlan, bool]:
+        """Validated plan for a question template, and whether it came from the cache."""
+        with self._lock:
+            plan = self._plans.get(template)
+            if plan is not None:
+                self._plans.move_to_end(template)
+                return plan, True
+        plan = self._generate(template, set(params))
+        with self._lock:
+            self._plans[template] = plan
+            self._plans.move_to_end(template)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan, False
+
+    def forget(self, template: str) -> None:
+        """Drop a cached plan, e.g. after it failed to execute."""
+        with self._lock:
+            self._plans.pop(template, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+
+    def _generate(self, template: str, allowed_params: set[str]) -> SqlPlan:
+        with timed(llm_seconds, llm_failures, operation="text_to_sql"):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                response_format={"type": "json_object"},
+                messages=[
+                    {
+                        "role": "system",
+                        "content": self.SCHEMA_PROMPT.format(
+                            base_currency=settings.BASE_CURRENCY, max_rows=settings.TEXT_TO_SQL_MAX_ROWS
+                        ),
+                    },
+                    {"role": "user", "content": template},
+                ],
+                temperature=0.0,
+            )
+        raw = (response.choices[0].message.content or "").strip()
+        if raw.startswith("```"):
+            raw = raw.replace("```json", "").replace("```", "").strip()
+        try:
+            payload = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise SqlValidationError("The model did not return a query.") from exc
+        chart_type = str(payload.get("chart_type") or "bar").lower()
+        return SqlPlan(
+            sql=validate_sql(str(payload.get("sql") or ""), allowed_params),
+            chart_type=chart_type if chart_type in CHART_TYPES else "bar",
+            summary=str(payload.get("summary") or "").strip(),
+        )
+
+
+text_to_sql_service = TextToSqlService()
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from app.db.functions import date_bucket
+
+# Number of trailing buckets returned per granularity.
+TREND_BUCKETS = {"day": 31, "week": 26, "month": 12}
+DEFAULT_GRANULARITY = "month"
+
+
+class TrendService:
+    """
+    Spending trend series bucketed by day, week or month.
+
+    Aggregation happens in SQL, so the payload is proportional to the number
+    of buckets rather than the number of expenses. Empty buckets inside the
+    window are reported as zero.
+    """
+
+    def resolve_granularity(self, raw: str | None) -> str:
+        granularity = (raw or "").strip().lower()
+        return granularity if granularity in TREND_BUCKETS else DEFAULT_GRANULARITY
+
+    def series(
+        self,
+        db: Session,
+        date_column: Any,
+        amount_column: Any,
+        conditions: Sequence[Any],
+        granularity: str,
+    ) -> list[tuple[str, float]]:
+        """Trailing trend buckets (label, total) ending at the latest bucket with data."""
+        bucket = date_bucket(date_column, granularity)
+        totals = (
+            select(bucket.label("bucket"), func.sum(amount_column).label("amount"))
+            .where(*conditions)
+            .group_by(bucket)
+        )
+        if db.get_bind().dialect.name != "postgresql":
+            rows = db.execute(totals.order_by(bucket)).all()
+            return self.fill(((row.bucket, row.amount) for row in rows), granularity)
+
+        totals = totals.cte("totals")
+        bounds = select(
+            func.min(totals.c.bucket).label("first_bucket"),
+            func.max(totals.c.bucket).label("last_bucket"),
+        ).cte("bounds")
+        window = TREND_BUCKETS[granularity] - 1
+        calendar = (
+            select(
+                cast(
+                    func.generate_series(
+                        func.greatest(
+                            bounds.c.first_bucket,
+                            bounds.c.last_bucket - literal_column(f"interval '{window} {granularity}'"),
+                        ),
+                        bounds.c.last_bucket,
+                        literal_column(f"interval '1 {granularity}'"),
+                    ),
+                    Date,
+                ).label("bucket")
+            )
+            .select_from(bounds)
+            .cte("calendar")
+        )
+        rows = db.execute(
+            select(calendar.c.bucket, func.coalesce(totals.c.amount, 0.0).label("amount"))
+            .select_from(calendar.outerjoin(totals, totals.c.bucket == calendar.c.bucket))
+            .order_by(calendar.c.bucket)
+        ).all()
+        return [(self.label(row.bucket, granularity), float(row.amount or 0.0)) for row in rows]
+
+    def bucket_totals(self, daily_totals: Mapping[date, float], granularity: str) -> list[tuple[str, float]]:
+        """Buckets already-aggregated per-day totals (e.g. after currency conversion)."""
+        buckets: dict[date, float] = {}
+        for tx_date, amount in daily_totals.items():
+            key = self.bucket_start(tx_date, granularity)
+            buckets[key] = buckets.get(key, 0.0) + amount
+        return self.fill(sorted(buckets.items()), granularity)
+
+    def fill(self, rows: Iterable[tuple[Any, Any]], granularity: str) -> list[tuple[str, float]]:
+        """Python equivalent of the generate_series gap fill for other dialects."""
+        totals: dict[date, float] = {}
+        for bucket, amount in rows:
+            if isinstance(bucket, str):
+                bucket = date.fromisoformat(bucket)
+            totals[bucket] = float(amount or 0.0)
+        if not totals:
+            return []
+        first, current = min(totals), max(totals)
+        series: list[tuple[str, float]] = []
+        while current >= first and len(series) < TREND_BUCKETS[granularity]:
+            series.append((self.label(current, granularity), totals.get(current, 0.0)))
+            current = self._previous_bucket(current, granularity)
+        series.reverse()
+        return series
+
+    @staticmethod
+    def bucket_start(value: date, granularity: str) -> date:
+        if granularity == "month":
+            return value.replace(day=1)
+        if granularity == "week":
+            return value - timedelta(days=value.weekday())
+        return value
+
+    @staticmethod
+    def label(bucket: date | str, granularity: str) -> str:
+        if isinstance(bucket, str):
+            bucket = date.fromisoformat(bucket[:10])
+        if granularity == "month":
+            return bucket.strftime("%Y-%m")
+        return bucket.isoformat()
+
+    @staticmethod
+    def _previous_bucket(bucket: date, granularity: str) -> date:
+        if granularity == "month":
+            return (bucket - timedelta(days=1)).replace(day=1)
+        if granularity == "week":
+            return bucket - timedelta(days=7)
+        return bucket - timedelta(days=1)
+
+
+trend_service = TrendService()
@@ -3,5 +3,7 @@ set -eu
 
 # Ensure database schema is up-to-date before serving traffic.
 alembic upgrade head
+# Keep yearly expense partitions created ahead of time (no-op when unpartitioned).
+python -m app.cli ensure-partitions
 
 exec uvicorn app.main:app --host 0.0.0.0 --port 8000
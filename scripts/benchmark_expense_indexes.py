@@ -0,0 +1,154 @@
+"""
+Before/after query plans for the composite `expenses` indexes.
+
+Builds a scratch copy of the `expenses` table in its own schema, fills it
+with synthetic rows (1M by default), and prints EXPLAIN (ANALYZE, BUFFERS)
+for the hot query shapes with only the single-column indexes, then again
+after adding the composite/covering indexes from migration 7c3e91d0a5b2.
+
+Usage (inside the web container, or anywhere DATABASE_URL is reachable):
+    python scripts/benchmark_expense_indexes.py [--rows 1000000] [--url postgresql://...] [--keep]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+
+SCHEMA = "xta_index_bench"
+OWNER = "owner-7@example.com"
+
+SETUP_SQL = [
+    f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE",
+    f"CREATE SCHEMA {SCHEMA}",
+    f"""
+    CREATE TABLE {SCHEMA}.expenses (
+        id SERIAL PRIMARY KEY,
+        owner_email VARCHAR NOT NULL,
+        vendor VARCHAR NOT NULL,
+        amount DOUBLE PRECISION NOT NULL,
+        currency VARCHAR(3) NOT NULL,
+        base_currency_amount DOUBLE PRECISION NOT NULL,
+        base_currency VARCHAR(3) NOT NULL,
+        fx_rate DOUBLE PRECISION NOT NULL,
+        date DATE NOT NULL,
+        category VARCHAR,
+        description VARCHAR,
+        receipt_url VARCHAR,
+        source_type VARCHAR NOT NULL
+    )
+    """,
+    f"""
+    INSERT INTO {SCHEMA}.expenses (
+        owner_email, vendor, amount, currency, base_currency_amount, base_currency,
+        fx_rate, date, category, description, source_type
+    )
+    SELECT 'owner-' || (n % 50) || '@example.com',
+           'Vendor ' || (n % 400),
+           round((random() * 200)::numeric, 2)::float8,
+           (ARRAY['EUR', 'USD', 'GBP', 'INR'])[1 + n % 4],
+           round((random() * 200)::numeric, 2)::float8,
+           'EUR',
+           1.0,
+           DATE '2021-01-01' + (n % 1826),
+           (ARRAY['Groceries', 'Dining', 'Transport', 'Utilities', 'Rent', 'Travel', 'Health', 'Other'])[1 + n % 8],
+           '',
+           'statement'
+    FROM generate_series(1, :rows) AS n
+    """,
+    # Baseline: the single-column indexes the model had before the migration.
+    f"CREATE INDEX ON {SCHEMA}.expenses (owner_email)",
+    f"CREATE INDEX ON {SCHEMA}.expenses (vendor)",
+    f"CREATE INDEX ON {SCHEMA}.expenses (date)",
+]
+
+COMPOSITE_SQL = [
+    f"""
+    CREATE INDEX ix_bench_owner_date ON {SCHEMA}.expenses (owner_email, date)
+    INCLUDE (base_currency_amount, category)
+    """,
+    f"""
+    CREATE INDEX ix_bench_owner_dedup ON {SCHEMA}.expenses
+    (owner_email, date, amount, currency, vendor)
+    """,
+]
+
+QUERIES = {
+    "category totals for one month": f"""
+        SELECT category, SUM(base_currency_amount)
+        FROM {SCHEMA}.expenses
+        WHERE owner_email = '{OWNER}' AND date >= DATE '2025-06-01' AND date < DATE '2025-07-01'
+        GROUP BY category
+    """,
+    "trailing 12 month total": f"""
+        SELECT SUM(base_currency_amount), COUNT(*)
+        FROM {SCHEMA}.expenses
+        WHERE owner_email = '{OWNER}' AND date >= DATE '2025-01-01' AND date <= DATE '2025-12-31'
+    """,
+    "import duplicate check": f"""
+        SELECT id
+        FROM {SCHEMA}.expenses
+        WHERE owner_email = '{OWNER}' AND date = DATE '2025-06-14'
+          AND amount = 42.0 AND currency = 'EUR' AND vendor = 'Vendor 7'
+        LIMIT 1
+    """,
+}
+
+_EXECUTION_TIME = re.compile(r"Execution Time: ([0-9.]+) ms")
+
+
+def _explain(conn, sql: str) -> tuple[str, float]:
+    rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars().all()
+    plan = "\n".join(rows)
+    match = _EXECUTION_TIME.search(plan)
+    return plan, float(match.group(1)) if match else float("nan")
+
+
+def _run_queries(conn, phase: str) -> dict[str, float]:
+    timings = {}
+    for name, sql in QUERIES.items():
+        _explain(conn, sql)  # warm the cache so both phases are compared hot
+        plan, elapsed = _explain(conn, sql)
+        timings[name] = elapsed
+        print(f"\n=== [{phase}] {name} ===\n{plan}")
+    return timings
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--url", default=settings.DATABASE_URL)
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards.")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.url, isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        print(f"Loading {args.rows:,} synthetic rows into {SCHEMA}.expenses ...")
+        for statement in SETUP_SQL:
+            conn.execute(text(statement), {"rows": args.rows})
+        conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.expenses"))
+        before = _run_queries(conn, "before")
+
+        for statement in COMPOSITE_SQL:
+            conn.execute(text(statement))
+        conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.expenses"))
+        after = _run_queries(conn, "after")
+
+        print("\n=== Summary (execution time, ms) ===")
+        for name in QUERIES:
+            print(f"{name:<32} {before[name]:>10.2f} -> {after[name]:>10.2f}")
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
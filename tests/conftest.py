@@ -1,9 +1,81 @@
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
 
+import pytest
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+# Off by default; the metrics tests need the middleware that app.main only
+# installs when it is on at import time.
+os.environ.setdefault("METRICS_ENABLED", "true")
+
+
+@pytest.fixture(autouse=True)
+def _reset_result_cache():
+    # Tests seed fresh databases directly, bypassing the write paths that
+    # invalidate cached payloads; start every test from an empty cache.
+    from app.core.cache import query_cache, result_cache
+
+    result_cache.clear()
+    query_cache.clear()
+    yield
+    result_cache.clear()
+    query_cache.clear()
+
+
+@pytest.fixture
+def session_factory():
+    """
+    Session factory for a fresh in-memory database, also served to the app
+    through get_db and get_async_db (and to data_versions). The database is a named shared-cache one,
+    so async routes (aiosqlite) see rows committed by sync sessions.
+    """
+    from uuid import uuid4
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from app.core.cache import data_versions
+    from app.db.async_session import AsyncSessionLocal, get_async_db
+    from app.db.base import Base
+    from app.db.session import SessionLocal, get_db
+    from app.main import app
+
+    database = f"file:{uuid4().hex}?mode=memory&cache=shared&uri=true"
+    engine = create_engine(
+        f"sqlite:///{database}",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    TestingAsyncSessionLocal = async_sessionmaker(
+        bind=create_async_engine(f"sqlite+aiosqlite:///{database}", poolclass=StaticPool),
+        expire_on_commit=False,
+    )
+
+    def override_get_db():
+        db = TestingSessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    data_versions.bind(TestingSessionLocal, TestingAsyncSessionLocal)
+    yield TestingSessionLocal
+    app.dependency_overrides.clear()
+    data_versions.bind(SessionLocal, AsyncSessionLocal)
+    engine.dispose()
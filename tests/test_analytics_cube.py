@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+
+from app.core.cache import data_versions
+from app.core.config import settings
+from app.models.expense import Expense
+from app.routers.expenses import _compute_chart_data
+from app.services.analytics_cube import AnalyticsCubeService, analytics_cube
+from app.services.finance import fx_service
+from app.services.query_service import query_service
+from app.services.rollup_service import rollup_service
+
+OWNER = "alice@example.com"
+
+
+def _expense(n: int, owner: str = OWNER, **overrides) -> Expense:
+    fields = {
+        "owner_email": owner,
+        "vendor": f"Store {n % 4}",
+        "amount": float(n + 1),
+        "currency": "EUR",
+        "base_currency_amount": float(n + 1),
+        "base_currency": "EUR",
+        "fx_rate": 1.0,
+        "date": date(2026, 1, 1) + timedelta(days=(n * 5) % 70),
+        "category": ["Groceries", "Dining", None][n % 3],
+        "description": "",
+        "source_type": "manual",
+    }
+    fields.update(overrides)
+    return Expense(**fields)
+
+
+def _seed(db, count: int = 30) -> None:
+    db.add_all([_expense(n) for n in range(count)] + [_expense(n, owner="bob@example.com") for n in range(5)])
+    db.commit()
+    rollup_service.rebuild(db)
+
+
+def _as_dict(series: dict) -> dict:
+    return dict(zip(series["labels"], series["data"]))
+
+
+def test_cube_chart_data_matches_sql(session_factory, monkeypatch):
+    db = session_factory()
+    _seed(db)
+    cases = [
+        (None, None, False, "month"),
+        (date(2026, 1, 1), date(2026, 2, 1), True, "month"),
+        (date(2026, 1, 10), date(2026, 2, 20), False, "week"),
+        (date(2026, 2, 1), date(2026, 3, 1), True, "day"),
+    ]
+    expected = [_compute_chart_data(db, OWNER, *case[:3], "EUR", case[3]) for case in cases]
+
+    monkeypatch.setattr(settings, "ANALYTICS_CUBE_ENABLED", True)
+    analytics_cube.invalidate()
+    actual = [_compute_chart_data(db, OWNER, *case[:3], "EUR", case[3]) for case in cases]
+    empty = _compute_chart_data(db, OWNER, date(2030, 1, 1), date(2030, 2, 1), True, "EUR", "month")
+    analytics_cube.invalidate()
+    db.close()
+
+    for want, got in zip(expected, actual):
+        assert _as_dict(got["categories"]) == _as_dict(want["categories"])
+        assert _as_dict(got["vendors"]) == _as_dict(want["vendors"])
+        assert got["trend"] == want["trend"]
+    assert empty["categories"]["labels"] == ["No Data"]
+
+
+def test_cube_answers_intents_in_display_currency(session_factory, monkeypatch):
+    db = session_factory()
+    db.add_all(
+        [
+            _expense(0, currency="USD", amount=10.0, base_currency_amount=9.0, fx_rate=0.9, category="Travel"),
+            _expense(1, currency="EUR", amount=5.0, base_currency_amount=5.0, category="Travel"),
+            _expense(2, currency="EUR", amount=2.0, base_currency_amount=2.0, category="Dining"),
+        ]
+    )
+    db.commit()
+    # Flat 2x rate into GBP for every currency keeps the expectation readable.
+    monkeypatch.setattr(fx_service, "_fetch_timeseries", lambda base, quotes, start, end: {})
+    monkeypatch.setattr(fx_service, "_fetch_rate", lambda from_currency, to_currency, tx_date: 2.0)
+    fx_service._matrix_cache.clear()
+
+    questions = ["biggest category spend", "visits by vendor", "monthly trend"]
+    sql_results = [
+        query_service.answer_question(db, OWNER, question, currency="GBP")
+        for question in questions[:2]
+    ]
+    monkeypatch.setattr(settings, "ANALYTICS_CUBE_ENABLED", True)
+    analytics_cube.invalidate()
+    cube_results = [query_service.answer_question(db, OWNER, question, currency="GBP") for question in questions]
+    analytics_cube.invalidate()
+    fx_service._matrix_cache.clear()
+    db.close()
+
+    for want, got in zip(sql_results, cube_results):
+        assert dict(zip(got.labels, got.values)) == dict(zip(want.labels, want.values))
+    assert dict(zip(cube_results[0].labels, cube_results[0].values)) == {"Travel": 30.0, "Dining": 4.0}
+    assert cube_results[2].labels == ["2026-01"]
+
+
+def test_cube_appends_inserts_and_rebuilds_after_deletes(session_factory, monkeypatch):
+    db = session_factory()
+    _seed(db, count=6)
+    monkeypatch.setattr(settings, "ANALYTICS_CUBE_ENABLED", True)
+    cubes = AnalyticsCubeService(max_bytes=10 * 1024 * 1024)
+
+    first = cubes.cube_for(db, OWNER)
+    assert cubes.cube_for(db, OWNER) is first
+
+    # A back-dated insert arrives with a higher id and is appended in day order.
+    db.add(_expense(99, date=date(2025, 12, 31), category="Gifts"))
+    data_versions.bump(db, OWNER)
+    db.commit()
+    appended = cubes.cube_for(db, OWNER)
+    assert appended.row_count == first.row_count + 1
+    assert appended.days[0] == (date(2025, 12, 31) - date(1970, 1, 1)).days
+    assert appended.categories[-1] == "Gifts"
+
+    db.delete(db.query(Expense).filter(Expense.owner_email == OWNER).first())
+    data_versions.bump(db, OWNER)
+    db.commit()
+    rebuilt = cubes.cube_for(db, OWNER)
+    db.close()
+    assert rebuilt.row_count == appended.row_count - 1
+    assert list(rebuilt.days) == sorted(rebuilt.days)
+
+
+def test_cube_evicts_least_recently_used_owner(session_factory):
+    db = session_factory()
+    _seed(db)
+    cubes = AnalyticsCubeService(max_bytes=1)
+    cubes.cube_for(db, OWNER)
+    cubes.cube_for(db, "bob@example.com")
+    db.close()
+    # Over budget: only the most recently used cube is kept.
+    assert list(cubes._cubes) == ["bob@example.com"]
@@ -0,0 +1,117 @@
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.main import app
+from app.models.category_baseline import CategoryBaseline
+from app.models.expense import Expense
+from app.services.anomaly_service import DUPLICATE_REASON, anomaly_service
+from app.services.finance import fx_service
+
+HEADERS = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+
+def _expense(owner: str, vendor: str, amount: float, day: date, category: str | None) -> Expense:
+    return Expense(
+        owner_email=owner,
+        vendor=vendor,
+        amount=amount,
+        currency="EUR",
+        base_currency_amount=amount,
+        base_currency="EUR",
+        fx_rate=1.0,
+        date=day,
+        category=category,
+        description="",
+        source_type="statement",
+    )
+
+
+def _confirm(client: TestClient, vendor: str, amount: float, day: date, category: str):
+    return client.post(
+        "/expenses/confirm",
+        data={
+            "vendor": vendor,
+            "amount": amount,
+            "date": day.isoformat(),
+            "currency": "EUR",
+            "category": category,
+            "receipt_url": "/static/uploads/1.jpg",
+        },
+        headers=HEADERS,
+    )
+
+
+def test_baselines_use_robust_statistics_per_owner_and_category():
+    rows = [("alice@example.com", "Groceries", amount) for amount in (10.0, 12.0, 14.0, 16.0, 400.0)]
+    rows += [("bob@example.com", "Groceries", 50.0), ("alice@example.com", "Uncategorized", 5.0)]
+    baselines = anomaly_service.compute_baselines(rows)
+
+    groceries = baselines[("alice@example.com", "Groceries")]
+    assert set(baselines) == {
+        ("alice@example.com", "Groceries"),
+        ("alice@example.com", "Uncategorized"),
+        ("bob@example.com", "Groceries"),
+    }
+    # One extreme charge barely moves the median and MAD.
+    assert (groceries["sample_count"], groceries["median"], groceries["mad"]) == (5, 14.0, 2.0)
+    assert (groceries["p90"], groceries["p95"]) == (246.4, 323.2)
+    assert baselines[("bob@example.com", "Groceries")]["mad"] == 0.0
+
+
+def test_refresh_baselines_keeps_a_rolling_window(session_factory):
+    today = date(2026, 6, 30)
+    db = session_factory()
+    db.add_all(
+        [
+            _expense("alice@example.com", "Shop", 20.0, today - timedelta(days=10), "Groceries"),
+            _expense("alice@example.com", "Shop", 30.0, today - timedelta(days=20), None),
+            _expense("alice@example.com", "Shop", 999.0, today - timedelta(days=500), "Groceries"),
+            _expense("alice@example.com", "Refund", -15.0, today - timedelta(days=5), "Groceries"),
+        ]
+    )
+    db.commit()
+    stored = anomaly_service.refresh_baselines(db, today=today)
+    baselines = {row.category: row for row in db.scalars(select(CategoryBaseline)).all()}
+    db.close()
+
+    assert stored == 2
+    assert baselines["Groceries"].median == 20.0
+    assert baselines["Groceries"].sample_count == 1
+    assert baselines["Uncategorized"].median == 30.0
+    assert baselines["Groceries"].window_start == today - timedelta(days=365)
+
+
+def test_new_charges_are_scored_against_stored_baselines(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+    today = date.today()
+    db = session_factory()
+    db.add_all(
+        _expense("alice@example.com", "REWE", 40.0 + n % 5, today - timedelta(days=7 * n + 3), "Groceries")
+        for n in range(10)
+    )
+    db.commit()
+    anomaly_service.refresh_baselines(db, "alice@example.com")
+    db.close()
+
+    client = TestClient(app)
+    usual = _confirm(client, "REWE", 44.0, today, "Groceries")
+    unusual = _confirm(client, "REWE", 140.0, today, "Groceries")
+    # No baseline for this category yet, but the second charge repeats the first.
+    first = _confirm(client, "Netflix", 12.99, today, "Subscriptions")
+    second = _confirm(client, "NETFLIX.COM 1234", 12.99, today, "Subscriptions")
+    listed = client.get("/api/anomalies", headers=HEADERS).json()
+
+    db = session_factory()
+    scored = {row.id: row for row in db.scalars(select(Expense).where(Expense.date == today)).all()}
+    db.close()
+
+    assert scored[usual.json()["id"]].anomaly_reason is None
+    assert scored[usual.json()["id"]].anomaly_score < 1
+    assert scored[unusual.json()["id"]].anomaly_reason == "3.3× your typical Groceries charge"
+    assert scored[unusual.json()["id"]].anomaly_score > 3.5
+    assert scored[first.json()["id"]].anomaly_reason is None
+    assert scored[second.json()["id"]].anomaly_reason == DUPLICATE_REASON
+    assert [item["id"] for item in listed["anomalies"]] == [second.json()["id"], unusual.json()["id"]]
+    assert listed["anomalies"][1]["category"] == "Groceries"
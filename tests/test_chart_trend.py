@@ -0,0 +1,89 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.expense import Expense
+from app.services.rollup_service import rollup_service
+from app.services.trend_service import trend_service
+
+
+def _seed(TestingSessionLocal, rows):
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Expense(
+                owner_email="alice@example.com",
+                vendor="Store",
+                amount=amount,
+                currency="EUR",
+                base_currency_amount=amount,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=day,
+                category="Groceries",
+                description="",
+                source_type="manual",
+            )
+            for amount, day in rows
+        ]
+    )
+    db.commit()
+    rollup_service.rebuild(db)
+    db.close()
+
+
+def _chart_data(query: str) -> dict:
+    client = TestClient(app)
+    response = client.get(
+        f"/api/expenses/chart-data{query}",
+        headers={"cf-access-authenticated-user-email": "alice@example.com"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_monthly_trend_fills_gaps_and_keeps_last_twelve(session_factory):
+    _seed(
+        session_factory,
+        [
+            (5.0, date(2024, 12, 20)),
+            (10.0, date(2025, 1, 5)),
+            (2.5, date(2025, 1, 28)),
+            (7.0, date(2025, 4, 2)),
+            (4.0, date(2025, 12, 31)),
+        ],
+    )
+
+    trend = _chart_data("")["trend"]
+
+    assert len(trend["labels"]) == 12
+    assert trend["labels"][0] == "2025-01"
+    assert trend["labels"][-1] == "2025-12"
+    assert trend["data"][0] == 12.5
+    assert trend["labels"][1:3] == ["2025-02", "2025-03"]
+    assert trend["data"][1:4] == [0.0, 0.0, 7.0]
+    assert sum(trend["data"]) == 23.5
+
+
+def test_weekly_and_daily_trend_buckets(session_factory):
+    _seed(
+        session_factory,
+        [
+            (1.0, date(2026, 3, 2)),  # Monday
+            (2.0, date(2026, 3, 8)),  # Sunday, same ISO week
+            (4.0, date(2026, 3, 18)),
+        ],
+    )
+
+    weekly = _chart_data("?month=2026-03&granularity=week")["trend"]
+    daily = _chart_data("?start_date=2026-03-07&end_date=2026-03-10&granularity=day")["trend"]
+
+    assert weekly == {"labels": ["2026-03-02", "2026-03-09", "2026-03-16"], "data": [3.0, 0.0, 4.0]}
+    assert daily == {"labels": ["2026-03-08"], "data": [2.0]}
+
+
+def test_unknown_granularity_falls_back_to_month():
+    assert trend_service.resolve_granularity("Week") == "week"
+    assert trend_service.resolve_granularity("fortnight") == "month"
+    assert trend_service.resolve_granularity(None) == "month"
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core import conditional
+from app.core.cache import result_cache
+from app.main import app
+from app.routers import expenses as expenses_router
+from app.services.finance import fx_service
+from app.services.rollup_service import rollup_service
+
+
+def test_chart_data_revalidates_with_etag(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+    # Disable the result cache so a 304 can only come from the validator check.
+    monkeypatch.setattr(result_cache, "enabled", False)
+    statements: list[str] = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    def confirm(amount: float) -> None:
+        response = client.post(
+            "/expenses/confirm",
+            data={
+                "vendor": "Store A",
+                "amount": amount,
+                "date": date(2026, 2, 3).isoformat(),
+                "currency": "EUR",
+                "category": "Groceries",
+                "receipt_url": "/static/uploads/1.jpg",
+            },
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    confirm(10.0)
+    first = client.get("/api/expenses/chart-data?month=2026-02", headers=headers)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert "last-modified" in first.headers
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+    revalidated = client.get("/api/expenses/chart-data?month=2026-02", headers={**headers, "If-None-Match": etag})
+    event.remove(Engine, "before_cursor_execute", count_statement)
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    # Only the owner's data version was read.
+    assert len(statements) == 1
+    assert "owner_data_versions" in statements[0]
+
+    other_params = client.get("/api/expenses/chart-data?month=2026-03", headers={**headers, "If-None-Match": etag})
+    assert other_params.status_code == 200
+
+    other_owner = client.get(
+        "/api/expenses/chart-data?month=2026-02",
+        headers={"cf-access-authenticated-user-email": "bob@example.com", "If-None-Match": etag},
+    )
+    assert other_owner.status_code == 200
+
+    confirm(5.0)
+    after_write = client.get("/api/expenses/chart-data?month=2026-02", headers={**headers, "If-None-Match": etag})
+    assert after_write.status_code == 200
+    assert after_write.headers["etag"] != etag
+    assert after_write.json()["vendors"]["data"] == [15.0]
+
+
+def test_saved_insights_revalidate_until_saved_query_changes(session_factory):
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    first = client.get("/api/insights/saved", headers=headers)
+    assert first.json() == []
+    last_modified = first.headers["last-modified"]
+    assert client.get("/api/insights/saved", headers={**headers, "If-Modified-Since": last_modified}).status_code == 304
+
+    save = client.post(
+        "/api/insights/save",
+        data={"name": "Top", "question": "top vendors", "sql_query": "SELECT 1", "chart_type": "bar"},
+        headers=headers,
+    )
+    assert save.status_code == 200
+    refreshed = client.get("/api/insights/saved", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert [row["name"] for row in refreshed.json()] == ["Top"]
+
+
+def test_chart_data_validators_expire_at_midnight(session_factory, monkeypatch):
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    first = client.get("/api/expenses/chart-data", headers=headers)
+    # No writes overnight, but relative ranges now resolve against another day.
+    monkeypatch.setattr(expenses_router, "DateType", Tomorrow)
+    monkeypatch.setattr(conditional, "date", Tomorrow)
+    by_etag = client.get("/api/expenses/chart-data", headers={**headers, "If-None-Match": first.headers["etag"]})
+    by_date = client.get(
+        "/api/expenses/chart-data", headers={**headers, "If-Modified-Since": first.headers["last-modified"]}
+    )
+
+    assert first.status_code == 200
+    assert by_etag.status_code == 200
+    assert by_etag.headers["etag"] != first.headers["etag"]
+    assert by_date.status_code == 200
+
+
+def test_chart_data_validators_change_after_out_of_process_write(session_factory):
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    first = client.get("/api/expenses/chart-data", headers=headers)
+    unchanged = client.get("/api/expenses/chart-data", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert unchanged.status_code == 304
+
+    # As `python -m app.cli rebuild-rollups` would from another process: the
+    # version moves in the database, outside any request to this app.
+    db = session_factory()
+    rollup_service.rebuild(db, owner_email="alice@example.com")
+    db.close()
+
+    by_etag = client.get("/api/expenses/chart-data", headers={**headers, "If-None-Match": first.headers["etag"]})
+    by_date = client.get(
+        "/api/expenses/chart-data", headers={**headers, "If-Modified-Since": first.headers["last-modified"]}
+    )
+    assert by_etag.status_code == 200
+    assert by_etag.headers["etag"] != first.headers["etag"]
+    assert by_date.status_code == 200
@@ -1,30 +1,16 @@
-from datetime import date
+from datetime import date, timedelta
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
-from app.db.base import Base
-from app.db.session import get_db
 from app.main import app
 from app.models.expense import Expense
+from app.services.rollup_service import rollup_service
 
 
-def _setup_test_db():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    return TestingSessionLocal
-
-
-def test_dashboard_renders_richer_metrics():
-    TestingSessionLocal = _setup_test_db()
-    db = TestingSessionLocal()
+def test_dashboard_renders_richer_metrics(session_factory):
+    db = session_factory()
     db.add_all(
         [
             Expense(
@@ -58,17 +44,8 @@ def test_dashboard_renders_richer_metrics():
     db.commit()
     db.close()
 
-    def override_get_db():
-        test_db = TestingSessionLocal()
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
     response = client.get("/", headers={"cf-access-authenticated-user-email": "alice@example.com"})
-    app.dependency_overrides.clear()
 
     assert response.status_code == 200
     assert "MoM (30d)" in response.text
@@ -76,3 +53,50 @@ def test_dashboard_renders_richer_metrics():
     assert "12m Monthly Avg" in response.text
     assert "Total spend within current filter range, converted to base currency." in response.text
     assert "EUR 50.00" in response.text
+
+
+def test_dashboard_metrics_use_two_round_trips(session_factory):
+    today = date.today()
+    db = session_factory()
+    db.add_all(
+        [
+            Expense(
+                owner_email="alice@example.com",
+                vendor=f"Store {idx}",
+                amount=10.0 * (idx + 1),
+                currency="EUR",
+                base_currency_amount=10.0 * (idx + 1),
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=today - timedelta(days=idx * 20),
+                category="Groceries" if idx % 2 else "Dining",
+                description="",
+                source_type="manual",
+            )
+            for idx in range(4)
+        ]
+    )
+    db.commit()
+    rollup_service.rebuild(db)
+    db.close()
+
+    statements: list[str] = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", count_statement)
+
+    client = TestClient(app)
+    response = client.get("/", headers={"cf-access-authenticated-user-email": "alice@example.com"})
+    event.remove(Engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == 200
+    # The owner's data version, then the two dashboard round trips.
+    assert len(statements) == 3
+    assert "owner_data_versions" in statements[0]
+    # 10 + 20 in the last 30 days vs 30 + 40 in the 30 days before; Groceries = 20 + 40.
+    assert "EUR 100.00" in response.text
+    assert "EUR 30.00 vs 70.00" in response.text
+    assert "Groceries" in response.text
+    assert "EUR 60.00" in response.text
@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.pool import (
+    InstrumentedQueuePool,
+    engine_options,
+    pool_checkout_seconds,
+    pool_connections,
+    pool_timeouts,
+    register_pool_gauges,
+)
+
+
+def test_pool_settings_and_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 1)
+    monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 0.05)
+    monkeypatch.setattr(settings, "DB_POOL_RECYCLE", 600)
+    monkeypatch.setattr(settings, "DB_POOL_PRE_PING", False)
+    registry.reset()
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", **engine_options("test"))
+    register_pool_gauges(engine, "test")
+
+    first = engine.connect()
+    first.execute(text("SELECT 1"))
+    second = engine.connect()
+    busy = {state: pool_connections.value(pool="test", state=state) for state in ("in_use", "idle", "overflow")}
+    # Pool and overflow are both in use, so the next checkout waits DB_POOL_TIMEOUT and fails.
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    second.close()
+    first.close()
+    idle = {state: pool_connections.value(pool="test", state=state) for state in ("in_use", "idle", "overflow")}
+    rendered = registry.render()
+    engine.dispose()
+
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    assert (engine.pool.size(), engine.pool._recycle, engine.pool._pre_ping) == (1, 600, False)
+    assert busy == {"in_use": 2.0, "idle": 0.0, "overflow": 1.0}
+    # The overflow connection is closed on return; the pooled one stays idle.
+    assert idle == {"in_use": 0.0, "idle": 1.0, "overflow": 0.0}
+    assert pool_checkout_seconds.count(pool="test") == 3
+    assert pool_timeouts.value(pool="test") == 1
+    assert 'xta_db_pool_size{pool="test"} 1.0' in rendered
+    assert 'xta_db_pool_checkout_seconds_bucket{pool="test",le="0.1"} 3' in rendered
@@ -0,0 +1,161 @@
+import asyncio
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.core.cache import computation, result_cache
+from app.core.config import settings
+from app.main import app
+from app.models.expense import Expense
+from app.services.analytics_cube import OwnerCube, analytics_cube
+from app.services.finance import FXService, fx_service
+from app.services.reporting import reporting_service
+
+
+def test_rate_matrix_forward_fills_and_converts_vectorized(monkeypatch) -> None:
+    service = FXService()
+
+    def fake_timeseries(base_currency, quote_currencies, start_date, end_date):
+        assert base_currency == "GBP"
+        # GBP -> EUR quotes; Jan 3rd/4th are missing and must be forward-filled.
+        return {
+            date(2026, 1, 1): {"EUR": 1.25},
+            date(2026, 1, 2): {"EUR": 1.0},
+        }
+
+    monkeypatch.setattr(service, "_fetch_timeseries", fake_timeseries)
+    matrix = service.build_rate_matrix("GBP", ["EUR", "GBP"], date(2026, 1, 1), date(2026, 1, 4))
+    converted = matrix.convert(
+        currencies=["EUR", "EUR", "GBP"],
+        days=[date(2026, 1, 1), date(2026, 1, 4), date(2026, 1, 4)],
+        amounts=[10.0, 10.0, 7.0],
+    )
+    assert converted.tolist() == [8.0, 10.0, 7.0]
+
+
+def test_fallback_rates_are_not_cached_and_unknown_currencies_show_base(monkeypatch) -> None:
+    service = FXService()
+    monkeypatch.setattr(service, "_fetch_timeseries", lambda *args: {})
+    # The first lookup fails (FX outage), the retry succeeds.
+    latest_rates = iter([None, 0.8])
+    monkeypatch.setattr(service, "_fetch_rate", lambda **kwargs: next(latest_rates))
+
+    with computation() as outage_scope:
+        during_outage = service.build_rate_matrix("EUR", ["USD"], date(2026, 1, 1), date(2026, 1, 2))
+    with computation() as recovered_scope:
+        recovered = service.build_rate_matrix("EUR", ["USD"], date(2026, 1, 1), date(2026, 1, 2))
+    cached = service.build_rate_matrix("EUR", ["USD"], date(2026, 1, 1), date(2026, 1, 2))
+
+    assert during_outage.convert(["USD"], [date(2026, 1, 1)], [10.0]).tolist() == [10.0]
+    assert recovered.convert(["USD"], [date(2026, 1, 1)], [10.0]).tolist() == [8.0]
+    assert cached is recovered
+    # Payloads built on the fallback matrix stay out of the result caches.
+    assert not during_outage.complete and not outage_scope.cacheable
+    assert recovered.complete and recovered_scope.cacheable
+    assert [reporting_service.resolve_display_currency(code) for code in ("usd", "XYZ", None)] == ["USD", "EUR", "EUR"]
+
+
+def test_chart_data_supports_display_currency(session_factory, monkeypatch):
+    db = session_factory()
+    db.add_all(
+        [
+            Expense(
+                owner_email="alice@example.com",
+                vendor="Store A",
+                amount=20.0,
+                currency="EUR",
+                base_currency_amount=20.0,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=date(2026, 2, 2),
+                category="Groceries",
+                description="",
+                source_type="manual",
+            ),
+            Expense(
+                owner_email="alice@example.com",
+                vendor="Store B",
+                amount=5.0,
+                currency="GBP",
+                base_currency_amount=6.0,
+                base_currency="EUR",
+                fx_rate=1.2,
+                date=date(2026, 2, 3),
+                category="Dining",
+                description="",
+                source_type="manual",
+            ),
+        ]
+    )
+    db.commit()
+    db.close()
+
+    lookups_on_event_loop = []
+    conversions_on_event_loop = []
+
+    def on_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def fake_timeseries(base_currency, quote_currencies, start_date, end_date):
+        lookups_on_event_loop.append(on_event_loop())
+        return {date(2026, 2, 2): {"EUR": 1.25}}
+
+    monkeypatch.setattr(fx_service, "_fetch_timeseries", fake_timeseries)
+    fx_service._matrix_cache.clear()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    ask_response = client.post(
+        "/api/insights/ask",
+        data={"question": "vendor spend", "month": "2026-02", "currency": "GBP"},
+        headers=headers,
+    )
+
+    convert_grouped, cube_values = reporting_service.convert_grouped, OwnerCube.values
+
+    def tracked_convert_grouped(*args, **kwargs):
+        conversions_on_event_loop.append(on_event_loop())
+        return convert_grouped(*args, **kwargs)
+
+    def tracked_cube_values(cube, *args, **kwargs):
+        conversions_on_event_loop.append(on_event_loop())
+        return cube_values(cube, *args, **kwargs)
+
+    monkeypatch.setattr(reporting_service, "convert_grouped", tracked_convert_grouped)
+    monkeypatch.setattr(OwnerCube, "values", tracked_cube_values)
+    response = client.get("/api/expenses/chart-data?month=2026-02&currency=gbp", headers=headers)
+    # Same numbers from the in-memory cube, which converts with the prefetched rates too.
+    monkeypatch.setattr(settings, "ANALYTICS_CUBE_ENABLED", True)
+    result_cache.clear()
+    cube_response = client.get("/api/expenses/chart-data?month=2026-02&currency=gbp", headers=headers)
+    analytics_cube.invalidate()
+    fx_service._matrix_cache.clear()
+
+    cube_categories = cube_response.json()["categories"]
+    assert dict(zip(cube_categories["labels"], cube_categories["data"])) == {"Groceries": 16.0, "Dining": 5.0}
+    # The provider is called from a worker thread, never on the event loop;
+    # so is the chart's NumPy conversion, with and without the cube.
+    assert lookups_on_event_loop
+    assert not any(lookups_on_event_loop)
+    assert len(conversions_on_event_loop) == 4
+    assert not any(conversions_on_event_loop)
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["display_currency"] == "GBP"
+    assert payload["base_currency"] == "EUR"
+    assert dict(zip(payload["categories"]["labels"], payload["categories"]["data"])) == {
+        "Groceries": 16.0,
+        "Dining": 5.0,
+    }
+    assert payload["trend"]["labels"] == ["2026-02"]
+    assert payload["trend"]["data"] == [21.0]
+
+    assert ask_response.status_code == 200
+    ask_payload = ask_response.json()
+    assert ask_payload["currency"] == "GBP"
+    assert ask_payload["chart"]["labels"] == ["Store A", "Store B"]
+    assert ask_payload["chart"]["values"] == [16.0, 5.0]
@@ -0,0 +1,78 @@
+import html
+import re
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.expense import Expense
+from app.routers import expenses as expenses_router
+
+
+def _row_ids(markup: str) -> list[int]:
+    return [int(value) for value in re.findall(r'<tr id="expense-row-(\d+)"', markup)]
+
+
+def _next_url(markup: str) -> str | None:
+    match = re.search(r'hx-get="([^"]+)" hx-trigger="revealed"', markup)
+    return html.unescape(match.group(1)) if match else None
+
+
+def test_expense_list_pages_by_date_and_id(session_factory, monkeypatch):
+    monkeypatch.setattr(expenses_router, "EXPENSE_PAGE_SIZE", 4)
+    db = session_factory()
+    # Three expenses per day so pages split inside a date and must tie-break on id.
+    db.add_all(
+        [
+            Expense(
+                owner_email=owner,
+                vendor=f"Store {n}",
+                amount=1.0,
+                currency="EUR",
+                base_currency_amount=1.0,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=date(2026, 1, 1) + timedelta(days=n // 3),
+                category="Groceries",
+                description="",
+                source_type="manual",
+            )
+            for n in range(11)
+            for owner in ("alice@example.com", "bob@example.com")
+        ]
+    )
+    db.commit()
+    expected = [
+        row.id
+        for row in db.query(Expense)
+        .filter(Expense.owner_email == "alice@example.com")
+        .order_by(Expense.date.desc(), Expense.id.desc())
+    ]
+    db.close()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    page = client.get("/expenses", headers=headers)
+    assert page.status_code == 200
+    seen = _row_ids(page.text)
+    assert len(seen) == 4
+    next_url = _next_url(page.text)
+    while next_url:
+        fragment = client.get(next_url, headers=headers)
+        assert fragment.status_code == 200
+        assert "<html" not in fragment.text
+        seen.extend(_row_ids(fragment.text))
+        next_url = _next_url(fragment.text)
+
+    bad_cursor = client.get("/expenses/rows?cursor=nope", headers=headers)
+
+    assert seen == expected
+    assert bad_cursor.status_code == 400
+
+
+def test_next_page_url_keeps_filters():
+    assert expenses_router._next_page_url("2026-01", None, None, None) is None
+    assert (
+        expenses_router._next_page_url(None, "2026-01-01", "2026-01-31", "2026-01-10_7")
+        == "/expenses/rows?start_date=2026-01-01&end_date=2026-01-31&cursor=2026-01-10_7"
+    )
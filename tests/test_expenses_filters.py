@@ -1,30 +1,14 @@
 from datetime import date
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 
-from app.db.base import Base
-from app.db.session import get_db
 from app.main import app
 from app.models.expense import Expense
+from app.services.rollup_service import rollup_service
 
 
-def _setup_test_db():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    return TestingSessionLocal
-
-
-def test_expenses_page_and_chart_data_support_date_filters():
-    TestingSessionLocal = _setup_test_db()
-    db = TestingSessionLocal()
+def test_expenses_page_and_chart_data_support_date_filters(session_factory):
+    db = session_factory()
     db.add_all(
         [
             Expense(
@@ -56,16 +40,9 @@ def test_expenses_page_and_chart_data_support_date_filters():
         ]
     )
     db.commit()
+    rollup_service.rebuild(db)
     db.close()
 
-    def override_get_db():
-        test_db = TestingSessionLocal()
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
     headers = {"cf-access-authenticated-user-email": "alice@example.com"}
 
@@ -75,7 +52,6 @@ def test_expenses_page_and_chart_data_support_date_filters():
     assert "Store A" not in page_response.text
 
     chart_response = client.get("/api/expenses/chart-data?month=2026-02", headers=headers)
-    app.dependency_overrides.clear()
     assert chart_response.status_code == 200
     payload = chart_response.json()
     assert payload["vendors"]["labels"] == ["Store B"]
@@ -0,0 +1,103 @@
+import csv
+import io
+import zipfile
+from datetime import date
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.expense import Expense, ExpenseItem
+from app.services import export_service as export_module
+from app.services.export_service import export_service
+from app.services.ingestion import ingestion_service
+
+
+def _expense(owner: str, vendor: str, day: date, receipt_url: str | None = None) -> Expense:
+    return Expense(
+        owner_email=owner,
+        vendor=vendor,
+        amount=12.5,
+        currency="EUR",
+        base_currency_amount=12.5,
+        base_currency="EUR",
+        fx_rate=1.0,
+        date=day,
+        category="Groceries",
+        description="",
+        receipt_url=receipt_url,
+        source_type="receipt",
+    )
+
+
+def test_export_streams_csv_and_zip_with_receipts(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_service, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(export_module, "CSV_FLUSH_CHARS", 16)
+    alice_dir = Path(ingestion_service.receipt_dir("alice@example.com"))
+    bob_dir = Path(ingestion_service.receipt_dir("bob@example.com"))
+    alice_dir.mkdir(parents=True)
+    bob_dir.mkdir(parents=True)
+    (alice_dir / "r1.jpg").write_bytes(b"receipt-bytes")
+    (bob_dir / "bob.jpg").write_bytes(b"bob-receipt")
+
+    db = session_factory()
+    with_items = _expense("alice@example.com", "Store A", date(2026, 1, 5), receipt_url="uploads/r1.jpg")
+    with_items.items = [
+        ExpenseItem(name="Milk", quantity=1.0, price=2.5),
+        ExpenseItem(name="Bread", quantity=2.0, price=5.0),
+    ]
+    db.add_all(
+        [
+            with_items,
+            _expense("alice@example.com", "Store B", date(2026, 1, 20), receipt_url="uploads/missing.jpg"),
+            # Another user's upload, named through the free-form receipt_url.
+            _expense("alice@example.com", "Store E", date(2026, 1, 25), receipt_url="uploads/bob.jpg"),
+            _expense("alice@example.com", "Store C", date(2026, 2, 1)),
+            _expense("bob@example.com", "Store D", date(2026, 1, 10)),
+        ]
+    )
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    csv_response = client.get("/api/expenses/export?month=2026-01", headers=headers)
+    zip_response = client.get("/api/expenses/export?month=2026-01&format=zip", headers=headers)
+    bad_format = client.get("/api/expenses/export?format=xml", headers=headers)
+
+    assert csv_response.status_code == 200
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    assert 'filename="xta-expenses-2026-01.csv"' in csv_response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(csv_response.text)))
+    assert [(row["vendor"], row["item_name"]) for row in rows] == [
+        ("Store A", "Milk"),
+        ("Store A", "Bread"),
+        ("Store B", ""),
+        ("Store E", ""),
+    ]
+    assert rows[0]["receipt_file"] == f"receipts/2026-01-05_{rows[0]['expense_id']}_r1.jpg"
+    assert rows[2]["receipt_file"] == ""
+    assert rows[3]["receipt_file"] == ""
+
+    assert zip_response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(zip_response.content)) as archive:
+        assert archive.namelist() == ["expenses.csv", rows[0]["receipt_file"]]
+        assert archive.read("expenses.csv").decode("utf-8") == csv_response.text
+        assert archive.read(rows[0]["receipt_file"]) == b"receipt-bytes"
+
+    assert bad_format.status_code == 400
+
+
+def test_receipt_paths_stay_inside_the_owners_receipt_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_service, "UPLOAD_DIR", str(tmp_path))
+    owner = "alice@example.com"
+    owner_dir = Path(ingestion_service.receipt_dir(owner))
+    owner_dir.mkdir(parents=True)
+    (owner_dir / "ok.png").write_bytes(b"x")
+    (tmp_path / "shared.png").write_bytes(b"x")
+    assert export_service.resolve_receipt_path(owner, "uploads/ok.png") == (owner_dir / "ok.png").resolve()
+    assert export_service.resolve_receipt_path("bob@example.com", "uploads/ok.png") is None
+    assert export_service.resolve_receipt_path(owner, "uploads/shared.png") is None
+    assert export_service.resolve_receipt_path(owner, "/static/../core/config.py") is None
+    assert export_service.resolve_receipt_path(owner, "../../etc/passwd") is None
+    assert export_service.resolve_receipt_path(owner, None) is None
@@ -0,0 +1,110 @@
+from datetime import date
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.expense import Expense
+from app.services.finance import fx_service
+from app.services.forecast_service import forecast_service, seasonal_baselines
+from app.services.recurring_service import recurring_service
+from app.services.rollup_service import rollup_service
+
+HEADERS = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+
+def _expense(vendor: str, amount: float, day: date, category: str) -> Expense:
+    return Expense(
+        owner_email="alice@example.com",
+        vendor=vendor,
+        amount=amount,
+        currency="EUR",
+        base_currency_amount=amount,
+        base_currency="EUR",
+        fx_rate=1.0,
+        date=day,
+        category=category,
+        description="",
+        source_type="statement",
+    )
+
+
+def test_seasonal_baselines_scale_the_level_by_the_months_share_of_the_year():
+    # Two categories, 24 months; the first doubles every December (columns 11 and 23 are Decembers).
+    history = np.full((2, 24), 100.0)
+    history[0, [11, 23]] = 200.0
+    history[1, :12] = 0.0
+
+    # Forecasting from the first column's month + 24, i.e. for January and February.
+    short = seasonal_baselines(history, history_months=6)
+    baselines = seasonal_baselines(history, history_months=24)
+    no_history = seasonal_baselines(history, history_months=0)
+
+    np.testing.assert_allclose(short, [[350 / 3, 350 / 3], [100.0, 100.0]])
+    # January is a below-average month for the first category; the second has one year of data.
+    assert baselines[0, 0] < short[0, 0]
+    np.testing.assert_allclose(baselines[1], [100.0, 100.0])
+    assert no_history.shape == (2, 2) and not no_history.any()
+
+
+def test_forecast_adds_recurring_charges_on_their_expected_dates(session_factory):
+    db = session_factory()
+    groceries = [(3, 80.0), (17, 120.0), (9, 90.0), (25, 110.0), (12, 100.0)]
+    db.add_all(
+        _expense("REWE", amount, date(2026, month, day), "Groceries")
+        for month, (day, amount) in enumerate(groceries, start=1)
+    )
+    db.add_all(_expense("Netflix", 15.0, date(2026, month, 20), "Subscriptions") for month in range(1, 6))
+    db.add(_expense("REWE", 30.0, date(2026, 6, 5), "Groceries"))
+    db.commit()
+    rollup_service.rebuild(db, "alice@example.com")
+    recurring_service.rebuild(db, "alice@example.com")
+    forecast = forecast_service.forecast(db, "alice@example.com", today=date(2026, 6, 10))
+    db.close()
+
+    rows = {row["category"]: row for row in forecast["categories"]}
+    assert (forecast["month"], forecast["next_month"], forecast["history_months"]) == ("2026-06", "2026-07", 5)
+    # 30 so far plus two thirds of the usual 100; Netflix is not part of the grocery baseline.
+    assert rows["Groceries"]["month_end"] == 96.67
+    assert rows["Groceries"]["next_month"] == 100.0
+    assert rows["Subscriptions"] == {
+        "category": "Subscriptions",
+        "month_to_date": 0.0,
+        "month_end": 15.0,
+        "next_month": 15.0,
+        "recurring_next_month": 15.0,
+    }
+    assert forecast["totals"] == {"month_to_date": 30.0, "month_end": 111.67, "next_month": 115.0}
+
+
+def test_forecast_model_is_refitted_only_after_new_data(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+    fits = []
+    original_build = forecast_service.build_model
+    monkeypatch.setattr(
+        forecast_service, "build_model", lambda *args: fits.append(args[2]) or original_build(*args)
+    )
+
+    client = TestClient(app)
+    empty = client.get("/api/forecast", headers=HEADERS)
+    again = client.get("/api/forecast", headers=HEADERS)
+    not_modified = client.get("/api/forecast", headers={**HEADERS, "If-None-Match": empty.headers["etag"]})
+    client.post(
+        "/expenses/confirm",
+        data={
+            "vendor": "REWE",
+            "amount": 42.0,
+            "date": date.today().isoformat(),
+            "currency": "EUR",
+            "category": "Groceries",
+            "receipt_url": "/static/uploads/1.jpg",
+        },
+        headers=HEADERS,
+    )
+    updated = client.get("/api/forecast", headers=HEADERS)
+
+    assert empty.json()["categories"] == []
+    assert again.json() == empty.json()
+    assert not_modified.status_code == 304
+    assert len(fits) == 2 and fits[0] == date.today().replace(day=1)
+    assert updated.json()["totals"]["month_to_date"] == 42.0
@@ -1,30 +1,16 @@
 from datetime import date
 
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.exc import OperationalError
 
-from app.db.base import Base
-from app.db.session import get_db
 from app.main import app
-from app.models.expense import Expense
+from app.models.expense import Expense, ExpenseItem
+from app.models.saved_query import SavedQuery
+from app.services.query_service import query_service
 
 
-def _setup_test_db():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    return TestingSessionLocal
-
-
-def test_insights_ask_save_and_pin_flow():
-    TestingSessionLocal = _setup_test_db()
-    db = TestingSessionLocal()
+def test_insights_ask_save_and_pin_flow(session_factory):
+    db = session_factory()
     db.add_all(
         [
             Expense(
@@ -58,14 +44,6 @@ def test_insights_ask_save_and_pin_flow():
     db.commit()
     db.close()
 
-    def override_get_db():
-        test_db = TestingSessionLocal()
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
     headers = {"cf-access-authenticated-user-email": "alice@example.com"}
 
@@ -96,16 +74,14 @@ def test_insights_ask_save_and_pin_flow():
     assert pin_response.status_code == 200
 
     list_response = client.get("/api/insights/saved", headers=headers)
-    app.dependency_overrides.clear()
     assert list_response.status_code == 200
     rows = list_response.json()
     assert rows
     assert rows[0]["is_pinned"] is True
 
 
-def test_delete_saved_query():
-    TestingSessionLocal = _setup_test_db()
-    db = TestingSessionLocal()
+def test_delete_saved_query(session_factory):
+    db = session_factory()
     db.add(
         Expense(
             owner_email="alice@example.com",
@@ -124,14 +100,6 @@ def test_delete_saved_query():
     db.commit()
     db.close()
 
-    def override_get_db():
-        test_db = TestingSessionLocal()
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
     headers = {"cf-access-authenticated-user-email": "alice@example.com"}
 
@@ -162,12 +130,10 @@ def test_delete_saved_query():
 
     second_delete = client.delete(f"/api/insights/{saved_id}", headers=headers)
     assert second_delete.status_code == 404
-    app.dependency_overrides.clear()
 
 
-def test_insights_intent_echoes_auto_when_not_provided():
-    TestingSessionLocal = _setup_test_db()
-    db = TestingSessionLocal()
+def test_insights_intent_echoes_auto_when_not_provided(session_factory):
+    db = session_factory()
     db.add(
         Expense(
             owner_email="alice@example.com",
@@ -186,18 +152,316 @@ def test_insights_intent_echoes_auto_when_not_provided():
     db.commit()
     db.close()
 
-    def override_get_db():
-        test_db = TestingSessionLocal()
-        try:
-            yield test_db
-        finally:
-            test_db.close()
-
-    app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
     headers = {"cf-access-authenticated-user-email": "alice@example.com"}
     response = client.post("/api/insights/ask", data={"question": "show category split"}, headers=headers)
-    app.dependency_overrides.clear()
     assert response.status_code == 200
     payload = response.json()
     assert payload["intent"] == "auto"
+
+
+def test_insights_ask_served_from_query_cache_until_write(session_factory):
+    db = session_factory()
+    db.add(
+        Expense(
+            owner_email="alice@example.com",
+            vendor="Store A",
+            amount=10.0,
+            currency="EUR",
+            base_currency_amount=10.0,
+            base_currency="EUR",
+            fx_rate=1.0,
+            date=date(2026, 1, 1),
+            category="Groceries",
+            description="",
+            source_type="manual",
+        )
+    )
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    def ask(question: str, owner: str = "alice@example.com") -> dict:
+        response = client.post(
+            "/api/insights/ask",
+            data={"question": question},
+            headers={"cf-access-authenticated-user-email": owner},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    first = ask("Show category split")
+    # Same normalized SQL and params: differently worded/cased questions share an entry.
+    repeat = ask("  show CATEGORY split ")
+    other_owner = ask("Show category split", owner="bob@example.com")
+
+    confirm = client.post(
+        "/expenses/confirm",
+        data={
+            "vendor": "Store B",
+            "amount": 5.0,
+            "date": date(2026, 1, 2).isoformat(),
+            "currency": "EUR",
+            "category": "Dining",
+            "receipt_url": "/static/uploads/1.jpg",
+        },
+        headers=headers,
+    )
+    after_write = ask("Show category split")
+
+    assert first["cache_hit"] is False
+    assert repeat["cache_hit"] is True
+    assert repeat["chart"] == first["chart"]
+    assert other_owner["cache_hit"] is False
+    assert other_owner["chart"]["labels"] == []
+    assert confirm.status_code == 200
+    assert after_write["cache_hit"] is False
+    assert sorted(after_write["chart"]["labels"]) == ["Dining", "Groceries"]
+
+
+def test_pinned_queries_run_server_side_in_one_batch(session_factory):
+    db = session_factory()
+    db.add_all(
+        [
+            Expense(
+                owner_email="alice@example.com",
+                vendor=vendor,
+                amount=amount,
+                currency="EUR",
+                base_currency_amount=amount,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=tx_date,
+                category=category,
+                description="",
+                source_type="manual",
+            )
+            for vendor, amount, tx_date, category in [
+                ("Store A", 10.0, date(2026, 1, 5), "Groceries"),
+                ("Store A", 20.0, date(2026, 1, 9), "Groceries"),
+                ("Cafe B", 7.0, date(2026, 1, 9), "Dining"),
+                ("Cafe B", 99.0, date(2026, 2, 1), "Dining"),
+            ]
+        ]
+    )
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    def save_and_pin(data: dict) -> int:
+        saved = client.post("/api/insights/save", data=data, headers=headers)
+        assert saved.status_code == 200
+        saved_id = saved.json()["id"]
+        assert client.post(f"/api/insights/{saved_id}/pin", headers=headers).status_code == 200
+        return saved_id
+
+    visits_id = save_and_pin(
+        {"name": "Visits", "question": "anything", "intent": "visits", "month": "2026-01", "sql_query": "DROP TABLE expenses"}
+    )
+    split_id = save_and_pin({"name": "Split", "question": "show category split"})
+    client.post("/api/insights/save", data={"name": "Unpinned", "question": "vendor spend"}, headers=headers)
+
+    saved_rows = {row["id"]: row for row in client.get("/api/insights/saved", headers=headers).json()}
+    batch = client.get("/api/insights/pinned/results", headers=headers)
+    empty_batch = client.get(
+        "/api/insights/pinned/results", headers={"cf-access-authenticated-user-email": "bob@example.com"}
+    )
+
+    assert saved_rows[visits_id]["intent"] == "visits"
+    assert saved_rows[visits_id]["params"] == {"month": "2026-01"}
+    assert "DROP" not in saved_rows[visits_id]["sql"]
+    assert saved_rows[split_id]["intent"] == "category_split"
+
+    assert batch.status_code == 200
+    payload = batch.json()
+    assert [row["id"] for row in payload] == [split_id, visits_id]
+    split, visits = payload
+    assert split["chart"]["type"] == "pie"
+    assert dict(zip(split["chart"]["labels"], split["chart"]["values"])) == {"Groceries": 30.0, "Dining": 106.0}
+    assert dict(zip(visits["chart"]["labels"], visits["chart"]["values"])) == {"Store A": 2.0, "Cafe B": 1.0}
+    assert empty_batch.json() == []
+
+
+def test_item_intents_query_expense_items(session_factory):
+    db = session_factory()
+    receipts = [
+        ("alice@example.com", date(2026, 1, 10), 1.0, [("Tomatoes", 2.0, 3.0), ("Crisps", 1.0, 2.5)]),
+        ("alice@example.com", date(2026, 2, 10), 1.0, [("Cherry Tomato", 1.0, 2.0), ("Milk", 1.0, 1.0)]),
+        # USD receipt: prices are converted to base with the expense's fx_rate.
+        ("alice@example.com", date(2026, 2, 20), 0.5, [("Tomatoes", 4.0, 8.0)]),
+        ("bob@example.com", date(2026, 1, 10), 1.0, [("Tomatoes", 1.0, 100.0)]),
+    ]
+    for owner, tx_date, fx_rate, items in receipts:
+        expense = Expense(
+            owner_email=owner,
+            vendor="Market",
+            amount=sum(price for _, _, price in items),
+            currency="EUR" if fx_rate == 1.0 else "USD",
+            base_currency_amount=sum(price for _, _, price in items) * fx_rate,
+            base_currency="EUR",
+            fx_rate=fx_rate,
+            date=tx_date,
+            category="Groceries",
+            description="",
+            source_type="manual",
+        )
+        expense.items = [ExpenseItem(name=name, quantity=quantity, price=price) for name, quantity, price in items]
+        db.add(expense)
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    def ask(question: str, **form) -> dict:
+        response = client.post("/api/insights/ask", data={"question": question, **form}, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    unit_price = ask("What is the average price I pay for tomatoes?")
+    trend = ask("Price trend of tomatoes")
+    spend = ask("How much did I spend on crisps last month?")
+    cherry = ask("How much did I spend on cherry tomatoes?")
+    groceries = ask("How much did I spend on groceries")
+    per_item = ask("spend per item", month="2026-02")
+
+    assert "lower(i.name) LIKE :item_pattern" in unit_price["sql"]
+    # Tomatoes 3.0/2, Cherry Tomato 2.0/1, Tomatoes 8.0/4 * 0.5 -> items grouped by name.
+    assert dict(zip(unit_price["chart"]["labels"], unit_price["chart"]["values"])) == {
+        "Cherry Tomato": 2.0,
+        "Tomatoes": 1.25,
+    }
+    assert trend["chart"]["type"] == "line"
+    assert dict(zip(trend["chart"]["labels"], trend["chart"]["values"])) == {"2026-01": 1.5, "2026-02": 1.5}
+    assert dict(zip(spend["chart"]["labels"], spend["chart"]["values"])) == {"Crisps": 2.5}
+    assert dict(zip(cherry["chart"]["labels"], cherry["chart"]["values"])) == {"Cherry Tomato": 2.0}
+    # A category name is not an item search; it keeps the category split.
+    assert groceries["chart"]["type"] == "pie"
+    assert "expense_items" not in groceries["sql"]
+    assert dict(zip(groceries["chart"]["labels"], groceries["chart"]["values"])) == {"Groceries": 12.5}
+    assert dict(zip(per_item["chart"]["labels"], per_item["chart"]["values"])) == {
+        "Tomatoes": 4.0,
+        "Cherry Tomato": 2.0,
+        "Milk": 1.0,
+    }
+
+
+def test_period_comparison_intents_return_current_previous_and_delta(session_factory):
+    db = session_factory()
+    for vendor, category, amount, day in [
+        ("REWE", "Groceries", 40.0, date(2026, 3, 5)),
+        ("REWE", "Groceries", 10.0, date(2026, 2, 9)),
+        ("Aldi", "Groceries", 5.0, date(2026, 1, 20)),
+        ("Cafe", "Dining", 12.0, date(2026, 2, 14)),
+        ("Cafe", "Dining", 30.0, date(2025, 3, 1)),
+        ("Shell", None, 20.0, date(2026, 3, 28)),
+    ]:
+        db.add(
+            Expense(
+                owner_email="alice@example.com",
+                vendor=vendor,
+                amount=amount,
+                currency="EUR",
+                base_currency_amount=amount,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=day,
+                category=category,
+                description="",
+                source_type="manual",
+            )
+        )
+    db.commit()
+    db.close()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    def ask(**data):
+        response = client.post("/api/insights/ask", data=data, headers=headers)
+        assert response.status_code == 200
+        chart = response.json()["chart"]
+        series = chart["series"]
+        return {
+            label: (series["current"][i], series["previous"][i], series["delta"][i])
+            for i, label in enumerate(chart["labels"])
+        }, response.json()
+
+    mom, payload = ask(question="category spend month over month", month="2026-03")
+    yoy, _ = ask(question="category spend year over year", month="2026-03")
+    by_vendor, _ = ask(question="compare vendors to last month", month="2026-03")
+    quarter, quarter_payload = ask(
+        question="category spend vs previous period", start_date="2026-02-01", end_date="2026-03-31"
+    )
+
+    assert payload["intent"] == "auto"
+    assert "2026-03 vs 2026-02" in payload["summary"]
+    # Dining only had spend last month: it stays in the comparison at zero.
+    assert mom == {
+        "Groceries": (40.0, 10.0, 30.0),
+        "Uncategorized": (20.0, 0.0, 20.0),
+        "Dining": (0.0, 12.0, -12.0),
+    }
+    assert yoy["Dining"] == (0.0, 30.0, -30.0)
+    assert yoy["Groceries"] == (40.0, 0.0, 40.0)
+    assert by_vendor["REWE"] == (40.0, 10.0, 30.0)
+    assert by_vendor["Shell"] == (20.0, 0.0, 20.0)
+    assert "Aldi" not in by_vendor
+    # Two-month period Feb-Mar vs Dec-Jan.
+    assert "2026-02 to 2026-03 vs 2025-12 to 2026-01" in quarter_payload["summary"]
+    assert quarter["Groceries"] == (50.0, 5.0, 45.0)
+    assert quarter["Dining"] == (12.0, 0.0, 12.0)
+
+
+def test_broken_pinned_query_does_not_fail_the_batch(session_factory, monkeypatch):
+    db = session_factory()
+    db.add(
+        Expense(
+            owner_email="alice@example.com",
+            vendor="Store A",
+            amount=12.0,
+            currency="EUR",
+            base_currency_amount=12.0,
+            base_currency="EUR",
+            fx_rate=1.0,
+            date=date(2026, 1, 5),
+            category="Groceries",
+            description="",
+            source_type="manual",
+        )
+    )
+    db.commit()
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    saved_ids = {}
+    for name, question in [("Split", "show category split"), ("Vendors", "vendor spend"), ("Trend", "monthly trend")]:
+        saved = client.post("/api/insights/save", data={"name": name, "question": question}, headers=headers)
+        saved_ids[name] = saved.json()["id"]
+        client.post(f"/api/insights/{saved_ids[name]}/pin", headers=headers)
+    # A row that can no longer be planned, and one whose query fails when run.
+    db.query(SavedQuery).filter(SavedQuery.id == saved_ids["Vendors"]).update({"question": "", "intent": None})
+    db.commit()
+    db.close()
+    execute = query_service.execute
+
+    def failing_execute(session, prepared, rates=None):
+        if prepared.intent == "monthly_trend":
+            raise OperationalError("SELECT ...", {}, Exception("no such column"))
+        return execute(session, prepared, rates)
+
+    monkeypatch.setattr(query_service, "execute", failing_execute)
+    batch = client.get("/api/insights/pinned/results", headers=headers)
+
+    assert batch.status_code == 200
+    assert batch.headers["cache-control"] == "no-store"
+    trend, vendors, split = batch.json()
+    assert dict(zip(split["chart"]["labels"], split["chart"]["values"])) == {"Groceries": 12.0}
+    assert "error" not in split
+    assert vendors["error"] == "Question cannot be empty."
+    assert trend["error"] == "This query could not be run. Try saving it again."
+    assert trend["chart"]["labels"] == []
@@ -0,0 +1,80 @@
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.cache import cache_lookups
+from app.core.instrumentation import (
+    db_queries_per_request,
+    fx_failures,
+    llm_failures,
+    llm_seconds,
+)
+from app.core.metrics import registry, timed
+from app.main import app
+from app.routers.upload import upload_rows
+from app.services.finance import fx_service
+from app.services.statement_service import statement_service
+
+HEADERS = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+
+def test_requests_queries_uploads_and_caches_are_measured(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+    rows = [
+        {"date": "2026-03-01", "vendor": "Shop", "amount": 10.0, "currency": "EUR"},
+        {"date": "2026-03-01", "vendor": "Shop", "amount": 10.0, "currency": "EUR"},
+        {"date": "2026-03-02", "vendor": "Cafe", "amount": 4.5, "currency": "EUR"},
+    ]
+    monkeypatch.setattr(
+        statement_service,
+        "process_file",
+        lambda contents, filename: {"rows": rows, "meta": {"parsed_rows": 3, "skipped_rows": 1, "total_rows": 4}},
+    )
+    registry.reset()
+
+    client = TestClient(app)
+    uploaded = client.post("/upload", files={"file": ("march.csv", b"ignored", "text/csv")}, headers=HEADERS)
+    client.get("/api/expenses/chart-data", headers=HEADERS)
+    client.get("/api/expenses/chart-data", headers=HEADERS)
+    client.delete("/expenses/999", headers=HEADERS)
+    client.get("/no-such-page", headers=HEADERS)
+    metrics = client.get("/metrics").text
+
+    assert uploaded.status_code == 200
+    assert [upload_rows.value(source="statement", outcome=outcome) for outcome in ("parsed", "skipped")] == [3, 1]
+    assert [upload_rows.value(source="statement", outcome=outcome) for outcome in ("duplicate", "inserted")] == [1, 2]
+    # Labelled by route template, so ids and unknown paths don't create new series.
+    assert 'xta_http_requests_total{method="POST",route="/upload",status="200"} 1.0' in metrics
+    assert 'xta_http_requests_total{method="GET",route="/api/expenses/chart-data",status="200"} 2.0' in metrics
+    assert 'xta_http_requests_total{method="DELETE",route="/expenses/{expense_id}",status="404"} 1.0' in metrics
+    assert 'xta_http_requests_total{method="GET",route="unmatched",status="404"} 1.0' in metrics
+    assert 'xta_http_request_seconds_count{method="GET",route="/api/expenses/chart-data"} 2' in metrics
+    # The upload ran statements; only the data-version lookup ran for the unmatched path.
+    assert 'xta_db_queries_per_request_bucket{route="/upload",le="1.0"} 0' in metrics
+    assert 'xta_db_queries_per_request_bucket{route="unmatched",le="0.0"} 0' in metrics
+    assert 'xta_db_queries_per_request_bucket{route="unmatched",le="1.0"} 1' in metrics
+    assert db_queries_per_request.count(route="/api/expenses/chart-data") == 2
+    assert "xta_db_query_seconds_count" in metrics
+    assert cache_lookups.value(cache="result", result="hit") == 1
+    assert 'xta_cache_hit_ratio{cache="result"} 0.5' in metrics
+
+
+def test_outbound_call_failures_are_counted(monkeypatch):
+    registry.reset()
+
+    def unreachable(*args, **kwargs):
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(httpx, "get", unreachable)
+    rate = fx_service._fetch_from_frankfurter("https://fx.invalid/latest", "USD", "EUR")
+    with pytest.raises(TimeoutError), timed(llm_seconds, llm_failures, operation="text_to_sql"):
+        raise TimeoutError("model timed out")
+    with timed(llm_seconds, llm_failures, operation="receipt_ocr"):
+        pass
+
+    assert rate is None
+    assert fx_failures.value(provider="frankfurter") == 1
+    assert llm_failures.value(operation="text_to_sql") == 1
+    assert llm_failures.value(operation="receipt_ocr") == 0
+    assert llm_seconds.count(operation="text_to_sql") == llm_seconds.count(operation="receipt_ocr") == 1
@@ -0,0 +1,33 @@
+from datetime import date
+
+from app.models.expense import Expense, ExpenseItem
+from app.services.partition_service import partition_service
+
+
+def test_items_inherit_parent_date_as_partition_key(session_factory):
+    db = session_factory()
+    expense = Expense(
+        owner_email="alice@example.com",
+        vendor="Store",
+        amount=3.0,
+        currency="EUR",
+        base_currency_amount=3.0,
+        base_currency="EUR",
+        fx_rate=1.0,
+        date=date(2025, 12, 31),
+        category="Groceries",
+        source_type="receipt",
+    )
+    expense.items.append(ExpenseItem(name="Milk", quantity=1.0, price=3.0))
+    db.add(expense)
+    db.commit()
+
+    assert db.query(ExpenseItem.expense_date).scalar() == date(2025, 12, 31)
+    db.close()
+
+
+def test_ensure_partitions_is_noop_without_postgres_partitioning(session_factory):
+    db = session_factory()
+    assert partition_service.is_partitioned(db) is False
+    assert partition_service.ensure_partitions(db, years_ahead=3) == []
+    db.close()
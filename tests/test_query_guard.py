@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.main import app
+from app.models.expense import Expense
+from app.services.finance import fx_service
+from app.services.query_guard import QueryTimeoutError, guard_outcomes, query_guard
+
+HEADERS = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+
+def _seed_vendors(TestingSessionLocal, count: int) -> None:
+    db = TestingSessionLocal()
+    db.add_all(
+        [
+            Expense(
+                owner_email="alice@example.com",
+                vendor=f"Store {n}",
+                amount=float(n + 1),
+                currency="EUR",
+                base_currency_amount=float(n + 1),
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=date(2026, 3, n + 1),
+                category="Groceries",
+                description="",
+                source_type="manual",
+            )
+            for n in range(count)
+        ]
+    )
+    db.commit()
+    db.close()
+
+
+def test_row_cap_truncates_charts_and_rejects_partial_aggregates(session_factory, monkeypatch):
+    _seed_vendors(session_factory, 5)
+    monkeypatch.setattr(settings, "QUERY_MAX_ROWS", 3)
+    monkeypatch.setattr(fx_service, "_fetch_timeseries", lambda base, quotes, start, end: {})
+    monkeypatch.setattr(fx_service, "_fetch_rate", lambda from_currency, to_currency, tx_date: 2.0)
+    fx_service._matrix_cache.clear()
+    registry.reset()
+
+    client = TestClient(app)
+    capped = client.post("/api/insights/ask", data={"question": "spend by vendor"}, headers=HEADERS)
+    # Converting currencies sums per-day facts; dropping some would under-count.
+    converted = client.post(
+        "/api/insights/ask", data={"question": "spend by vendor", "currency": "GBP"}, headers=HEADERS
+    )
+    metrics = client.get("/metrics")
+    fx_service._matrix_cache.clear()
+
+    assert capped.status_code == 200
+    assert capped.json()["chart"]["labels"] == ["Store 4", "Store 3", "Store 2"]
+    assert converted.status_code == 422
+    assert "Narrow the date range" in converted.json()["detail"]
+    assert guard_outcomes.value(outcome="truncated") == 1
+    assert guard_outcomes.value(outcome="row_limit") == 1
+    assert metrics.status_code == 200
+    assert 'xta_query_guard_total{outcome="truncated"} 1.0' in metrics.text
+    assert "xta_query_guard_seconds_count 2" in metrics.text
+
+
+def test_statement_timeout_becomes_clean_error():
+    db = sessionmaker(bind=create_engine("sqlite://"))()
+
+    class Canceled(Exception):
+        pgcode = "57014"
+
+    registry.reset()
+    with pytest.raises(QueryTimeoutError, match="took too long"), query_guard.guarded(db):
+        raise OperationalError("SELECT 1", {}, Canceled("canceling statement due to statement timeout"))
+    # Other database errors are not the guard's business.
+    with pytest.raises(OperationalError), query_guard.guarded(db):
+        raise OperationalError("SELECT 1", {}, Exception("connection lost"))
+    db.close()
+
+    assert guard_outcomes.value(outcome="timeout") == 1
+    assert QueryTimeoutError.status_code == 504
+
+
+def test_plan_cost_reads_explain_json():
+    explained = '[{"Plan": {"Node Type": "Aggregate", "Total Cost": 1234.5, "Plans": []}}]'
+    assert query_guard.plan_cost(explained) == 1234.5
+    assert query_guard.plan_cost([{"Plan": {"Total Cost": 7}}]) == 7.0
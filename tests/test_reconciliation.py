@@ -1,28 +1,11 @@
 from datetime import date
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-from app.db.base import Base
 from app.models.expense import Expense
 from app.routers.upload import _upsert_receipt_with_items
 
 
-def _setup_test_db():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    return TestingSessionLocal
-
-
-def test_receipt_upserts_statement_and_attaches_items():
-    TestingSessionLocal = _setup_test_db()
-    db = TestingSessionLocal()
+def test_receipt_upserts_statement_and_attaches_items(session_factory):
+    db = session_factory()
     statement = Expense(
         owner_email="user@example.com",
         vendor="Store",
@@ -0,0 +1,164 @@
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+
+from app.main import app
+from app.models.expense import Expense
+from app.models.recurring_payment import RecurringPayment
+from app.services.finance import fx_service
+from app.services.recurring_service import (
+    detect_series,
+    normalize_vendor,
+    recurring_service,
+)
+
+HEADERS = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+
+def _days(*values: date) -> np.ndarray:
+    return np.array([(value - date(1970, 1, 1)).days for value in values], dtype=np.int64)
+
+
+def test_normalize_vendor_groups_spellings():
+    assert normalize_vendor("PAYPAL *Netflix.com 4029357733") == "netflix"
+    assert normalize_vendor("NETFLIX") == "netflix"
+    assert normalize_vendor("Spotify AB") == normalize_vendor("spotify ab 1234")
+    assert normalize_vendor("REWE Markt GmbH") == "rewe markt"
+
+
+def test_detector_finds_cadence_and_ignores_irregular_spend():
+    monthly = detect_series(
+        _days(date(2026, 1, 3), date(2026, 2, 2), date(2026, 3, 4), date(2026, 4, 3), date(2026, 5, 2)),
+        np.array([12.99, 12.99, 12.99, 13.49, 13.49]),
+    )
+    weekly = detect_series(_days(*(date(2026, 1, 5) + timedelta(days=7 * n) for n in range(6))), np.full(6, 25.0))
+    irregular = detect_series(
+        _days(date(2026, 1, 3), date(2026, 1, 9), date(2026, 2, 20), date(2026, 4, 1)),
+        np.array([40.0, 12.0, 80.0, 5.0]),
+    )
+    # A yearly subscription at a shop that also sees one-off purchases.
+    mixed_days = [date(2023, 6, 1), date(2024, 6, 1), date(2025, 6, 2), date(2024, 2, 9), date(2025, 11, 20)]
+    mixed = detect_series(_days(*mixed_days), np.array([89.0, 89.0, 89.0, 23.5, 310.0]))
+
+    assert monthly.cadence == "monthly"
+    assert monthly.amount == 12.99
+    assert monthly.next_expected_date == date(2026, 6, 1)
+    assert weekly.cadence == "weekly"
+    assert weekly.confidence == 1.0
+    assert irregular is None
+    assert mixed.cadence == "yearly"
+    assert (mixed.amount, mixed.occurrences) == (89.0, 3)
+
+
+def test_recurring_payments_refresh_incrementally_on_writes(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+    today = date.today()
+    db = session_factory()
+    # An existing, already-detected group that the writes below must leave alone.
+    db.add_all(
+        [
+            Expense(
+                owner_email="alice@example.com",
+                vendor="Gym",
+                amount=30.0,
+                currency="EUR",
+                base_currency_amount=30.0,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=today - timedelta(days=30 * n),
+                category="Health",
+                description="",
+                source_type="statement",
+            )
+            for n in range(4)
+        ]
+    )
+    db.commit()
+    recurring_service.rebuild(db, "alice@example.com")
+    gym_id = db.scalar(select(RecurringPayment.id).where(RecurringPayment.vendor_key == "gym"))
+    db.close()
+
+    client = TestClient(app)
+    for months_ago, vendor in [(2, "Spotify AB"), (1, "SPOTIFY AB 1234"), (0, "Spotify AB")]:
+        response = client.post(
+            "/expenses/confirm",
+            data={
+                "vendor": vendor,
+                "amount": 10.99,
+                "date": (today - timedelta(days=30 * months_ago)).isoformat(),
+                "currency": "EUR",
+                "category": "Subscriptions",
+                "receipt_url": "/static/uploads/1.jpg",
+            },
+            headers=HEADERS,
+        )
+        assert response.status_code == 200
+    detected = client.get("/api/recurring", headers=HEADERS).json()
+
+    db = session_factory()
+    spotify_id = db.scalar(select(Expense.id).where(Expense.vendor == "SPOTIFY AB 1234"))
+    db.close()
+    client.delete(f"/expenses/{spotify_id}", headers=HEADERS)
+    after_delete = client.get("/api/recurring", headers=HEADERS).json()
+    db = session_factory()
+    stored = {row.vendor_key: row.id for row in db.scalars(select(RecurringPayment)).all()}
+    db.close()
+
+    vendors = {payment["vendor"]: payment for payment in detected["payments"]}
+    assert set(vendors) == {"Gym", "Spotify AB"}
+    assert vendors["Spotify AB"]["cadence"] == "monthly"
+    assert vendors["Spotify AB"]["occurrences"] == 3
+    assert detected["monthly_total"] > 40.0
+    # Two charges 60 days apart are no longer a pattern; the gym row was never rewritten.
+    assert [payment["vendor"] for payment in after_delete["payments"]] == ["Gym"]
+    assert stored == {"gym": gym_id}
+
+
+
+def test_refresh_loads_only_the_touched_vendor_groups(session_factory):
+    today = date.today()
+    db = session_factory()
+    charges = [
+        ("PAYPAL *Spotify AB 1", 10.99, 60),
+        ("spotify_ab.com", 10.99, 30),
+        ("Spotify AB", 10.99, 0),
+        # Shares a word with the group but normalizes to another key.
+        *(("Spotify Cafe", 4.5, 7 * n) for n in range(4)),
+    ]
+    db.add_all(
+        Expense(
+            owner_email="alice@example.com",
+            vendor=vendor,
+            amount=amount,
+            currency="EUR",
+            base_currency_amount=amount,
+            base_currency="EUR",
+            fx_rate=1.0,
+            date=today - timedelta(days=days_ago),
+            category="Subscriptions",
+            description="",
+            source_type="statement",
+        )
+        for vendor, amount, days_ago in charges
+    )
+    db.commit()
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    try:
+        stored = recurring_service.refresh(db, "alice@example.com", ["Spotify AB"])
+    finally:
+        event.remove(Engine, "before_cursor_execute", capture)
+    payments = [(row.vendor_key, row.occurrences) for row in db.scalars(select(RecurringPayment)).all()]
+    db.close()
+
+    assert stored == 1
+    assert payments == [("spotify ab", 3)]
+    # Candidate rows are narrowed in SQL, not by listing every vendor of the owner.
+    assert not any("DISTINCT" in statement.upper() for statement in statements)
@@ -0,0 +1,93 @@
+from datetime import date
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.cache import result_cache
+from app.core.metrics import registry
+from app.db.base import Base
+from app.db.replicas import READ_PRIMARY_COOKIE, Replica, read_routing, replica_router
+from app.main import app
+from app.models.expense import Expense
+from app.services.finance import fx_service
+from app.services.rollup_service import rollup_service
+
+# Not shared with other tests, whose writes would pin this owner's reads to the primary.
+OWNER = "replica-reader@example.com"
+HEADERS = {"cf-access-authenticated-user-email": OWNER}
+
+
+def _replica(name: str, amount: float) -> tuple[Replica, Session]:
+    """A replica on its own memory database holding one expense; returns it with a keep-alive session."""
+    database = f"file:{uuid4().hex}?mode=memory&cache=shared&uri=true"
+    keeper = sessionmaker(
+        bind=create_engine(f"sqlite:///{database}", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    )()
+    Base.metadata.create_all(bind=keeper.get_bind())
+    expense = Expense(
+        owner_email=OWNER,
+        vendor="Shop",
+        amount=amount,
+        currency="EUR",
+        base_currency_amount=amount,
+        base_currency="EUR",
+        fx_rate=1.0,
+        date=date.today(),
+        category="Groceries",
+        description="",
+        source_type="manual",
+    )
+    keeper.add(expense)
+    rollup_service.record(keeper, [expense])
+    keeper.commit()
+    return Replica(name, f"sqlite:///{database}", f"sqlite+aiosqlite:///{database}"), keeper
+
+
+def test_reads_rotate_over_healthy_replicas_and_stay_on_primary_after_writes(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+    first, first_keeper = _replica("replica1", 10.0)
+    second, second_keeper = _replica("replica2", 20.0)
+    monkeypatch.setattr(replica_router, "replicas", [first, second])
+    registry.reset()
+    client = TestClient(app)
+
+    def month_to_date() -> float:
+        result_cache.clear()
+        return client.get("/api/forecast", headers=HEADERS).json()["totals"]["month_to_date"]
+
+    rotated = {month_to_date(), month_to_date()}
+    second.record(60.0)
+    without_lagging = [month_to_date(), month_to_date()]
+    first.record(None)
+    all_unusable = month_to_date()
+
+    first.record(0.0)
+    second.record(0.0)
+    written = client.post(
+        "/expenses/confirm",
+        data={
+            "vendor": "Shop",
+            "amount": 5.0,
+            "date": date.today().isoformat(),
+            "currency": "EUR",
+            "category": "Groceries",
+            "receipt_url": "/static/uploads/1.jpg",
+        },
+        headers=HEADERS,
+    )
+    after_write = month_to_date()
+    first_keeper.close()
+    second_keeper.close()
+
+    assert rotated == {10.0, 20.0}
+    assert without_lagging == [10.0, 10.0]
+    # The primary is empty until the write below.
+    assert all_unusable == 0.0
+    assert READ_PRIMARY_COOKIE in written.cookies
+    assert after_write == 5.0
+    assert read_routing.value(target="primary", reason="lagging") == 1
+    assert read_routing.value(target="primary", reason="read_your_writes") == 1
+    assert 'xta_db_replica_lag_seconds{replica="replica1"} 0.0' in registry.render()
@@ -0,0 +1,105 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.cache import DataVersions, ResultCache, data_versions, mark_uncacheable
+from app.main import app
+from app.services.finance import fx_service
+
+
+def test_result_cache_is_scoped_by_owner_version(session_factory):
+    cache = ResultCache(max_entries=2)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_compute("alice@example.com", ("k",), compute) == 1
+    assert cache.get_or_compute("alice@example.com", ("k",), compute) == 1
+    assert cache.get_or_compute("bob@example.com", ("k",), compute) == 2
+    assert cache.hits == 1
+    assert cache.misses == 2
+
+    db = session_factory()
+    data_versions.bump(db, "alice@example.com")
+    db.commit()
+    db.close()
+    assert cache.get_or_compute("alice@example.com", ("k",), compute) == 3
+
+
+def test_data_versions_are_shared_through_the_database(session_factory):
+    # Two registries over one database stand in for two worker processes.
+    writer, reader = DataVersions(), DataVersions()
+    writer.bind(session_factory)
+    reader.bind(session_factory)
+    before = reader.get("alice@example.com")
+    assert reader.last_write("alice@example.com") is None
+
+    db = session_factory()
+    writer.bump(db, "alice@example.com")
+    db.commit()
+    db.close()
+    assert reader.get("alice@example.com") != before
+    assert reader.last_write("alice@example.com") is not None
+    assert reader.get("bob@example.com") == before
+
+
+def test_results_marked_uncacheable_are_not_stored(session_factory):
+    cache = ResultCache(max_entries=2)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        mark_uncacheable()  # e.g. a rate lookup fell back to 1.0
+        return len(calls)
+
+    assert cache.get_or_compute("alice@example.com", ("k",), compute) == 1
+    assert cache.get_or_compute("alice@example.com", ("k",), compute) == 2
+
+
+def test_chart_data_served_from_cache_until_write(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+
+    statements: list[str] = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # On every engine: chart-data reads through the async one.
+    event.listen(Engine, "before_cursor_execute", count_statement)
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    def confirm(amount: float) -> None:
+        response = client.post(
+            "/expenses/confirm",
+            data={
+                "vendor": "Store A",
+                "amount": amount,
+                "date": date(2026, 2, 3).isoformat(),
+                "currency": "EUR",
+                "category": "Groceries",
+                "receipt_url": "/static/uploads/1.jpg",
+            },
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    confirm(10.0)
+    first = client.get("/api/expenses/chart-data?month=2026-02", headers=headers).json()
+    statements.clear()
+    second = client.get("/api/expenses/chart-data?month=2026-02", headers=headers).json()
+    # Only the owner's data version was read.
+    assert len(statements) == 1
+    assert "owner_data_versions" in statements[0]
+    assert second == first
+
+    confirm(5.0)
+    third = client.get("/api/expenses/chart-data?month=2026-02", headers=headers).json()
+    event.remove(Engine, "before_cursor_execute", count_statement)
+
+    assert first["vendors"]["data"] == [10.0]
+    assert third["vendors"]["data"] == [15.0]
@@ -0,0 +1,92 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.expense import Expense
+from app.models.expense_rollup import ExpenseRollup
+from app.services.finance import fx_service
+from app.services.rollup_service import RollupService, rollup_service
+
+
+def _rollup_snapshot(db) -> set[tuple]:
+    return {
+        (row.owner_email, row.month, row.category, row.vendor, round(row.total_amount, 2), row.tx_count)
+        for row in db.query(ExpenseRollup).all()
+    }
+
+
+def test_rollups_follow_confirm_and_delete(session_factory, monkeypatch):
+    monkeypatch.setattr(fx_service, "convert_to_base", lambda amount, currency, tx_date=None: (float(amount), 1.0))
+
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+    created_ids = []
+    for amount, day in ((10.0, "2026-03-02"), (15.5, "2026-03-20"), (7.0, "2026-04-01")):
+        response = client.post(
+            "/expenses/confirm",
+            data={
+                "vendor": "Store A",
+                "amount": amount,
+                "date": day,
+                "currency": "EUR",
+                "category": "Groceries",
+                "receipt_url": "/static/uploads/1.jpg",
+            },
+            headers=headers,
+        )
+        assert response.status_code == 200
+        created_ids.append(response.json()["id"])
+
+    delete_response = client.delete(f"/expenses/{created_ids[-1]}", headers=headers)
+    assert delete_response.status_code == 200
+
+    db = session_factory()
+    incremental = _rollup_snapshot(db)
+    assert incremental == {("alice@example.com", date(2026, 3, 1), "Groceries", "Store A", 25.5, 2)}
+
+    rollup_service.rebuild(db)
+    assert _rollup_snapshot(db) == incremental
+    db.close()
+
+
+def test_rollup_rebuild_matches_ledger_per_owner(session_factory):
+    db = session_factory()
+    db.add_all(
+        [
+            Expense(
+                owner_email=owner,
+                vendor="Store",
+                amount=amount,
+                currency="EUR",
+                base_currency_amount=amount,
+                base_currency="EUR",
+                fx_rate=1.0,
+                date=day,
+                category=None,
+                description="",
+                source_type="manual",
+            )
+            for owner, amount, day in (
+                ("alice@example.com", 5.0, date(2026, 1, 5)),
+                ("alice@example.com", 6.0, date(2026, 1, 31)),
+                ("bob@example.com", 9.0, date(2026, 1, 10)),
+            )
+        ]
+    )
+    db.commit()
+
+    assert rollup_service.rebuild(db, owner_email="alice@example.com") == 1
+    assert _rollup_snapshot(db) == {
+        ("alice@example.com", date(2026, 1, 1), "Uncategorized", "Store", 11.0, 2),
+    }
+    db.close()
+
+
+def test_month_bounds_only_accepts_whole_months():
+    bounds = RollupService.month_bounds
+    assert bounds(None, None, False) == (None, None)
+    assert bounds(date(2026, 2, 1), date(2026, 3, 1), True) == (date(2026, 2, 1), date(2026, 3, 1))
+    assert bounds(date(2026, 1, 1), date(2026, 2, 28), False) == (date(2026, 1, 1), date(2026, 3, 1))
+    assert bounds(date(2026, 1, 2), None, False) is None
+    assert bounds(date(2026, 1, 1), date(2026, 2, 27), False) is None
@@ -0,0 +1,80 @@
+import logging
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.profiler import SqlProfilerMiddleware, explain, statement_shape
+from app.main import app
+
+HEADERS = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+
+def test_statement_shapes_ignore_literals_and_parameters():
+    assert statement_shape("SELECT * FROM expenses\n WHERE id = 17") == "SELECT * FROM expenses WHERE id = ?"
+    assert statement_shape("SELECT * FROM expenses WHERE id = %(id_1)s") == "SELECT * FROM expenses WHERE id = ?"
+    assert statement_shape("SELECT 1 WHERE vendor = 'O''Neil' AND id IN (?, ?, ?)") == (
+        "SELECT ? WHERE vendor = ? AND id IN (?)"
+    )
+    assert statement_shape("SELECT amount::numeric FROM expenses_2026") == "SELECT amount::numeric FROM expenses_2026"
+
+
+def test_failed_explain_is_rolled_back_to_a_savepoint():
+    executed = []
+
+    class Cursor:
+        def execute(self, statement, parameters=None):
+            executed.append(statement)
+            if statement.startswith("EXPLAIN"):
+                raise RuntimeError("permission denied for function")
+
+        def close(self):
+            pass
+
+    conn = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        connection=SimpleNamespace(cursor=Cursor, dbapi_connection=SimpleNamespace(autocommit=False)),
+    )
+
+    assert explain(conn, "SELECT * FROM expenses", {}) == ""
+    assert executed == [
+        "SAVEPOINT xta_explain",
+        "EXPLAIN SELECT * FROM expenses",
+        "ROLLBACK TO SAVEPOINT xta_explain",
+        "RELEASE SAVEPOINT xta_explain",
+    ]
+
+
+def test_profiler_reports_query_cost_repeats_and_slow_plans(session_factory, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_PROFILER_SLOW_MS", 0.0)
+    monkeypatch.setattr(settings, "SQL_PROFILER_REPEAT_THRESHOLD", 3)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    looping = FastAPI()
+
+    @looping.get("/vendors")
+    def vendors():
+        # One query per id: the N+1 shape the profiler should catch.
+        with engine.connect() as connection:
+            return [connection.execute(text("SELECT :id AS id"), {"id": expense_id}).scalar() for expense_id in range(4)]
+
+    caplog.set_level(logging.INFO, logger="app.core.profiler")
+    chart = TestClient(SqlProfilerMiddleware(app)).get("/api/expenses/chart-data", headers=HEADERS)
+    looped = TestClient(SqlProfilerMiddleware(looping)).get("/vendors")
+    engine.dispose()
+    messages = [record.getMessage() for record in caplog.records]
+
+    assert chart.status_code == 200
+    assert chart.headers["server-timing"].startswith("db;dur=")
+    assert looped.json() == [0, 1, 2, 3]
+    assert looped.headers["server-timing"].endswith('desc="4 queries"')
+    assert "GET /vendors: 4 SQL statements in" in "\n".join(messages)
+    assert "GET /vendors: same statement run 4 times (N+1?): SELECT ? AS id" in messages
+    # Every statement counts as slow at 0 ms; each comes with its SQLite plan.
+    assert any(
+        message.startswith("GET /api/expenses/chart-data: slow statement")
+        and "SEARCH expense_rollups USING INDEX ix_expense_rollups_owner_email" in message
+        for message in messages
+    )
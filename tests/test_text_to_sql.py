@@ -0,0 +1,160 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.models.expense import Expense, ExpenseItem
+from app.services.text_to_sql_service import (
+    SqlPlan,
+    SqlValidationError,
+    question_template,
+    text_to_sql_service,
+    validate_sql,
+)
+
+
+def test_question_template_lifts_literals():
+    template, params = question_template("Top 5 vendors in 2026-03 at 'REWE City'?")
+    assert template == "top :n1 vendors in :d1 at :s1"
+    assert params == {"s1": "REWE City", "d1": "2026-03", "n1": 5}
+    assert question_template("top 10 vendors in 2026-04 at 'Aldi'")[0] == template
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT vendor AS label, SUM(base_currency_amount) AS value FROM expenses GROUP BY vendor;",
+        (
+            "WITH monthly AS (SELECT date, base_currency_amount FROM expenses) "
+            "SELECT CAST(EXTRACT(MONTH FROM date) AS TEXT) AS label, SUM(base_currency_amount) AS value "
+            "FROM monthly GROUP BY 1 LIMIT :n1"
+        ),
+        (
+            "SELECT i.name AS label, AVG(i.price) AS value FROM expense_items i "
+            "JOIN expenses e ON e.id = i.expense_id WHERE e.vendor IS DISTINCT FROM 'x' GROUP BY i.name"
+        ),
+        (
+            "SELECT e.category AS label, COUNT(*) AS value FROM expenses e, expense_items AS i "
+            "WHERE i.expense_id = e.id AND e.date >= CURRENT_DATE - INTERVAL '1 month' GROUP BY e.category"
+        ),
+        (
+            "WITH totals (vendor, total) AS (SELECT vendor, SUM(base_currency_amount) FROM expenses GROUP BY vendor), "
+            "ranked AS MATERIALIZED (SELECT vendor, total FROM totals) "
+            "SELECT vendor AS label, SUM(total) OVER w AS value FROM ranked WINDOW w AS (ORDER BY total)"
+        ),
+    ],
+)
+def test_validator_accepts_read_only_selects(sql):
+    assert validate_sql(sql, {"n1"})
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "DELETE FROM expenses",
+        "SELECT 1 AS label, 1 AS value; DROP TABLE expenses",
+        "SELECT name AS label, 1 AS value FROM saved_queries",
+        "SELECT vendor AS label, 1 AS value FROM public.expenses",
+        "SELECT vendor AS label, 1 AS value FROM expenses -- WHERE owner_email = 'x'",
+        "SELECT pg_sleep(10) AS label, 1 AS value",
+        "SELECT vendor AS label, amount AS value INTO stolen FROM expenses",
+        "WITH RECURSIVE t AS (SELECT 1) SELECT 1 AS label, 1 AS value FROM t",
+        "SELECT vendor AS label, 1 AS value FROM expenses WHERE vendor = :owner_email",
+        "SELECT relname AS label, 1 AS value FROM (SELECT relname FROM pg_class) AS c",
+        "SELECT vendor AS label, 1 AS value FROM expenses FOR SHARE",
+        # A WINDOW name must not turn a real table into an allowed relation.
+        (
+            "SELECT owner_email AS label, SUM(total_amount) AS value FROM expense_rollups "
+            "GROUP BY owner_email WINDOW expense_rollups AS (ORDER BY 1)"
+        ),
+        "WITH x AS (TABLE saved_queries) SELECT name AS label, 1 AS value FROM x",
+        "WITH expense_rollups AS (SELECT * FROM expenses) SELECT vendor AS label, 1 AS value FROM expense_rollups",
+        "SELECT vendor AS label, 1 AS value FROM expenses WINDOW saved_queries AS (ORDER BY 1)",
+    ],
+)
+def test_validator_rejects_unsafe_sql(sql):
+    with pytest.raises(SqlValidationError):
+        validate_sql(sql, {"n1"})
+
+
+def test_generated_sql_runs_owner_scoped_and_is_cached_per_template(session_factory, monkeypatch):
+    db = session_factory()
+    for owner, vendor, amount in [
+        ("alice@example.com", "REWE", 12.5),
+        ("alice@example.com", "REWE", 7.5),
+        ("alice@example.com", "Aldi", 3.0),
+        ("bob@example.com", "REWE", 1000.0),
+    ]:
+        expense = Expense(
+            owner_email=owner,
+            vendor=vendor,
+            amount=amount,
+            currency="EUR",
+            base_currency_amount=amount,
+            base_currency="EUR",
+            fx_rate=1.0,
+            date=date(2026, 3, 2),
+            category="Groceries",
+            description="",
+            source_type="manual",
+        )
+        expense.items = [ExpenseItem(name="Crisps", quantity=1.0, price=amount)]
+        db.add(expense)
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(settings, "TEXT_TO_SQL_ENABLED", True)
+    text_to_sql_service.clear()
+    prompts: list[str] = []
+
+    def fake_generate(template: str, allowed_params: set[str]) -> SqlPlan:
+        prompts.append(template)
+        # Deliberately unfiltered: owner scoping must come from the wrapper.
+        sql = (
+            "SELECT e.vendor AS label, SUM(i.price) AS value FROM expenses e "
+            "JOIN expense_items i ON i.expense_id = e.id GROUP BY e.vendor ORDER BY value DESC LIMIT :n1"
+        )
+        return SqlPlan(sql=validate_sql(sql, allowed_params), chart_type="bar", summary="Item spend by vendor.")
+
+    monkeypatch.setattr(text_to_sql_service, "_generate", fake_generate)
+    client = TestClient(app)
+    headers = {"cf-access-authenticated-user-email": "alice@example.com"}
+
+    first = client.post("/api/insights/ask", data={"question": "Top 5 vendors for items?"}, headers=headers)
+    second = client.post(
+        "/api/insights/ask", data={"question": "top 1 vendors for items", "month": "2026-03"}, headers=headers
+    )
+    outside_range = client.post(
+        "/api/insights/ask", data={"question": "top 1 vendors for items", "month": "2026-04"}, headers=headers
+    )
+    text_to_sql_service.clear()
+
+    assert first.status_code == 200
+    payload = first.json()
+    assert payload["intent"] == "text_to_sql"
+    assert dict(zip(payload["chart"]["labels"], payload["chart"]["values"])) == {"REWE": 20.0, "Aldi": 3.0}
+    assert second.json()["chart"]["labels"] == ["REWE"]
+    assert outside_range.json()["chart"]["labels"] == []
+    # One model call for the shared template "top :n1 vendors for items".
+    assert prompts == ["top :n1 vendors for items"]
+
+
+def test_invalid_generated_sql_falls_back_to_keyword_intents(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "TEXT_TO_SQL_ENABLED", True)
+    text_to_sql_service.clear()
+
+    def fake_generate(template: str, allowed_params: set[str]) -> SqlPlan:
+        return SqlPlan(sql=validate_sql("DELETE FROM expenses", allowed_params), chart_type="bar", summary="")
+
+    monkeypatch.setattr(text_to_sql_service, "_generate", fake_generate)
+    client = TestClient(app)
+    response = client.post(
+        "/api/insights/ask",
+        data={"question": "show category split"},
+        headers={"cf-access-authenticated-user-email": "alice@example.com"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["chart"]["type"] == "pie"